@@ -1,58 +1,60 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
-import time
-import pandas as pd
-
-# Set up Chrome options
-chrome_options = Options()
-driver = webdriver.Chrome(
-	service=Service(ChromeDriverManager().install()),
-	options=chrome_options
-)
-
-url = "https://www.datacenters.com/locations?query=USA"
-driver.get(url)
-
-time.sleep(10)
-# Use XPath to locate elements
-# elements = driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__detailsContainer')]/div/div[3]")
-# for element in elements:
-#     print(element.text.strip())
-driver.find_element(By.XPATH, "//input[@id='locations-search']").send_keys("United States")
-time.sleep(5)
-item = driver.find_element(By.XPATH, "(//div[contains(@class,'LocationsIndex__pagination')][1]/div/nav/button/div[contains(text(),'➞')])[2]").is_enabled()
-while item:
-	time.sleep(5)
-	elements=driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__details__')]")
-	providers= driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__provider')]")
-	locNames= driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__name_')]")
-	addresss= driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__address_')]")
-	for element,provider,locName,address in zip(elements,providers,locNames,addresss):
-		pro=provider.text.strip()
-		loc=locName.text.strip()
-		addr=address.text.strip()
-		pd.DataFrame({
-			'Provider': [provider.text.strip()],
-			'Location Name': [locName.text.strip()],
-			'Address': [address.text.strip()],
-		}).to_csv('datacentersSumm.csv', mode='a', header=False, index=False)
-		original_tab = driver.current_window_handle
-		provider.click()
-		time.sleep(5)
-		new_tab = [tab for tab in driver.window_handles if tab != original_tab][0]
-		driver.switch_to.window(new_tab)
-		summary = driver.find_element(By.XPATH, "//div[contains(@class,'LocationShowMainContent__contentSummary')]").text
-		driver.close()
-		time.sleep(5)
-		pd.DataFrame({
-			'Summary': [summary]
-		}).to_csv('datacentersSumm.csv', mode='a', header=False, index=False)
-		
-	driver.find_element(By.XPATH, "(//div[contains(@class,'LocationsIndex__pagination')][1]/div/nav/button/div[contains(text(),'➞')])[2]").click()
-	if item == False:
-		break
-
-driver.quit()
\ No newline at end of file
+import argparse
+
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from find import COLUMNS, open_listing, next_page, page_tiles, url
+from result_sink import ResultSink
+from selenium_runner import DEFAULT_TIMEOUT, make_driver, wait_for
+
+output_file = 'datacentersSumm.csv'
+
+SUMMARY = "//div[contains(@class,'LocationShowMainContent__contentSummary')]"
+
+
+def read_summary(driver, provider) -> str:
+    """Open the provider's location page in a new tab, read its summary and return to the listing."""
+    original_tab = driver.current_window_handle
+    tabs = len(driver.window_handles)
+    provider.click()
+    WebDriverWait(driver, DEFAULT_TIMEOUT).until(EC.number_of_windows_to_be(tabs + 1))
+    new_tab = [tab for tab in driver.window_handles if tab != original_tab][0]
+    driver.switch_to.window(new_tab)
+    try:
+        return wait_for(driver, SUMMARY, EC.visibility_of_element_located).text
+    finally:
+        driver.close()
+        driver.switch_to.window(original_tab)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape every datacenters.com location with its summary.")
+    parser.add_argument("--url", default=url, help="locations page (or a local fixture with the same markup)")
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--show", action="store_true", help="show the browser window instead of running headless")
+    args = parser.parse_args()
+
+    driver = make_driver(headless=not args.show)
+    sink = ResultSink(args.output, COLUMNS + ['Summary'], key=COLUMNS)
+    try:
+        open_listing(driver, args.url)
+        while True:
+            for provider, locName, address in page_tiles(driver):
+                row = {
+                    'Provider': provider.text.strip(),
+                    'Location Name': locName.text.strip(),
+                    'Address': address.text.strip(),
+                }
+                # Tiles already scraped on an earlier run keep their summary; skip the extra tab
+                if tuple(row.values()) not in sink:
+                    row['Summary'] = read_summary(driver, provider)
+                    sink.write(row)
+            if not next_page(driver):
+                break
+    finally:
+        sink.close()
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import re
+import json
+
+from llm_cache import completion_key
+
+# Default number of facilities packed into one request (1 disables batching)
+BATCH_SIZE = 8
+# Output tokens budgeted per facility (same as the single-facility max_tokens)
+OUTPUT_TOKENS_PER_ITEM = 300
+
+# (context window, max output tokens) per model; unknown models get the default
+MODEL_LIMITS = {
+    "gpt-3.5-turbo": (16385, 4096),
+    "gpt-4": (8192, 4096),
+    "gpt-4-turbo": (128000, 4096),
+    "gpt-4o": (128000, 16384),
+    "gpt-4o-mini": (128000, 16384),
+}
+DEFAULT_LIMITS = (8192, 4096)
+
+# How each output field is described to the model
+FIELD_DESCRIPTIONS = {
+    "Name": "Name",
+    "Provider": "Provider",
+    "StreetAddress": "Street Address",
+    "City": "City",
+    "ZipCode": "Zip Code",
+    "State": "State",
+    "Country": "Country(US, UK, etc.)",
+    "Whitespace": "Whitespace(Total building area in Sq. Ft.)",
+    "Area": "Area(Building area in Sq. Ft.)",
+    "YearBuilt": "Year Built(YYYY)",
+    "Power": "Power(in KW)",
+    "Scale": "Scale(Hyperscale, Enterprise, etc.)",
+    "Certifications": "Certifications",
+    "URL": "URL",
+}
+
+BATCH_SYSTEM_PROMPT = "You are a helpful AI that extracts structured information from JSON records and answers with a JSON array."
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for packing."""
+    return len(text) // 4 + 1
+
+
+def build_batch_prompt(facilities: dict, fields: list) -> str:
+    """
+    Prompt for several facilities at once. `facilities` maps unique_key -> facility JSON string.
+    The fixed instructions come first so every batch shares the same prompt prefix.
+    """
+    bullets = "\n".join(f"- {FIELD_DESCRIPTIONS[field]}" for field in fields)
+    template = ",\n".join(f'  "{field}": ""' for field in fields)
+    data = ",\n".join(f"{json.dumps(key, ensure_ascii=False)}: {text}" for key, text in facilities.items())
+    return f"""
+You are an AI assistant that extracts specific standardized information from the JSON data of several facilities.
+For EVERY facility below, extract the following fields (use empty string if not found):
+{bullets}
+
+Output format (strict JSON array with one object per facility, keyed by its unique_key):
+[
+ {{
+  "unique_key": "",
+{template}
+ }}
+]
+Do not include any extra keys or any text outside the array.
+
+The facilities, as a JSON object mapping unique_key to facility data:
+{{
+{data}
+}}
+"""
+
+
+def batch_messages(facilities: dict, fields: list) -> list:
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": build_batch_prompt(facilities, fields)}
+    ]
+
+
+def batch_item_key(model: str, facility_json_str: str, fields: list) -> str:
+    """
+    Cache key for one facility extracted in batch mode. `fields` is that facility's own missing
+    fields, not the union the batch asked for; the key covers the prompt as rendered for them
+    (instructions and FIELD_DESCRIPTIONS) but not which other facilities shared the request, so
+    cache hits survive a different batch composition and a reworded field misses.
+    """
+    return completion_key(model, BATCH_SYSTEM_PROMPT + "\n" + build_batch_prompt({}, fields), facility_json_str,
+                          0.0, OUTPUT_TOKENS_PER_ITEM)
+
+
+def batch_max_tokens(model: str, n_items: int) -> int:
+    _, max_output = MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+    return min(max_output, OUTPUT_TOKENS_PER_ITEM * n_items)
+
+
+def pack_batches(items, model: str, fields: list, batch_size: int = BATCH_SIZE):
+    """
+    Group items (tuples starting with unique_key, facility JSON string) into batches of at
+    most `batch_size` that fit the model's context window and output limit.
+    Yields lists of items; an item too large to share a request is yielded on its own.
+    """
+    context, max_output = MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+    overhead = estimate_tokens(build_batch_prompt({}, fields) + BATCH_SYSTEM_PROMPT)
+    batch, input_tokens = [], overhead
+    for item in items:
+        item_tokens = estimate_tokens(item[1]) + 10
+        output_tokens = OUTPUT_TOKENS_PER_ITEM * (len(batch) + 1)
+        fits = (len(batch) < batch_size
+                and output_tokens <= max_output
+                and input_tokens + item_tokens + output_tokens <= context)
+        if batch and not fits:
+            yield batch
+            batch, input_tokens = [], overhead
+        batch.append(item)
+        input_tokens += item_tokens
+    if batch:
+        yield batch
+
+
+def parse_batch_response(content: str, keys, fields: list) -> dict:
+    """
+    Parse a batch answer into unique_key -> fields. Each element is validated on its own:
+    it must name one of `keys` and carry every field as a scalar. Invalid or missing
+    facilities are left out so the caller can retry them one by one.
+    """
+    content = re.sub(r"^```(?:json)?\s*|\s*```$", "", content.strip())
+    try:
+        items = json.loads(content)
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(items, dict):
+        # Some models answer with an object keyed by unique_key instead of an array
+        items = [{"unique_key": key, **value} for key, value in items.items() if isinstance(value, dict)]
+    if not isinstance(items, list):
+        return {}
+
+    keys = set(keys)
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict) or item.get("unique_key") not in keys:
+            continue
+        if any(field not in item or isinstance(item[field], (dict, list)) for field in fields):
+            continue
+        parsed[item["unique_key"]] = {
+            field: "" if item[field] is None else str(item[field]) for field in fields
+        }
+    return parsed
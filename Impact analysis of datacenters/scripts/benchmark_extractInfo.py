@@ -0,0 +1,112 @@
+"""
+Benchmark for extractInfo.py: docs/sec per HTML parser backend and per worker count.
+
+    python benchmark_extractInfo.py                      # synthetic datacentermap-like pages
+    python benchmark_extractInfo.py --input addresses_with2.json
+
+Every backend's text is compared with the html.parser reference and the number of
+documents that differ is reported next to its throughput.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from extractInfo import BACKENDS, available_backends, convert_states, write_states
+from stream_sources import iter_top_level
+
+
+def synthetic_tree(n_states: int = 8, cities: int = 10, addresses: int = 10) -> dict:
+    """A state -> details -> addresses tree with overview/specs HTML shaped like datacentermap pages."""
+    random.seed(0)
+    words = "data center colocation campus power cooling fiber carrier neutral tier redundant".split()
+    tree = {}
+    for s in range(n_states):
+        details = []
+        for c in range(cities):
+            sites = []
+            for a in range(addresses):
+                paragraphs = "".join(
+                    f"<p>{' '.join(random.choices(words, k=40))} &amp; <b>{random.choice(words)}</b></p>"
+                    for _ in range(6)
+                )
+                sites.append({
+                    "url": f"https://www.datacentermap.com/usa/state-{s}/city-{c}/site-{a}/",
+                    "name": f"Site {a}",
+                    "address1": f"Site {a}",
+                    "address2": f"{100 + a} Main Street",
+                    "address3": f"City {c}, ST 2{a:04d}",
+                    "overviewHTML": f"<div class='overview'>{paragraphs}<script>track({a});</script></div>",
+                    "specsHtml": (f"<ul><li>Power: {a % 5 + 1} x {c + 1} MW</li>"
+                                  f"<li>Whitespace: {1000 * (a + 1):,} sq.f.</li><li>Built in 20{a % 20:02d}</li></ul>"),
+                })
+            details.append({"name": f"City {c}", "url": f"https://example/{s}/{c}", "count": str(addresses),
+                            "addresses": sites})
+        tree[f"State {s}"] = {"count": str(cities * addresses), "details": details}
+    return tree
+
+
+def html_docs(path: str) -> list:
+    docs = []
+    for _, state_data in iter_top_level(path):
+        for detail in state_data.get("details", []):
+            for address in detail.get("addresses", []):
+                docs.extend(address[k] for k in ("overviewHTML", "specsHtml") if k in address)
+    return docs
+
+
+def bench_backends(docs: list):
+    reference = [BACKENDS["html.parser"](doc) for doc in docs]
+    print(f"{'backend':<12} {'docs/sec':>10} {'speedup':>8} {'mismatches':>11}")
+    base = None
+    for backend in reversed(available_backends()):
+        extract = BACKENDS[backend]
+        start = time.perf_counter()
+        texts = [extract(doc) for doc in docs]
+        rate = len(docs) / (time.perf_counter() - start)
+        base = base or rate
+        mismatches = sum(a != b for a, b in zip(texts, reference))
+        print(f"{backend:<12} {rate:>10.0f} {rate / base:>7.2f}x {mismatches:>11}")
+
+
+def bench_workers(path: str, n_docs: int, backend: str, worker_counts: list):
+    print(f"\n{backend}: end-to-end extractInfo run (stream, convert, write)")
+    print(f"{'workers':<8} {'docs/sec':>10} {'identical':>10}")
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            out = os.path.join(tmp, f"out_{workers}.json")
+            start = time.perf_counter()
+            write_states(convert_states(path, backend, workers), out)
+            rate = n_docs / (time.perf_counter() - start)
+            with open(out, "rb") as f:
+                content = f.read()
+            reference = reference or content
+            print(f"{workers:<8} {rate:>10.0f} {str(content == reference):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", help="state -> details -> addresses JSON (default: synthetic data)")
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input
+        if not path:
+            path = os.path.join(tmp, "synthetic.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(synthetic_tree(), f)
+        docs = html_docs(path)
+        print(f"{len(docs)} HTML documents, {os.cpu_count()} CPUs\n")
+        bench_backends(docs)
+        worker_counts = [int(w) for w in args.workers.split(",")]
+        fastest = available_backends()[0]
+        for backend in ["html.parser"] + ([fastest] if fastest != "html.parser" else []):
+            bench_workers(path, len(docs), backend, worker_counts)
+
+
+if __name__ == "__main__":
+    main()
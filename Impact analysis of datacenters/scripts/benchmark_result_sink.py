@@ -0,0 +1,102 @@
+"""
+Write throughput of the scrapers' output: one DataFrame.to_csv(mode='a') per row vs ResultSink.
+
+    python benchmark_result_sink.py                 # 5,000 rows shaped like find.py's output
+    python benchmark_result_sink.py --rows 50000 --duplicates 0.2
+
+Every mode writes the same rows (a share of them repeated, as when a scrape is resumed) to a
+fresh file and the output is checked against the per-row baseline. The reopen column is the
+time a new ResultSink takes to load the keys of that output, i.e. the start-up cost of a resume.
+"""
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import pandas as pd
+
+from find import COLUMNS
+from result_sink import ResultSink, read_sink_csv
+
+
+def synthetic_rows(n: int, duplicates: float = 0.1) -> list:
+    """Provider / location / address rows; a `duplicates` share repeats an earlier row."""
+    random.seed(0)
+    rows = []
+    for i in range(n):
+        if rows and random.random() < duplicates:
+            rows.append(random.choice(rows))
+            continue
+        rows.append({"Provider": f"Provider {i % 97}", "Location Name": f"Site {i}",
+                     "Address": f"{100 + i % 900} Main Street, City {i % 311}, ST {20000 + i % 9000}"})
+    return rows
+
+
+def per_row_csv(path: str, rows: list):
+    """What the scrapers did before ResultSink: a one-row DataFrame appended for every record."""
+    seen = set()
+    for row in rows:
+        key = tuple(row[c] for c in COLUMNS)
+        if key in seen:
+            continue
+        seen.add(key)
+        pd.DataFrame([row], columns=COLUMNS).to_csv(path, mode="a", header=False, index=False)
+
+
+def sink_writer(batch_size: int):
+    def write(path: str, rows: list):
+        with ResultSink(path, COLUMNS, key=COLUMNS, batch_size=batch_size) as sink:
+            for row in rows:
+                sink.write(row)
+    return write
+
+
+def read_output(path: str) -> list:
+    if os.path.isdir(path):
+        parts = sorted(os.listdir(path))
+        df = pd.concat([pd.read_parquet(os.path.join(path, p)) for p in parts], ignore_index=True)
+        return [list(r) for r in df.astype(str).itertuples(index=False)]
+    # The per-row baseline has no header, as the scrapers' old output; the sink's files do
+    return [list(r) for r in read_sink_csv(path, COLUMNS).itertuples(index=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of rows repeating an earlier one")
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows, args.duplicates)
+    modes = {
+        "to_csv per row": ("out.csv", per_row_csv),
+        "sink csv, batch 1": ("out.csv", sink_writer(1)),
+        "sink csv, batch 100": ("out.csv", sink_writer(100)),
+        "sink csv, batch 1000": ("out.csv", sink_writer(1000)),
+        "sink parquet, batch 1000": ("out.parquet", sink_writer(1000)),
+    }
+    workdir = tempfile.mkdtemp(prefix="sink_bench_")
+    try:
+        print(f"{len(rows)} rows, {args.duplicates:.0%} repeated")
+        print(f"{'mode':<26} {'rows/sec':>10} {'speedup':>8} {'reopen (ms)':>12} {'identical':>10}")
+        base, reference = None, None
+        for name, (filename, write) in modes.items():
+            path = os.path.join(workdir, name.replace(" ", "_").replace(",", ""), filename)
+            os.makedirs(os.path.dirname(path))
+            start = time.perf_counter()
+            write(path, rows)
+            rate = len(rows) / (time.perf_counter() - start)
+            base = base or rate
+            start = time.perf_counter()
+            ResultSink(path, COLUMNS, key=COLUMNS, flush_seconds=None).close()
+            reopen = time.perf_counter() - start
+            output = read_output(path)
+            reference = reference or output
+            print(f"{name:<26} {rate:>10.0f} {rate / base:>7.1f}x {reopen * 1e3:>12.1f} {str(output == reference):>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
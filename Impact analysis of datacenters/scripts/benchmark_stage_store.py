@@ -0,0 +1,116 @@
+"""
+Load times of the pipeline stages: CSV + the notebooks' pd.to_numeric pass vs the typed Parquet store.
+
+    python benchmark_stage_store.py              # data/ as it is
+    python benchmark_stage_store.py --scale 20   # every stage repeated 20x, in a temp directory
+
+For each stage it times a full CSV read followed by coercing the numeric columns (what
+"Final Analysis" does with cols_to_numeric), a full read_stage, and a read_stage of three
+columns of one site (or, for the single-file stages, with a row filter).
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+from stage_store import DATA_DIR, STAGES, DATASETS, is_partitioned, read_source, read_stage, write_stage
+
+PROJECTIONS = {
+    "llm_extracted": ["Name", "Provider", "Power"],
+    "power": ["Name", "Power", "Power_Standardized"],
+    "area_power": ["Name", "Power_Standardized", "Area_Standardized"],
+    "cleaned": ["Name", "Power_Standardized", "Area_Standardized"],
+    "geocoded": ["name", "latitude", "longitude"],
+    "weather_merged": ["latitude", "longitude", "aggregated_power"],
+    "power_imputed": ["latitude", "longitude", "aggregated_power_imputed"],
+}
+# Row filters for the stages that are one file
+ROW_FILTERS = {
+    "weather_merged": [("data_center_count", ">", 1)],
+    "power_imputed": [("state", "==", "VA")],
+}
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def csv_load(stage: str, paths: dict) -> pd.DataFrame:
+    """read_csv of every source file, then pd.to_numeric on the columns the schema says are numbers."""
+    schema = STAGES[stage]["schema"]
+    numeric = [f.name for f in schema if pa.types.is_floating(f.type) or pa.types.is_integer(f.type)]
+    frames = []
+    for path in paths.values():
+        df = pd.read_json(path) if path.endswith(".json") else pd.read_csv(path)
+        for col in numeric:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def prepare(workdir: str, scale: int) -> dict:
+    """Write every stage `scale` times over as both CSV and Parquet; {stage: {dataset: csv path}}."""
+    layout = {}
+    for stage, info in STAGES.items():
+        sources = info["sources"] if is_partitioned(stage) else {None: info["sources"]}
+        paths = {}
+        for dataset, relative in sources.items():
+            source = os.path.join(DATA_DIR, relative)
+            if not os.path.exists(source):
+                continue
+            df = read_source(source)
+            df = pd.concat([df] * scale, ignore_index=True)
+            path = os.path.join(workdir, "csv", relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if path.endswith(".json"):
+                df.to_json(path, orient="records")
+            else:
+                df.to_csv(path, index=False)
+            write_stage(stage, df, dataset, root=os.path.join(workdir, "stages"))
+            paths[dataset] = path
+        if paths:
+            layout[stage] = paths
+    return layout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="copies of each stage to time on")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="stage_bench_")
+    try:
+        layout = prepare(workdir, args.scale)
+        root = os.path.join(workdir, "stages")
+        print(f"{'stage':<15} {'rows':>7} {'csv (ms)':>9} {'parquet (ms)':>13} {'speedup':>8} "
+              f"{'subset (ms)':>12} {'csv kB':>8} {'pq kB':>7}")
+        for stage, paths in layout.items():
+            rows = len(read_stage(stage, root=root))
+            csv_time = timed(lambda: csv_load(stage, paths))
+            pq_time = timed(lambda: read_stage(stage, root=root))
+            if is_partitioned(stage):
+                subset = dict(columns=PROJECTIONS[stage], filters=[("dataset", "==", DATASETS[0])])
+            else:
+                subset = dict(columns=PROJECTIONS[stage], filters=ROW_FILTERS[stage])
+            subset_time = timed(lambda: read_stage(stage, root=root, **subset))
+            csv_size = sum(os.path.getsize(p) for p in paths.values())
+            pq_size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(os.path.join(root, stage))
+                          for f in files)
+            print(f"{stage:<15} {rows:>7} {csv_time * 1e3:>9.1f} {pq_time * 1e3:>13.1f} "
+                  f"{csv_time / pq_time:>7.1f}x {subset_time * 1e3:>12.1f} {csv_size / 1e3:>8.0f} {pq_size / 1e3:>7.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
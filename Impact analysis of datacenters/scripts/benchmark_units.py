@@ -0,0 +1,168 @@
+"""
+Golden check and benchmark for units.py against the notebook's per-row .apply functions.
+
+    python benchmark_units.py build-golden    # data/power + data/area_power -> data/units_golden.csv
+    python benchmark_units.py                 # check against the golden set, then time both paths
+
+The golden set holds every distinct (kind, value, whitespace) input from the saved power and
+area CSVs with the standardized value the notebook stored for it.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from units import standardize_power, resolve_area
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+GOLDEN_FILE = os.path.join(DATA_DIR, "units_golden.csv")
+SOURCES = ["hawk", "centers", "map"]
+
+
+# The .apply path, as in "Inital data preparation.ipynb"
+def legacy_standardize_power(value):
+    if pd.isna(value) or value == "" or "No data" in str(value) or "Not Available" in str(value):
+        return np.nan
+    value = str(value).replace(",", "").strip()
+    multiplier_match = re.match(r"(\d+)\s*x\s*(\d+)\s*(kW|MW)", value, re.IGNORECASE)
+    if multiplier_match:
+        count, num, unit = multiplier_match.groups()
+        total = int(count) * float(num)
+        return total if unit.lower() == "mw" else total / 1000
+    multiple_values = re.findall(r"(\d+\.?\d*)\s*(kW|MW)", value, re.IGNORECASE)
+    if multiple_values:
+        return sum(float(num) / 1000 if unit.lower() == "kw" else float(num) for num, unit in multiple_values)
+    range_match = re.search(r"(\d+\.?\d*)\s*(kW|MW)?\s*(?:to|-)\s*(\d+\.?\d*)\s*(kW|MW)?", value, re.IGNORECASE)
+    if range_match:
+        _, _, high, high_unit = range_match.groups()
+        high = float(high)
+        return high if (high_unit and high_unit.lower() == "mw") else high / 1000
+    approx_match = re.search(r"(\d+\.?\d*)\s*(kW|MW)", value, re.IGNORECASE)
+    if approx_match:
+        num, unit = approx_match.groups()
+        return float(num) if unit.lower() == "mw" else float(num) / 1000
+    if re.match(r"^\d+(\.\d+)?$", value):
+        num = float(value)
+        return num / 1000 if num > 10000 else num
+    return np.nan
+
+
+def legacy_convert_to_sqft(area):
+    if pd.isna(area) or not isinstance(area, str) or area.strip() == "":
+        return None
+    area = area.lower().replace(",", "").strip()
+    million_match = re.match(r"([\d.]+)\s*(m|million)\s*sf", area)
+    if million_match:
+        return int(float(million_match.group(1)) * 1_000_000)
+    acre_match = re.match(r"([\d.]+)\s*acre", area)
+    if acre_match:
+        return int(float(acre_match.group(1)) * 43560)
+    sqm_match = re.match(r"([\d.]+)\s*(square meters|sqm)", area)
+    if sqm_match:
+        return int(float(sqm_match.group(1)) * 10.764)
+    range_match = re.search(r"(\d+\.?\d*)\s*(sq.?ft.?|sf)?\s*(?:to|-)\s*(\d+\.?\d*)\s*(sq.?ft.?|sf)?", area)
+    if range_match:
+        return int(float(range_match.groups()[2]))
+    sqft_match = re.search(r"([\d]+(?:\.\d+)?)\s*(sq.?ft.?|sf|sq.?f.?|square feet)?", area)
+    if sqft_match:
+        return int(float(sqft_match.group(1)))
+    return None
+
+
+def legacy_resolve_area_conflict(area, whitespace):
+    area_val = legacy_convert_to_sqft(area)
+    whitespace_val = legacy_convert_to_sqft(whitespace)
+    if pd.isna(area_val) and not pd.isna(whitespace_val):
+        return whitespace_val
+    elif not pd.isna(area_val) and pd.isna(whitespace_val):
+        return area_val
+    elif not pd.isna(area_val) and not pd.isna(whitespace_val):
+        return max(area_val, whitespace_val)
+    return np.nan
+
+
+def build_golden(path: str = GOLDEN_FILE) -> pd.DataFrame:
+    frames = []
+    for source in SOURCES:
+        power = pd.read_csv(os.path.join(DATA_DIR, "power", f"{source}_power.csv"), usecols=["Power", "Power_Standardized"])
+        frames.append(pd.DataFrame({"kind": "power", "value": power["Power"], "whitespace": np.nan,
+                                    "expected": power["Power_Standardized"]}))
+        area = pd.read_csv(os.path.join(DATA_DIR, "area_power", f"{source}_area_cleaned.csv"),
+                           usecols=["Area", "Whitespace", "Area_Standardized"])
+        frames.append(pd.DataFrame({"kind": "area", "value": area["Area"], "whitespace": area["Whitespace"],
+                                    "expected": area["Area_Standardized"]}))
+    golden = pd.concat(frames, ignore_index=True)
+    golden = golden[golden["value"].notna() | golden["whitespace"].notna()]
+    golden = golden.drop_duplicates(["kind", "value", "whitespace"]).sort_values(["kind", "value", "whitespace"])
+    golden.to_csv(path, index=False)
+    print(f"Wrote {len(golden)} golden cases to {path}")
+    return golden
+
+
+def check_golden(path: str = GOLDEN_FILE) -> int:
+    golden = pd.read_csv(path, dtype={"value": object, "whitespace": object})
+    power = golden[golden["kind"] == "power"]
+    area = golden[golden["kind"] == "area"]
+    power_got = standardize_power(power["value"])
+    area_got = resolve_area(area["value"], area["whitespace"])
+    failures = 0
+    for name, cases, got in [("power", power, power_got), ("area", area, area_got)]:
+        bad = ~np.isclose(got["value"], cases["expected"], rtol=1e-12, equal_nan=True)
+        failures += int(bad.sum())
+        print(f"{name}: {len(cases)} cases, {int(bad.sum())} mismatches; statuses {got['status'].value_counts().to_dict()}")
+        if bad.any():
+            print(cases[bad].assign(got=got["value"][bad]).head(10).to_string())
+    return failures
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(scale: int):
+    frames = [pd.read_csv(os.path.join(DATA_DIR, "area_power", f"{s}_area_cleaned.csv"),
+                          usecols=["Power", "Area", "Whitespace"]) for s in SOURCES]
+    df = pd.concat(frames * scale, ignore_index=True)
+    print(f"\n{len(df)} rows (hawk + centers + map x {scale})")
+
+    power_apply = timed(lambda: df["Power"].apply(legacy_standardize_power))
+    power_vector = timed(lambda: standardize_power(df["Power"]))
+    area_apply = timed(lambda: df.apply(lambda row: legacy_resolve_area_conflict(row["Area"], row["Whitespace"]), axis=1))
+    area_vector = timed(lambda: resolve_area(df["Area"], df["Whitespace"]))
+
+    same_power = np.allclose(df["Power"].apply(legacy_standardize_power), standardize_power(df["Power"])["value"],
+                             rtol=1e-12, equal_nan=True)
+    legacy_area = df.apply(lambda row: legacy_resolve_area_conflict(row["Area"], row["Whitespace"]), axis=1)
+    same_area = np.allclose(legacy_area.astype(float), resolve_area(df["Area"], df["Whitespace"])["value"], equal_nan=True)
+
+    print(f"{'':<8} {'apply (s)':>10} {'vectorized (s)':>15} {'speedup':>8} {'identical':>10}")
+    print(f"{'power':<8} {power_apply:>10.3f} {power_vector:>15.3f} {power_apply / power_vector:>7.1f}x {str(same_power):>10}")
+    print(f"{'area':<8} {area_apply:>10.3f} {area_vector:>15.3f} {area_apply / area_vector:>7.1f}x {str(same_area):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", nargs="?", default="check", choices=["check", "build-golden"])
+    parser.add_argument("--golden", default=GOLDEN_FILE)
+    parser.add_argument("--scale", type=int, default=20, help="copies of the three datasets to time on")
+    args = parser.parse_args()
+
+    if args.command == "build-golden":
+        build_golden(args.golden)
+        return
+    failures = check_golden(args.golden)
+    benchmark(args.scale)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
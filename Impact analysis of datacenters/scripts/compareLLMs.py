@@ -2,15 +2,29 @@ import os
 import json
 import csv
 import openai
+from itertools import islice
 from time import sleep
 
+from llm_cache import LLMCache, CACHE_FILE, completion_key
+from stream_sources import iter_top_level
+from batch_extract import (BATCH_SIZE, batch_item_key, batch_max_tokens, batch_messages,
+                           pack_batches, parse_batch_response)
+
 # Set your OpenAI API key (or set it via your environment variable)
 openai.api_key = "API_KEY"
 
-def extract_fields_from_json(facility_json_str: str, model: str) -> dict:
+SYSTEM_PROMPT = "You are a helpful AI that extracts structured information from JSON."
+
+FIELDS = [
+    "Name", "Provider", "StreetAddress", "City", "ZipCode", "State", "Country",
+    "Whitespace", "Area", "YearBuilt", "Power", "Scale", "Certifications", "URL"
+]
+
+def extract_fields_from_json(facility_json_str: str, model: str, cache: LLMCache = None) -> dict:
     """
     Sends the facility JSON (as a string) to the specified OpenAI model for extraction.
     Returns a dict with standardized fields.
+    Responses are looked up in / stored to `cache` when one is given.
     """
     prompt = f"""
 You are an AI assistant that extracts specific standardized information from a facility's JSON data.
@@ -51,11 +65,15 @@ Output format (strict JSON):
 }}
 Do not include any extra keys.
     """
+    key = completion_key(model, SYSTEM_PROMPT, prompt, 0.0, 300)
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        return json.loads(cached)
     try:
         response = openai.chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": "You are a helpful AI that extracts structured information from JSON."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.0,
@@ -63,6 +81,9 @@ Do not include any extra keys.
         )
         content = response.choices[0].message.content.strip()
         extracted_data = json.loads(content)
+        if cache:
+            cache.put(key, content, model)
+        sleep(0.5)  # Reduce API rate limit issues (cache hits skip this)
     except Exception as e:
         print("Error during extraction:", e)
         extracted_data = {
@@ -83,6 +104,44 @@ Do not include any extra keys.
         }
     return extracted_data
 
+def extract_batch(facilities: dict, model: str, cache: LLMCache = None) -> dict:
+    """
+    Extract several facilities (unique_key -> facility JSON string) with one request.
+    Only facilities missing or invalid in the answer fall back to `extract_fields_from_json`.
+    Returns unique_key -> extracted fields.
+    """
+    results = {}
+    pending = {}
+    for key, facility_json_str in facilities.items():
+        cached = cache.get(batch_item_key(model, facility_json_str, FIELDS)) if cache else None
+        if cached is not None:
+            results[key] = json.loads(cached)
+        else:
+            pending[key] = facility_json_str
+
+    if len(pending) > 1:
+        try:
+            response = openai.chat.completions.create(
+                model=model,
+                messages=batch_messages(pending, FIELDS),
+                temperature=0.0,
+                max_tokens=batch_max_tokens(model, len(pending))
+            )
+            parsed = parse_batch_response(response.choices[0].message.content, pending.keys(), FIELDS)
+            sleep(0.5)  # Reduce API rate limit issues
+        except Exception as e:
+            print("Error during batch extraction:", e)
+            parsed = {}
+        for key, extracted in parsed.items():
+            results[key] = extracted
+            if cache:
+                cache.put(batch_item_key(model, pending[key], FIELDS), json.dumps(extracted), model)
+
+    for key in pending:
+        if key not in results:
+            results[key] = extract_fields_from_json(pending[key], model, cache)
+    return results
+
 def load_progress(output_file: str):
     """Load already processed records if the output file exists."""
     if os.path.exists(output_file):
@@ -110,45 +169,51 @@ def save_progress(output_file: str, data: list):
         writer.writeheader()  # Write column names
         writer.writerows(data)  # Write extracted data as rows
 
-def process_data(input_file: str, output_file: str, model: str, max_rows: int = 50):
+def process_data(input_file: str, output_file: str, model: str, max_rows: int = 50,
+                 cache: LLMCache = None, batch_size: int = BATCH_SIZE):
     """
     Generic function to process JSON data with a limit of max_rows.
     Works for datacenterhawk, datacenters.com, and datacentermap.
+    Up to `batch_size` facilities are sent per request (batch_size=1 disables batching).
     """
     progress = []
     count = 0
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for key, value in data.items():
-        if count >= max_rows:
-            break
-        unique_key = key  # Unique identifier
-        facility_json_str = json.dumps(value, ensure_ascii=False)
-        extracted = extract_fields_from_json(facility_json_str, model)
-        result = {
-            "unique_key": unique_key,
-            "source": input_file.split("_")[0],  # Derive source from filename
-            "Name": extracted.get("Name", ""),
-            "Provider": extracted.get("Provider", ""),
-            "StreetAddress": extracted.get("StreetAddress", ""),
-            "City": extracted.get("City", ""),
-            "ZipCode": extracted.get("ZipCode", ""),
-            "State": extracted.get("State", ""),
-            "Country": extracted.get("Country", ""),
-            "Whitespace": extracted.get("Whitespace", ""),
-            "Area": extracted.get("Area", ""),
-            "YearBuilt": extracted.get("YearBuilt", ""),
-            "Power": extracted.get("Power", ""),
-            "Scale": extracted.get("Scale", ""),
-            "Certifications": extracted.get("Certifications", ""),
-            "URL": extracted.get("URL", "") or value.get("Url", "")
-        }
-        progress.append(result)
-        count += 1
-        print(f"[{model}] Processed {unique_key}")
-        sleep(0.5)  # Reduce API rate limit issues
+    # Stream the input: only the first max_rows entries are ever parsed
+    items = [
+        (key, json.dumps(value, ensure_ascii=False), value)
+        for key, value in islice(iter_top_level(input_file), max_rows)
+    ]
+    for batch in pack_batches(items, model, FIELDS, batch_size):
+        facilities = {unique_key: facility_json_str for unique_key, facility_json_str, _ in batch}
+        if len(batch) == 1:
+            extracted_batch = {key: extract_fields_from_json(text, model, cache) for key, text in facilities.items()}
+        else:
+            extracted_batch = extract_batch(facilities, model, cache)
+
+        for unique_key, _, value in batch:
+            extracted = extracted_batch[unique_key]
+            result = {
+                "unique_key": unique_key,
+                "source": input_file.split("_")[0],  # Derive source from filename
+                "Name": extracted.get("Name", ""),
+                "Provider": extracted.get("Provider", ""),
+                "StreetAddress": extracted.get("StreetAddress", ""),
+                "City": extracted.get("City", ""),
+                "ZipCode": extracted.get("ZipCode", ""),
+                "State": extracted.get("State", ""),
+                "Country": extracted.get("Country", ""),
+                "Whitespace": extracted.get("Whitespace", ""),
+                "Area": extracted.get("Area", ""),
+                "YearBuilt": extracted.get("YearBuilt", ""),
+                "Power": extracted.get("Power", ""),
+                "Scale": extracted.get("Scale", ""),
+                "Certifications": extracted.get("Certifications", ""),
+                "URL": extracted.get("URL", "") or value.get("Url", "")
+            }
+            progress.append(result)
+            count += 1
+            print(f"[{model}] Processed {unique_key}")
 
     save_progress(output_file, progress)
     print(f"[{model}] Finished processing {input_file}. Total records: {count}")
@@ -167,11 +232,14 @@ def main():
         "datacenters": "centers_final.json"
     }
 
-    for model in models:
-        print(f"=== Testing with model: {model} ===")
-        for dataset, input_file in datasets.items():
-            output_file = f"{dataset}_extracted_{model}.csv"
-            process_data(input_file, output_file, model, test_rows)
+    # Responses are memoized across models, datasets and reruns
+    with LLMCache(CACHE_FILE) as cache:
+        for model in models:
+            print(f"=== Testing with model: {model} ===")
+            for dataset, input_file in datasets.items():
+                output_file = f"{dataset}_extracted_{model}.csv"
+                process_data(input_file, output_file, model, test_rows, cache)
+        print(f"LLM cache: {cache.stats()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,412 @@
+"""
+Entity resolution across the hf / mf / cf geocoded datasets (datacenterhawk, datacentermap,
+datacenters.com), which list many of the same buildings under slightly different names.
+
+Instead of comparing every record with every other one, candidates are blocked: two records
+are only compared when they share a block key, which is
+- their 5-digit ZIP code,
+- their geohash cell (precision 6, about 1.2 x 0.6 km), when geocoded,
+- house number + street name + state, since most datacenterhawk rows have neither of the above.
+Candidate pairs are scored with TF-IDF cosine similarity of hashed character trigrams on the
+name, provider and normalized address (row-wise dot products of L2-normalized sparse vectors,
+so a whole batch of pairs is scored at once), pairs above the threshold are unioned into
+components, and each component becomes one facility with a canonical id and merged fields.
+
+    python entity_resolution.py --inputs ../data/GeoCoded/hf_geocoded.csv ../data/GeoCoded/mf_geocoded.csv \
+        ../data/GeoCoded/cf_geocoded.csv --output resolved_facilities.csv --crosswalk facility_crosswalk.csv
+    python entity_resolution.py --synthetic 100000   # timing on generated facilities with known duplicates
+"""
+import os
+import re
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from geocoding import normalize_address, extract_zip, MISSING
+
+GEO_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "GeoCoded"))
+INPUTS = [os.path.join(GEO_DIR, f"{prefix}_geocoded.csv") for prefix in ("hf", "mf", "cf")]
+GEOHASH_PRECISION = 6
+MAX_BLOCK = 500  # larger blocks are skipped (and reported) rather than compared all-pairs
+THRESHOLD = 0.7
+MAX_DISTANCE_KM = 1.0  # geocoded records further apart than this never match
+WEIGHTS = {"address": 0.5, "name": 0.3, "provider": 0.2}
+PAIR_BATCH = 200_000
+MAX_CHARS = 96  # longer strings are truncated before taking n-grams
+HASH_DIMS = 1 << 20
+BASE32 = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+# Words that say nothing about which building a name or provider refers to
+NAME_NOISE = {"data", "center", "centers", "centre", "centres", "datacenter", "datacenters", "campus",
+              "facility", "the", "inc", "llc", "ltd", "corp", "co", "featured"}
+NOISE_PATTERN = r"\b(?:" + "|".join(sorted(NAME_NOISE)) + r")\b"
+UNKNOWN_NAMES = MISSING | {"not available", "unknown", "tbd"}
+
+
+def geohash(lat, lon, precision: int = GEOHASH_PRECISION) -> np.ndarray:
+    """Geohash strings for arrays of coordinates (None where a coordinate is missing)."""
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    bits = 5 * precision
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+    located = ~(np.isnan(lat) | np.isnan(lon))
+    # Quantize each axis to its bit count, then interleave the bits, longitude first
+    x = np.clip(((np.nan_to_num(lon) + 180) / 360 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+    y = np.clip(((np.nan_to_num(lat) + 90) / 180 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    code = np.zeros(len(lat), dtype=np.int64)
+    for i in range(bits):
+        axis, shift = (x, lon_bits - 1 - i // 2) if i % 2 == 0 else (y, lat_bits - 1 - i // 2)
+        code = (code << 1) | ((axis >> shift) & 1)
+    chars = np.stack([BASE32[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision)], axis=1)
+    hashes = np.array(["".join(row) for row in chars], dtype=object) if len(lat) else np.array([], dtype=object)
+    hashes[~located] = None
+    return hashes
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """Lower-case words of facility or provider names without punctuation and generic words."""
+    names = names.astype("string").str.strip().str.replace(r"(?i)featured$", "", regex=True).str.lower()
+    names = names.str.replace(r"[^0-9a-z]+", " ", regex=True)
+    names = names.str.replace(NOISE_PATTERN, " ", regex=True).str.replace(r"\s+", " ", regex=True).str.strip().fillna("")
+    return names.where(~names.isin(UNKNOWN_NAMES), "").astype(object)
+
+
+def site_codes(name: str, address: str) -> frozenset:
+    """
+    Short tokens with digits in a normalized name ("dc2", "lax10", "3"), which tell apart
+    buildings of one campus; the record's own house number does not count.
+    """
+    number = re.match(r"\s*(\d+)", address or "")
+    return frozenset(t for t in (name or "").split()
+                     if len(t) <= 6 and any(ch.isdigit() for ch in t) and (not number or t != number.group(1)))
+
+
+def street_key(address: str, state) -> str:
+    """'<house number> <first street word> <state>' from a normalized street address, or None."""
+    match = re.match(r"\s*(\d+)(?:-\d+)?\s+([a-z0-9]+)", address or "")
+    if not match:
+        return None
+    state = state.strip().lower() if isinstance(state, str) else ""
+    return f"{match.group(1)} {match.group(2)} {state}".strip()
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    return df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+
+
+def _map_unique(values: pd.Series, fn) -> pd.Series:
+    """`fn` applied once per distinct value (the same address is often listed by all three sources)."""
+    return values.map({value: fn(value) for value in values.unique()})
+
+
+def prepare_records(frames) -> pd.DataFrame:
+    """Concatenate the source frames and add the normalized fields and block keys."""
+    records = pd.concat(frames, ignore_index=True)
+    street = _column(records, "streetaddress").where(_column(records, "streetaddress").notna(),
+                                                      _column(records, "full_address"))
+    address = street.fillna("").astype(str)
+    for part in ("city", "state"):
+        address = address + ", " + _column(records, part).fillna("").astype(str)
+    records["norm_address"] = _map_unique(address, normalize_address)
+    records["norm_name"] = normalize_names(_column(records, "name"))
+    records["norm_provider"] = normalize_names(_column(records, "provider"))
+    # Without the street part, so a five-digit house number is not taken for the ZIP
+    after_street = _column(records, "full_address").astype("string").str.replace(r"^[^,]*,", "", regex=True)
+    records["zip5"] = [extract_zip(a if isinstance(a, str) else None, z)
+                       for a, z in zip(after_street, _column(records, "zipcode"))]
+    records["geohash"] = geohash(_column(records, "latitude"), _column(records, "longitude"))
+    norm_street = records["norm_address"].str.replace(r",.*", "", regex=True).where(street.notna(), "")
+    records["street_key"] = [street_key(s, st) for s, st in zip(norm_street, _column(records, "state"))]
+    return records
+
+
+def candidate_pairs(records: pd.DataFrame, keys=("zip5", "geohash", "street_key"), max_block: int = MAX_BLOCK):
+    """
+    (left, right) row positions, left < right, of every pair sharing at least one block key,
+    plus the block-size statistics for the report.
+    """
+    pairs, stats = [], {}
+    for key in keys:
+        blocks = pd.DataFrame({"block": pd.factorize(records[key])[0], "row": np.arange(len(records))})
+        blocks = blocks[blocks["block"] >= 0]
+        sizes = blocks.groupby("block")["row"].transform("size")
+        stats[key] = blocks.groupby("block").size()
+        usable = blocks[(sizes > 1) & (sizes <= max_block)]
+        joined = usable.merge(usable, on="block")
+        joined = joined[joined["row_x"] < joined["row_y"]]
+        pairs.append(joined["row_x"].to_numpy() * len(records) + joined["row_y"].to_numpy())
+    codes = np.unique(np.concatenate(pairs)) if pairs else np.zeros(0, dtype=np.int64)
+    return codes // len(records), codes % len(records), stats
+
+
+def char_ngram_tfidf(values, n: int = 3, dims: int = HASH_DIMS) -> sparse.csr_matrix:
+    """
+    L2-normalized TF-IDF rows of the hashed character n-grams of `values` (padded with a
+    space at both ends), computed on a byte matrix with numpy instead of a Python tokenizer.
+    """
+    encoded = np.array([f" {v} ".encode("utf-8")[:MAX_CHARS] for v in values], dtype=f"S{MAX_CHARS}")
+    chars = encoded.view(np.uint8).reshape(len(encoded), MAX_CHARS).astype(np.uint64)
+    lengths = np.char.str_len(encoded)
+    grams = np.zeros((len(encoded), MAX_CHARS - n + 1), dtype=np.uint64)
+    for k in range(n):
+        grams = (grams << np.uint64(8)) | chars[:, k:MAX_CHARS - n + 1 + k]
+    valid = np.arange(MAX_CHARS - n + 1) <= (lengths - n)[:, None]
+    rows = np.nonzero(valid)[0]
+    # Fibonacci hashing: the top bits of the 64-bit product depend on every input bit (the low
+    # bits would only depend on the low input bits, i.e. drop the first character's high bits)
+    bits = np.uint64(int(dims).bit_length() - 1)
+    columns = ((grams[valid] * np.uint64(0x9E3779B97F4A7C15)) >> (np.uint64(64) - bits)).astype(np.int64)
+    counts = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(encoded), dims))
+    counts.sum_duplicates()
+    # Smoothed idf, as sklearn's TfidfTransformer
+    document_frequency = np.bincount(counts.indices, minlength=dims)
+    idf = np.log((1 + len(encoded)) / (1 + document_frequency)) + 1
+    counts.data *= idf[counts.indices].astype(np.float32)
+    return normalize(counts)
+
+
+def _tfidf(values: np.ndarray) -> sparse.csr_matrix:
+    """TF-IDF rows for `values`, computed on the distinct strings only."""
+    uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+    return char_ngram_tfidf(uniques)[inverse]
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0088 * np.arcsin(np.sqrt(a))
+
+
+def score_pairs(records: pd.DataFrame, left: np.ndarray, right: np.ndarray, weights: dict = WEIGHTS,
+                batch: int = PAIR_BATCH) -> np.ndarray:
+    """
+    Weighted cosine similarity of the pairs over the fields both records have (weights are
+    renormalized over those), 0 for geocoded pairs more than MAX_DISTANCE_KM apart.
+    """
+    scores = np.zeros(len(left))
+    total = np.zeros(len(left))
+    # Only records that take part in some pair are vectorized
+    involved, positions = np.unique(np.concatenate([left, right]), return_inverse=True)
+    left, right = positions[:len(left)], positions[len(left):]
+    for field, weight in weights.items():
+        values = records[f"norm_{field}"].fillna("").to_numpy()[involved]
+        vectors = _tfidf(values)
+        present = values != ""
+        for start in range(0, len(left), batch):
+            i, j = left[start:start + batch], right[start:start + batch]
+            cosine = np.asarray(vectors[i].multiply(vectors[j]).sum(axis=1)).ravel()
+            both = present[i] & present[j]
+            scores[start:start + batch] += np.where(both, weight * cosine, 0.0)
+            total[start:start + batch] += np.where(both, weight, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(total > 0, scores / total, 0.0)
+    lat = _column(records, "latitude").to_numpy(dtype=float)[involved]
+    lon = _column(records, "longitude").to_numpy(dtype=float)[involved]
+    distance = _haversine_km(lat[left], lon[left], lat[right], lon[right])
+    scores[distance > MAX_DISTANCE_KM] = 0.0  # NaN distances (not geocoded) compare False
+    return scores
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size."""
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n)
+        self.size = np.ones(n, dtype=np.int64)
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def roots(self) -> np.ndarray:
+        """The root of every element, by pointer jumping over the whole parent array."""
+        parent = self.parent
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                return parent
+            parent = grand
+
+
+def merge_components(records: pd.DataFrame, component: np.ndarray, edge_scores: pd.Series) -> pd.DataFrame:
+    """
+    One row per facility: identifying fields from its most complete record, max power / area,
+    earliest year built, mean of the known coordinates, and the sources it was seen in.
+    """
+    df = records.assign(canonical_id=component)
+    key_cols = [c for c in ("name", "provider", "full_address", "zipcode", "latitude") if c in df.columns]
+    df["completeness"] = df[key_cols].notna().sum(axis=1)
+    df = df.sort_values(["canonical_id", "completeness"], ascending=[True, False], kind="stable")
+    grouped = df.groupby("canonical_id", sort=True)
+    text_cols = [c for c in ("name", "provider", "streetaddress", "city", "zipcode", "state", "country",
+                             "full_address", "url", "certifications") if c in df.columns]
+    merged = grouped[text_cols].first()  # first non-null, most complete record first
+    merged["zipcode"] = grouped["zip5"].first()
+    for column, how in (("power_standardized", "max"), ("area_standardized", "max"),
+                        ("latitude", "mean"), ("longitude", "mean")):
+        if column in df.columns:
+            merged[column] = grouped[column].agg(how)
+    if "yearbuilt" in df.columns:
+        merged["yearbuilt"] = pd.to_numeric(df["yearbuilt"], errors="coerce").groupby(df["canonical_id"]).min()
+    merged["record_count"] = grouped.size()
+    # Sources as a bit mask per facility, so joining the names is one lookup per distinct set
+    codes, names = pd.factorize(df["source"], sort=True)
+    bits = pd.Series(np.where(codes >= 0, 1 << codes.clip(0), 0), index=df.index)
+    masks = bits.groupby([df["canonical_id"], bits]).first().groupby(level=0).sum()
+    merged["sources"] = masks.map({m: "; ".join(n for i, n in enumerate(names) if m >> i & 1) for m in masks.unique()})
+    merged["match_score"] = edge_scores
+    merged.index = [f"F{i:06d}" for i in merged.index]
+    return merged.rename_axis("canonical_id").reset_index()
+
+
+def resolve(frames, threshold: float = THRESHOLD, max_block: int = MAX_BLOCK, report: bool = True):
+    """(facilities, crosswalk): merged facilities and each input record's canonical_id."""
+    timings = {}
+    started = time.perf_counter()
+    records = prepare_records(frames)
+    timings["normalize + keys"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    left, right, stats = candidate_pairs(records, max_block=max_block)
+    timings["blocking"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scores = score_pairs(records, left, right)
+    timings["scoring"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matched = scores >= threshold
+    # Conflicting site codes ("dc1" vs "dc2") mean different buildings at one address; a listing
+    # of several buildings ("dal1 2 3") still matches one of them ("dal2")
+    codes = [site_codes(n, a) for n, a in zip(records["norm_name"], records["norm_address"])]
+    for k in np.flatnonzero(matched):
+        a, b = codes[left[k]], codes[right[k]]
+        if a and b and not (a <= b or b <= a):
+            matched[k] = False
+    sets = UnionFind(len(records))
+    for a, b in zip(left[matched].tolist(), right[matched].tolist()):
+        sets.union(a, b)
+    component = pd.factorize(sets.roots())[0]
+    edge_scores = pd.Series(scores[matched]).groupby(component[left[matched]]).mean()
+    facilities = merge_components(records, component, edge_scores)
+    timings["union-find + merge"] = time.perf_counter() - started
+
+    crosswalk = records[[c for c in ("unique_key", "source", "name") if c in records.columns]].copy()
+    crosswalk["canonical_id"] = [f"F{i:06d}" for i in component]
+    if report:
+        print_report(len(records), stats, len(left), int(matched.sum()), len(facilities), timings, max_block)
+    return facilities, crosswalk
+
+
+def block_distribution(sizes: pd.Series, max_block: int = MAX_BLOCK) -> pd.Series:
+    bins = [0, 1, 2, 5, 10, 50, max_block, np.inf]
+    labels = ["1", "2", "3-5", "6-10", "11-50", f"51-{max_block}", f">{max_block} (skipped)"]
+    return pd.cut(sizes, bins=bins, labels=labels).value_counts(sort=False)
+
+
+def print_report(n_records: int, stats: dict, n_pairs: int, n_matches: int, n_facilities: int,
+                 timings: dict, max_block: int = MAX_BLOCK):
+    print(f"{n_records} records -> {n_facilities} facilities "
+          f"({n_pairs} candidate pairs scored, {n_matches} matched)")
+    all_pairs = n_records * (n_records - 1) // 2
+    print(f"Blocking compares {n_pairs / max(all_pairs, 1):.4%} of the {all_pairs} possible pairs")
+    table = pd.DataFrame({key: block_distribution(sizes, max_block) for key, sizes in stats.items()})
+    table.index.name = "block size"
+    print(table.to_string())
+    for key, sizes in stats.items():
+        keyed = int(sizes.sum())
+        print(f"  {key}: {len(sizes)} blocks over {keyed} records ({n_records - keyed} without a key), "
+              f"largest {int(sizes.max()) if len(sizes) else 0}")
+    print("  " + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()))
+
+
+def synthetic_sources(n: int, duplicate_rate: float = 0.3, seed: int = 0):
+    """
+    `n` generated facilities built from the real records: each gets a fresh location, ZIP and
+    house number, and a share of them is listed again by another source with a slightly
+    mangled name and address. Returns the frames and the true facility of every record.
+    """
+    rng = np.random.default_rng(seed)
+    real = pd.concat([pd.read_csv(path) for path in INPUTS if os.path.exists(path)], ignore_index=True)
+    base = real.iloc[rng.integers(0, len(real), n)].reset_index(drop=True)
+    base["name"] = base["name"].fillna("Facility") + " " + pd.Series(np.arange(n)).astype(str)
+    numbers = rng.integers(1, 99999, n).astype(str)
+    base["streetaddress"] = numbers + " " + base["streetaddress"].fillna("Main Street").str.replace(r"^[\d-]+\s*", "", regex=True)
+    base["zipcode"] = pd.Series(rng.integers(501, 99950, n)).map("{:05d}".format)
+    base["latitude"] = rng.uniform(25, 48, n)
+    base["longitude"] = rng.uniform(-123, -70, n)
+    base["full_address"] = base["streetaddress"] + ", " + base["city"].fillna("") + ", " + base["state"].fillna("") + \
+        ", " + base["zipcode"] + ", USA"
+    base["truth"] = np.arange(n)
+
+    dup = base.sample(frac=duplicate_rate, random_state=seed).copy()
+    sources = ["datacenterhawk", "datacentermap", "datacenters.com"]
+    dup["source"] = [sources[(sources.index(s) + 1) % 3] if s in sources else sources[0] for s in dup["source"]]
+    dup["name"] = dup["provider"].fillna("") + ": " + dup["name"] + " Data Center"
+    dup["streetaddress"] = dup["streetaddress"].str.replace("Street", "St.", regex=False) \
+        .str.replace("Drive", "Dr", regex=False).str.replace("Avenue", "Ave", regex=False)
+    # Half the second listings are not geocoded and have no ZIP, as with datacenterhawk
+    hidden = rng.random(len(dup)) < 0.5
+    dup.loc[hidden, ["latitude", "longitude", "zipcode"]] = np.nan
+    dup.loc[~hidden, "latitude"] += rng.normal(0, 2e-4, int((~hidden).sum()))
+    dup["full_address"] = dup["streetaddress"] + ", " + dup["city"].fillna("") + ", " + dup["state"].fillna("") + \
+        ", " + dup["zipcode"].fillna("None") + ", USA"
+    records = pd.concat([base, dup], ignore_index=True)
+    truth = records.pop("truth").to_numpy()
+    return [records], truth
+
+
+def pair_quality(predicted: np.ndarray, truth: np.ndarray):
+    """Pairwise precision and recall of a clustering against the true one."""
+    def same_pairs(labels):
+        counts = pd.Series(labels).value_counts()
+        return int((counts * (counts - 1) // 2).sum())
+    joint = pd.Series(list(zip(predicted, truth))).value_counts()
+    both = int((joint * (joint - 1) // 2).sum())
+    return both / max(same_pairs(predicted), 1), both / max(same_pairs(truth), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve the hf / mf / cf records into canonical facilities.")
+    parser.add_argument("--inputs", nargs="+", default=INPUTS)
+    parser.add_argument("--output", default="resolved_facilities.csv")
+    parser.add_argument("--crosswalk", help="also write unique_key / source -> canonical_id here")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--max-block", type=int, default=MAX_BLOCK)
+    parser.add_argument("--synthetic", type=int, help="resolve this many generated facilities instead")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        frames, truth = synthetic_sources(args.synthetic)
+        started = time.perf_counter()
+        facilities, crosswalk = resolve(frames, args.threshold, args.max_block)
+        print(f"Resolved in {time.perf_counter() - started:.2f}s")
+        precision, recall = pair_quality(crosswalk["canonical_id"].to_numpy(), truth)
+        print(f"{len(facilities)} facilities for {truth.max() + 1} true ones; "
+              f"pairwise precision {precision:.3f}, recall {recall:.3f}")
+        return
+
+    frames = [pd.read_csv(path) for path in args.inputs]
+    facilities, crosswalk = resolve(frames, args.threshold, args.max_block)
+    facilities.to_csv(args.output, index=False)
+    print(f"Wrote {len(facilities)} facilities to {args.output}")
+    if args.crosswalk:
+        crosswalk.to_csv(args.crosswalk, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,167 @@
 import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
 from bs4 import BeautifulSoup
 
-# Load the JSON file
-with open("addresses_with2.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
+from stream_sources import iter_top_level
+
+input_file = "addresses_with2.json"
+output_file = "addresses_extracted.json"
+
+# Tags whose contents BeautifulSoup's get_text() leaves out
+SKIPPED_TAGS = ["script", "style", "template"]
+
 
 # Function to extract plain text from HTML
 def extract_text_from_html(html_content):
     soup = BeautifulSoup(html_content, "html.parser")
     return soup.get_text(separator=" ", strip=True)
 
-# Iterate over states in the JSON file and update HTML keys with plain text
-for state, state_data in data.items():
-    details = state_data.get("details", [])
-    for detail in details:
-        addresses = detail.get("addresses", [])
-        for address in addresses:
-            if "overviewHTML" in address:
-                address["overviewHTML"] = extract_text_from_html(address["overviewHTML"])
-            if "specsHtml" in address:
-                address["specsHtml"] = extract_text_from_html(address["specsHtml"])
-
-# Save the updated JSON into a new file
-with open("addresses_extracted.json", "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-
-print("Updated JSON with extracted text saved to addresses_extracted.json.")
+
+def extract_text_lxml(html_content):
+    """Same as extract_text_from_html, with lxml building the tree (C parser)."""
+    soup = BeautifulSoup(html_content, "lxml")
+    return soup.get_text(separator=" ", strip=True)
+
+
+def extract_text_selectolax(html_content):
+    """get_text(separator=" ", strip=True) semantics on top of selectolax's lexbor parser."""
+    from selectolax.lexbor import LexborHTMLParser
+    tree = LexborHTMLParser(html_content)
+    if tree.root is None:
+        return ""
+    tree.strip_tags(SKIPPED_TAGS)
+    parts = []
+    for node in tree.root.traverse(include_text=True):
+        if node.tag == "-text":
+            text = node.text_content.strip()
+            if text:
+                parts.append(text)
+    return " ".join(parts)
+
+
+BACKENDS = {
+    "html.parser": extract_text_from_html,
+    "lxml": extract_text_lxml,
+    "selectolax": extract_text_selectolax,
+}
+
+
+def available_backends():
+    """Backends whose parser is installed, fastest first."""
+    backends = []
+    try:
+        import selectolax.lexbor  # noqa: F401
+        backends.append("selectolax")
+    except ImportError:
+        pass
+    try:
+        import lxml  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    backends.append("html.parser")
+    return backends
+
+
+@lru_cache(maxsize=None)
+def get_extractor(backend: str):
+    """'auto' picks the fastest installed backend; html.parser is always available."""
+    if backend == "auto":
+        backend = available_backends()[0]
+    return BACKENDS[backend]
+
+
+def convert_detail(detail: dict, backend: str = "html.parser") -> dict:
+    """Replace overviewHTML / specsHtml with plain text for every address of one city."""
+    extract = get_extractor(backend)
+    addresses = detail.get("addresses", [])
+    for address in addresses:
+        if "overviewHTML" in address:
+            address["overviewHTML"] = extract(address["overviewHTML"])
+        if "specsHtml" in address:
+            address["specsHtml"] = extract(address["specsHtml"])
+    return detail
+
+
+def _collect(state_data: dict, futures: list) -> dict:
+    if futures:
+        state_data["details"] = [future.result() for future in futures]
+    return state_data
+
+
+def _finished(pending: deque, keep: int = 0):
+    """Pop and yield the leading states whose cities are all converted, leaving the last `keep`."""
+    while len(pending) > keep and all(future.done() for future in pending[0][2]):
+        state, state_data, futures = pending.popleft()
+        yield state, _collect(state_data, futures)
+
+
+def convert_states(path: str, backend: str = "html.parser", workers: int = 1):
+    """
+    Yield (state, state_data) with the HTML converted, in input order.
+    With workers > 1 each city (detail) is converted in a process pool. At most
+    workers * 8 cities are in flight, across states and within one large state, so
+    memory stays flat while streaming the input.
+    """
+    if workers <= 1:
+        for state, state_data in iter_top_level(path):
+            for detail in state_data.get("details", []):
+                convert_detail(detail, backend)
+            yield state, state_data
+        return
+
+    max_in_flight = workers * 8
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()  # (state, state_data, futures) in input order
+        in_flight = deque()  # submitted cities not waited for yet, oldest first
+        for state, state_data in iter_top_level(path):
+            futures = []
+            pending.append((state, state_data, futures))
+            for detail in state_data.get("details", []):
+                while len(in_flight) >= max_in_flight:
+                    in_flight.popleft().result()
+                    # The state still being submitted stays pending
+                    yield from _finished(pending, keep=1)
+                future = pool.submit(convert_detail, detail, backend)
+                futures.append(future)
+                in_flight.append(future)
+            yield from _finished(pending)
+        while pending:
+            state_done, data_done, futures_done = pending.popleft()
+            yield state_done, _collect(data_done, futures_done)
+
+
+def write_states(states, path: str):
+    """
+    Write (state, state_data) pairs as one JSON object in the same layout as
+    json.dump(data, f, ensure_ascii=False, indent=2), one state at a time.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        first = True
+        for state, state_data in states:
+            body = json.dumps(state_data, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            f.write(("\n  " if first else ",\n  ") + json.dumps(state, ensure_ascii=False) + ": " + body)
+            first = False
+        f.write("}" if first else "\n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replace overviewHTML/specsHtml with plain text.")
+    parser.add_argument("--input", default=input_file)
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--workers", type=int, default=1, help="processes converting cities in parallel")
+    parser.add_argument("--backend", default="html.parser", choices=["auto"] + list(BACKENDS),
+                        help="HTML parser; html.parser (default) gives the reference output")
+    args = parser.parse_args()
+
+    write_states(convert_states(args.input, args.backend, args.workers), args.output)
+    print(f"Updated JSON with extracted text saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
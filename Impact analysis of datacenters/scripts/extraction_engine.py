@@ -0,0 +1,109 @@
+import asyncio
+import itertools
+import os
+import random
+
+import openai
+
+from rate_limit import TokenBucket
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for 429/5xx responses and connection/timeout errors."""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
+def retry_delay(error: Exception, attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Honor a Retry-After header if the server sent one, else exponential backoff with jitter."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        try:
+            return min(cap, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class ExtractionEngine:
+    """
+    Runs chat-completion requests concurrently against an OpenAI-compatible endpoint.
+    - at most `concurrency` requests in flight
+    - at most `requests_per_second` requests started per second (token bucket)
+    - retries with backoff on 429, 5xx and connection errors
+
+    `base_url` (or the OPENAI_BASE_URL environment variable) can point the engine
+    at a local stand-in chat-completions server.
+    Must be created inside the event loop that uses it.
+    """
+
+    def __init__(self, model: str = "gpt-3.5-turbo", concurrency: int = 8,
+                 requests_per_second: float = 5.0, max_retries: int = 5,
+                 base_url: str = None, api_key: str = None, timeout: float = 60.0):
+        self.model = model
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key or os.environ.get("OPENAI_API_KEY") or openai.api_key,
+            base_url=base_url or os.environ.get("OPENAI_BASE_URL"),
+            max_retries=0,  # retries are handled here so they respect the limiter
+            timeout=timeout,
+        )
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    async def complete(self, messages: list, temperature: float = 0.0, max_tokens: int = 300) -> str:
+        """Send one chat completion and return the stripped message content."""
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                if self.bucket:
+                    await self.bucket.acquire()
+                self.stats["requests"] += 1
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    )
+                    return (response.choices[0].message.content or "").strip()
+                except Exception as e:
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        self.stats["failures"] += 1
+                        raise
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(retry_delay(e, attempt))
+
+    async def map_unordered(self, worker, items, window: int = None):
+        """
+        Run the coroutine function `worker` on every item, yielding results as they finish.
+        Only `window` tasks are scheduled at a time so huge inputs are consumed lazily.
+        """
+        window = window or self.concurrency * 2
+        items = iter(items)
+        pending = {asyncio.ensure_future(worker(item)) for item in itertools.islice(items, window)}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for item in itertools.islice(items, len(done)):
+                    pending.add(asyncio.ensure_future(worker(item)))
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self):
+        await self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -1,48 +1,72 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
-import time
-import pandas as pd
+import argparse
 
-# Set up Chrome options
-chrome_options = Options()
-# chrome_options.add_argument('--headless')  # Uncomment to run in headless mode
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
 
-# Initialize the Chrome WebDriver with the new syntax
-driver = webdriver.Chrome(
-    service=Service(ChromeDriverManager().install()),
-    options=chrome_options
-)
+from result_sink import ResultSink
+from selenium_runner import make_driver, wait_for, wait_for_text_change
 
 url = "https://www.datacenters.com/locations?query=USA"
-driver.get(url)
-
-time.sleep(10)
-# Use XPath to locate elements
-# elements = driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__detailsContainer')]/div/div[3]")
-# for element in elements:
-#     print(element.text.strip())
-driver.find_element(By.XPATH, "//input[@id='locations-search']").send_keys("United States")
-time.sleep(5)
-item = driver.find_element(By.XPATH, "(//div[contains(@class,'LocationsIndex__pagination')][1]/div/nav/button/div[contains(text(),'➞')])[2]").is_enabled()
-while item:
-    time.sleep(5)
-    elements=driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__details__')]") 
-    providers= driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__provider')]")
-    locNames= driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__name_')]")
-    addresss= driver.find_elements(By.XPATH, "//div[contains(@class,'LocationTile__address_')]")
-    
-    for element,provider,locName,address in zip(elements,providers,locNames,addresss):
-        
-        pd.DataFrame({
-            'Provider': [provider.text.strip()],
-            'Location Name': [locName.text.strip()],
-            'Address': [address.text.strip()]
-        }).to_csv('datacenters.csv', mode='a', header = False ,index=False)
-    
-    driver.find_element(By.XPATH, "(//div[contains(@class,'LocationsIndex__pagination')][1]/div/nav/button/div[contains(text(),'➞')])[2]").click()
-    if item == False:
-        break
-driver.quit()
\ No newline at end of file
+output_file = 'datacenters.csv'
+COLUMNS = ['Provider', 'Location Name', 'Address']
+
+SEARCH_BOX = "//input[@id='locations-search']"
+TILE_DETAILS = "//div[contains(@class,'LocationTile__details__')]"
+TILE_PROVIDER = "//div[contains(@class,'LocationTile__provider')]"
+TILE_NAME = "//div[contains(@class,'LocationTile__name_')]"
+TILE_ADDRESS = "//div[contains(@class,'LocationTile__address_')]"
+# The "➞" button of the first pagination bar
+NEXT_PAGE = "(//div[contains(@class,'LocationsIndex__pagination')][1]/div/nav/button/div[contains(text(),'➞')])[2]/.."
+
+
+def open_listing(driver, listing_url=url, query="United States"):
+    driver.get(listing_url)
+    wait_for(driver, SEARCH_BOX, EC.element_to_be_clickable).send_keys(query)
+    wait_for(driver, TILE_NAME, EC.visibility_of_element_located)
+
+
+def next_page(driver) -> bool:
+    """Click "next" and wait for the tiles to change; False on the last page."""
+    buttons = driver.find_elements(By.XPATH, NEXT_PAGE)
+    if not buttons or not buttons[0].is_enabled():
+        return False
+    first_name = driver.find_element(By.XPATH, TILE_NAME).text
+    buttons[0].click()
+    wait_for_text_change(driver, TILE_NAME, first_name)
+    return True
+
+
+def page_tiles(driver):
+    """(provider, location name, address) elements of the tiles on the current page."""
+    return list(zip(driver.find_elements(By.XPATH, TILE_PROVIDER),
+                    driver.find_elements(By.XPATH, TILE_NAME),
+                    driver.find_elements(By.XPATH, TILE_ADDRESS)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape provider, name and address of every datacenters.com location.")
+    parser.add_argument("--url", default=url, help="locations page (or a local fixture with the same markup)")
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--show", action="store_true", help="show the browser window instead of running headless")
+    args = parser.parse_args()
+
+    driver = make_driver(headless=not args.show)
+    sink = ResultSink(args.output, COLUMNS, key=COLUMNS)
+    try:
+        open_listing(driver, args.url)
+        while True:
+            for provider, locName, address in page_tiles(driver):
+                sink.write({
+                    'Provider': provider.text.strip(),
+                    'Location Name': locName.text.strip(),
+                    'Address': address.text.strip()
+                })
+            if not next_page(driver):
+                break
+    finally:
+        sink.close()
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,71 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
-import time
+import argparse
+
 import pandas as pd
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support import expected_conditions as EC
-# Set up Chrome options
-chrome_options = Options()
-# chrome_options.add_argument('--headless')  # Uncomment to run in headless mode
-# Initialize the Chrome WebDriver with the new syntax
-driver = webdriver.Chrome(
-	service=Service(ChromeDriverManager().install()),
-	options=chrome_options
-)
-df = pd.read_csv('datacenters_with_add.csv')  # Replace with your CSV filename
-addresses = df['Street Address'].tolist()  # Replace 'street_address' with your column name
+
+from result_sink import ResultSink
+from selenium_runner import BrowserPool, wait_for
+
+input_file = 'datacenters_with_add.csv'
+output_file = 'datacentersYears.csv'
 url = "https://datacenterhawk.com/marketplace"
-driver.get(url)
-time.sleep(10)
-# Accept cookies if the button is present
-try:
-    driver.find_element(By.XPATH, "//button[contains(text(),'Accept')]").click()
-    time.sleep(5)
-except Exception as e:
-    print("No cookies acceptance button found or an error occurred:", str(e))
-driver.find_element(By.XPATH, "(//div[contains(text(),'Unlock Full List')])[1]").click()
-time.sleep(20) 
-# # Switch to the dialogue box iframe if necessary
-# try:
-#     # Wait until the modal is visible
-#     WebDriverWait(driver, 10).until(
-#         EC.visibility_of_element_located((By.ID, "modal"))  # Replace 'modal' with the actual modal ID
-#     )
-#     href_element = WebDriverWait(driver, 10).until(
-#         EC.element_to_be_clickable((By.XPATH, "//a[contains(@href, 'linkedin.com/oauth/v2/authorization')]"))
-#     )
-# except Exception as e:
-#     print("An error occurred while interacting with the modal:", str(e))
-# driver.find_element(By.XPATH,"//input[@id='username']").send_keys("rajuvenkat1011@gmail.com")
-# time.sleep(5)
-# driver.find_element(By.XPATH,"//input[@id='password']").send_keys("Raju@1011")
-# driver.find_element(By.XPATH,"//button[@type='submit']").click()
-# time.sleep(5)
-for address in addresses:
-    driver.get(url)
-    # driver.find_element(By.XPATH, "//div[@class='shrink-0']/a").click()
-    time.sleep(5)
-    driver.find_element(By.XPATH, "//input[@id='action-search']").send_keys(address)
-    time.sleep(5)
-    # Find all results and check size
-    results = driver.find_elements(By.XPATH, "//a[@id='result0']")
-    if len(results) > 0:
-        try:
-            driver.find_element(By.XPATH, "(//a[@id='result0'])[1]").click()
-            time.sleep(5)
-            YearBuilt = driver.find_element(By.XPATH, "//div[contains(text(),'Year Built')]/../div[2]").text
-            print(f"Year Built: {YearBuilt}")
-            time.sleep(5)
-            pd.DataFrame({
-			    'Address': [address],
-			    'Year': [YearBuilt.strip()],
-		    }).to_csv('datacentersYears.csv', mode='a', header=False, index=False)
-        except Exception as e:
-            print(f"Error processing {address}: {str(e)}")
-            continue
-    else:
-        pd.DataFrame({
-			    'Address': [address],
-			    'Year': ['Not Available'],
-		    }).to_csv('datacentersYears.csv', mode='a', header=False, index=False)
+
+ACCEPT_COOKIES = "//button[contains(text(),'Accept')]"
+UNLOCK_LIST = "(//div[contains(text(),'Unlock Full List')])[1]"
+SEARCH_BOX = "//input[@id='action-search']"
+FIRST_RESULT = "(//a[@id='result0'])[1]"
+YEAR_BUILT = "//div[contains(text(),'Year Built')]/../div[2]"
+# How long the search gets to show a first result before the address counts as not found
+RESULT_TIMEOUT = 5
+
+
+def open_marketplace(driver, marketplace_url=url):
+    """Per-browser setup: load the marketplace once, accept cookies and unlock the full list if offered."""
+    driver.get(marketplace_url)
+    try:
+        wait_for(driver, ACCEPT_COOKIES, EC.element_to_be_clickable, timeout=5).click()
+    except TimeoutException:
+        print("No cookies acceptance button found")
+    try:
+        wait_for(driver, UNLOCK_LIST, EC.element_to_be_clickable, timeout=5).click()
+    except TimeoutException:
+        pass
+
+
+def find_year(driver, address, marketplace_url=url):
+    """Search one address and return its Year Built, or 'Not Available' when the search has no result."""
+    driver.get(marketplace_url)
+    wait_for(driver, SEARCH_BOX, EC.element_to_be_clickable).send_keys(address)
+    try:
+        wait_for(driver, FIRST_RESULT, EC.element_to_be_clickable, timeout=RESULT_TIMEOUT).click()
+    except TimeoutException:
         print(f"No results found for {address}")
-        continue
-driver.quit()
\ No newline at end of file
+        return 'Not Available'
+    YearBuilt = wait_for(driver, YEAR_BUILT, EC.visibility_of_element_located).text
+    print(f"Year Built: {YearBuilt}")
+    return YearBuilt.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up Year Built for every address on datacenterhawk.")
+    parser.add_argument("--input", default=input_file)
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--url", default=url, help="marketplace page (or a local fixture with the same markup)")
+    parser.add_argument("--workers", type=int, default=4, help="browsers running in parallel")
+    parser.add_argument("--batch", type=int, default=20, help="rows buffered before each write")
+    parser.add_argument("--show", action="store_true", help="show the browser windows instead of running headless")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    addresses = list(dict.fromkeys(df['Street Address'].dropna().astype(str)))
+    with ResultSink(args.output, ['Address', 'Year'], key='Address', batch_size=args.batch) as sink:
+        todo = [address for address in addresses if address not in sink]
+        print(f"{len(addresses)} addresses, {len(addresses) - len(todo)} already in {args.output}, {len(todo)} to do")
+        pool = BrowserPool(args.workers, headless=not args.show, setup=lambda d: open_marketplace(d, args.url))
+        pool.run(todo, lambda driver, address: find_year(driver, address, args.url),
+                 lambda address, year: sink.write({'Address': address, 'Year': year}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Cached geocoding for the hf / mf / cf datasets.
+
+Addresses are normalized and deduplicated across all inputs before anything is looked up.
+Each unique address is resolved from, in order:
+1. the SQLite cache (earlier runs),
+2. the geocoder (Nominatim by default), through a worker pool under one global rate limit
+   (skipped with --offline),
+3. the centroid of its ZIP code from a local table (data/zip_centroids.csv).
+
+    python geocoding.py geocode --inputs hf.csv mf.csv cf.csv --outdir ../data/GeoCoded
+    python geocoding.py build-zip-table ../data/GeoCoded/*_geocoded.csv
+"""
+import os
+import re
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+CACHE_FILE = "geocode_cache.sqlite"
+ZIP_TABLE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "zip_centroids.csv"))
+# Nominatim's usage policy allows one request per second across all workers
+MIN_DELAY = 1.0
+WORKERS = 4
+
+# Street-type spellings folded together so "Main Street" and "Main St." share a cache entry
+ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "road": "rd", "drive": "dr", "boulevard": "blvd",
+    "parkway": "pkwy", "highway": "hwy", "lane": "ln", "court": "ct", "circle": "cir",
+    "place": "pl", "suite": "ste", "north": "n", "south": "s", "east": "e", "west": "w",
+    "united states": "usa", "united states of america": "usa", "us": "usa",
+}
+MISSING = {"", "nan", "none", "null", "n/a"}
+
+
+def normalize_address(address) -> str:
+    """Cache / dedup key: lower-case, no punctuation or placeholder parts, common abbreviations folded."""
+    if not isinstance(address, str):
+        return ""
+    parts = []
+    for part in address.lower().split(","):
+        part = re.sub(r"[.#]", " ", part)
+        part = " ".join(ABBREVIATIONS.get(word, word) for word in part.split())
+        part = ABBREVIATIONS.get(part, part)
+        if part not in MISSING:
+            parts.append(part)
+    return ", ".join(parts)
+
+
+def extract_zip(address, zipcode=None):
+    """5-digit US ZIP from the zipcode column, else from the address text."""
+    for text in (zipcode, address):
+        if isinstance(text, (int, float)) and not pd.isna(text):
+            text = f"{int(text):05d}"
+        if isinstance(text, str):
+            match = re.search(r"\b(\d{5})(?:-\d{4})?\b", text)
+            if match:
+                return match.group(1)
+    return None
+
+
+class RateLimiter:
+    """Thread-safe limiter: calls to wait() return at least `min_delay` seconds apart, across all threads."""
+
+    def __init__(self, min_delay: float = MIN_DELAY):
+        self.min_delay = min_delay
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            delay = self.next_call - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_call = time.monotonic() + self.min_delay
+
+
+class GeocodeCache:
+    """
+    Geocoder answers in SQLite, keyed by normalized address. Addresses the geocoder could not
+    find are stored too (source "not_found", no coordinates) so they are not asked again.
+    """
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            " key TEXT PRIMARY KEY,"
+            " address TEXT,"
+            " latitude REAL,"
+            " longitude REAL,"
+            " zipcode TEXT,"
+            " source TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, latitude, longitude, zipcode, source FROM geocodes WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for key, lat, lon, zipcode, source in rows:
+                found[key] = (lat, lon, zipcode, source)
+        return found
+
+    def put(self, key: str, address: str, lat, lon, zipcode, source: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO geocodes (key, address, latitude, longitude, zipcode, source, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, address, lat, lon, zipcode, source, time.time())
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def load_zip_table(path: str = ZIP_TABLE) -> dict:
+    """zip -> (latitude, longitude); empty when the table is missing."""
+    if not os.path.exists(path):
+        print(f"No ZIP centroid table at {path}; offline fallback disabled")
+        return {}
+    table = pd.read_csv(path, dtype={"zipcode": str})
+    return dict(zip(table["zipcode"], zip(table["latitude"], table["longitude"])))
+
+
+def build_zip_table(paths, output: str = ZIP_TABLE) -> pd.DataFrame:
+    """
+    Build the ZIP centroid table from geocoded CSVs (zipcode / latitude / longitude columns, e.g.
+    data/GeoCoded/*_geocoded.csv) or a Census ZCTA gazetteer file (GEOID / INTPTLAT / INTPTLONG).
+    Points outside the US bounding box are dropped; each ZIP gets the median of its points.
+    """
+    frames = []
+    for path in paths:
+        sep = "\t" if path.endswith(".txt") else ","
+        df = pd.read_csv(path, sep=sep, dtype=str)
+        df.columns = [c.strip() for c in df.columns]
+        if "GEOID" in df.columns:
+            df = df.rename(columns={"GEOID": "zipcode", "INTPTLAT": "latitude", "INTPTLONG": "longitude"})
+        else:
+            df = df.rename(columns=str.lower)
+            df["zipcode"] = [extract_zip(a, z) for a, z in zip(df.get("full_address", pd.Series(index=df.index)), df["zipcode"])]
+        frames.append(df[["zipcode", "latitude", "longitude"]])
+    points = pd.concat(frames, ignore_index=True)
+    points["latitude"] = pd.to_numeric(points["latitude"], errors="coerce")
+    points["longitude"] = pd.to_numeric(points["longitude"], errors="coerce")
+    points = points.dropna()
+    in_us = points["latitude"].between(18, 72) & points["longitude"].between(-180, -64)
+    table = (points[in_us].groupby("zipcode")[["latitude", "longitude"]].median()
+             .round(6).reset_index().sort_values("zipcode"))
+    table.to_csv(output, index=False)
+    print(f"Wrote {len(table)} ZIP centroids from {int(in_us.sum())} points to {output}")
+    return table
+
+
+def make_geocoder(provider: str = "nominatim", user_agent: str = "geo_similarity_app", domain: str = None,
+                  scheme: str = "https", api_key: str = None, timeout: int = 10):
+    """
+    Return address -> (lat, lon, zipcode) or None. `domain`/`scheme` point Nominatim at another
+    server (e.g. a local stub); provider "google" uses GoogleV3 with `api_key`.
+    """
+    if provider == "google":
+        from geopy.geocoders import GoogleV3
+        geolocator = GoogleV3(api_key=api_key or os.getenv("GOOGLE_API_KEY"), timeout=timeout)
+
+        def postcode(raw):
+            for component in raw.get("address_components", []):
+                if "postal_code" in component.get("types", []):
+                    return component.get("long_name")
+            return None
+        options = {}
+    else:
+        from geopy.geocoders import Nominatim
+        kwargs = {"user_agent": user_agent, "timeout": timeout, "scheme": scheme}
+        if domain:
+            kwargs["domain"] = domain
+        geolocator = Nominatim(**kwargs)
+
+        def postcode(raw):
+            return raw.get("address", {}).get("postcode")
+        options = {"addressdetails": True}
+
+    def geocode(address):
+        location = geolocator.geocode(address, **options)
+        if location is None:
+            return None
+        return location.latitude, location.longitude, postcode(location.raw)
+
+    return geocode
+
+
+class GeocodingService:
+    """
+    Resolves unique addresses from the cache, then the geocoder (unless `geocoder` is None),
+    then the ZIP centroid table. Geocoder calls run on `workers` threads sharing one RateLimiter;
+    errors are reported and not cached, so those addresses are tried again next run.
+    """
+
+    def __init__(self, cache_file: str = CACHE_FILE, zip_table: str = ZIP_TABLE, geocoder=None,
+                 min_delay: float = MIN_DELAY, workers: int = WORKERS, retry_not_found: bool = False):
+        self.cache = GeocodeCache(cache_file)
+        self.zip_centroids = load_zip_table(zip_table)
+        self.geocoder = geocoder
+        self.limiter = RateLimiter(min_delay)
+        self.workers = workers
+        self.retry_not_found = retry_not_found
+        self.stats = {"unique": 0, "cached": 0, "looked_up": 0, "errors": 0, "zip_centroid": 0, "unresolved": 0}
+
+    def _lookup(self, address):
+        self.limiter.wait()
+        return self.geocoder(address)
+
+    def resolve(self, addresses: dict) -> dict:
+        """
+        `addresses` maps normalized key -> (address, zip). Returns key -> (lat, lon, zipcode, source)
+        with source one of the geocoder's results ("geocoder"), "zip_centroid" or "unresolved".
+        """
+        self.stats["unique"] += len(addresses)
+        results = {}
+        cached = self.cache.get_many(addresses)
+        todo = []
+        for key in addresses:
+            hit = cached.get(key)
+            if hit and (hit[3] != "not_found" or not self.retry_not_found or self.geocoder is None):
+                results[key] = hit
+                self.stats["cached"] += 1
+            else:
+                todo.append(key)
+
+        if self.geocoder is not None and todo:
+            print(f"Geocoding {len(todo)} addresses ({self.workers} workers, {self.limiter.min_delay}s between calls)...")
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._lookup, addresses[key][0]): key for key in todo}
+                for i, future in enumerate(as_completed(futures), 1):
+                    key = futures[future]
+                    try:
+                        found = future.result()
+                    except Exception as e:
+                        print(f"Error geocoding '{addresses[key][0]}': {e}")
+                        self.stats["errors"] += 1
+                        continue
+                    self.stats["looked_up"] += 1
+                    lat, lon, zipcode = found if found else (None, None, None)
+                    source = "geocoder" if found else "not_found"
+                    self.cache.put(key, addresses[key][0], lat, lon, zipcode, source)
+                    results[key] = (lat, lon, zipcode, source)
+                    if i % 50 == 0:
+                        self.cache.commit()
+                        print(f"  {i}/{len(todo)}")
+            self.cache.commit()
+
+        for key, (address, zipcode) in addresses.items():
+            lat, lon, found_zip, source = results.get(key, (None, None, None, "unresolved"))
+            if lat is not None:
+                continue
+            zipcode = extract_zip(address, zipcode) or extract_zip(None, found_zip)
+            if zipcode in self.zip_centroids:
+                lat, lon = self.zip_centroids[zipcode]
+                results[key] = (lat, lon, found_zip or zipcode, "zip_centroid")
+                self.stats["zip_centroid"] += 1
+            else:
+                results[key] = (None, None, found_zip, "unresolved")
+                self.stats["unresolved"] += 1
+        return results
+
+    def geocode_frames(self, frames: dict, address_column: str = "full_address", zip_column: str = "zipcode") -> dict:
+        """
+        Geocode several DataFrames at once (e.g. {"hf": hf, "mf": mf, "cf": cf}). Identical addresses
+        are looked up once. Adds latitude / longitude / geocode_source and fills a missing zipcode
+        from the geocoder, like process_geocoding in the notebook.
+        """
+        unique = {}
+        keys = {}
+        for name, df in frames.items():
+            zips = df[zip_column] if zip_column in df.columns else pd.Series(None, index=df.index)
+            keys[name] = [normalize_address(a) for a in df[address_column]]
+            for key, address, zipcode in zip(keys[name], df[address_column], zips):
+                if key and key not in unique:
+                    unique[key] = (address, zipcode)
+        results = self.resolve(unique)
+
+        out = {}
+        for name, df in frames.items():
+            df = df.copy()
+            resolved = [results.get(key, (None, None, None, "unresolved")) for key in keys[name]]
+            df["latitude"] = [np.nan if r[0] is None else r[0] for r in resolved]
+            df["longitude"] = [np.nan if r[1] is None else r[1] for r in resolved]
+            df["geocode_source"] = [r[3] for r in resolved]
+            if zip_column in df.columns:
+                missing = df[zip_column].fillna("").astype(str).str.strip().str.lower().isin(MISSING)
+                df.loc[missing, zip_column] = [r[2] for r, m in zip(resolved, missing) if m]
+            out[name] = df
+        return out
+
+    def report(self):
+        s = self.stats
+        print(f"{s['unique']} unique addresses: {s['cached']} from cache, {s['looked_up']} looked up "
+              f"({s['errors']} errors), {s['zip_centroid']} ZIP centroids, {s['unresolved']} unresolved")
+
+    def close(self):
+        self.cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached geocoding with a ZIP centroid fallback.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    geocode = commands.add_parser("geocode", help="geocode CSVs with a full_address column")
+    geocode.add_argument("--inputs", nargs="+", required=True)
+    geocode.add_argument("--outdir", default=".")
+    geocode.add_argument("--cache", default=CACHE_FILE)
+    geocode.add_argument("--zip-table", default=ZIP_TABLE)
+    geocode.add_argument("--offline", action="store_true", help="cache and ZIP centroids only, no network")
+    geocode.add_argument("--provider", default="nominatim", choices=["nominatim", "google"])
+    geocode.add_argument("--domain", help="Nominatim host, e.g. a local mirror or stub (127.0.0.1:8080)")
+    geocode.add_argument("--scheme", default="https")
+    geocode.add_argument("--min-delay", type=float, default=MIN_DELAY, help="seconds between geocoder calls, all workers")
+    geocode.add_argument("--workers", type=int, default=WORKERS)
+    geocode.add_argument("--retry-not-found", action="store_true")
+
+    build = commands.add_parser("build-zip-table", help="derive the ZIP centroid table")
+    build.add_argument("paths", nargs="+")
+    build.add_argument("--output", default=ZIP_TABLE)
+    args = parser.parse_args()
+
+    if args.command == "build-zip-table":
+        build_zip_table(args.paths, args.output)
+        return
+
+    geocoder = None if args.offline else make_geocoder(args.provider, domain=args.domain, scheme=args.scheme)
+    service = GeocodingService(args.cache, args.zip_table, geocoder, args.min_delay, args.workers, args.retry_not_found)
+    frames = {path: pd.read_csv(path, dtype={"zipcode": str}) for path in args.inputs}
+    started = time.perf_counter()
+    try:
+        geocoded = service.geocode_frames(frames)
+    finally:
+        service.report()
+        service.close()
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    os.makedirs(args.outdir, exist_ok=True)
+    for path, df in geocoded.items():
+        name = os.path.splitext(os.path.basename(path))[0]
+        out = os.path.join(args.outdir, f"{name}_geocoded.csv")
+        df.to_csv(out, index=False)
+        print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,39 @@
+import os
+import re
 import json
-import ollama
-import jsonify
+import time
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from progress_journal import ProgressJournal, journal_path
+from stream_sources import iter_datacentermap
 
 # Load the input JSON file
 input_file = "addresses_extracted.json"
 output_file = "structured_output.json"
 
-with open(input_file, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Process data centers and structure output
-structured_data = []
-
-for state, state_data in data.items():
-    for city_details in state_data.get("details", []):
-        city_name = city_details.get("name", "Unknown City")
-        
-        for data_center in city_details.get("addresses", []):
-            # Extract fields from JSON
-            name = data_center.get("name", "Unknown")
-            address = ", ".join(filter(None, [data_center.get("address1"), data_center.get("address2"), data_center.get("address3")]))
-            overview = data_center.get("overviewHTML", "")
-            specs = data_center.get("specsHtml", "")
-
-            # Construct prompt for Ollama with escaped braces for literal JSON
-            prompt = f"""Extract the following details from the given data center information:
+MODEL = "llama3.1"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+# Generations kept in flight; the Ollama server needs OLLAMA_NUM_PARALLEL >= this to run them at once
+WORKERS = 4
+
+# Fixed instructions go first so every prompt shares the same prefix and the server's
+# prompt cache can reuse it; only the per-data-center part at the end changes.
+INSTRUCTIONS = """Extract the following details from the given data center information:
 - Name
 - Address
-- Latitude & Longitude 
+- Latitude & Longitude
 - Power Capacity (MW)
 - Year Built
 - Total Area (sq.ft)
 - Any other relevant metadata
 
-address: 
-{address}
-            
-Data Center Overview:
-{overview}
-
-Specifications:
-{specs}
-            
-            
-In following structured format and if the details are unknown then mark them as "Unknown":
-structured_entry = {{
+Answer with a single JSON object in the following structured format and if the details are unknown then mark them as "Unknown":
+{
     "Name": "",
     "Address": "",
     "Latitude": "",
@@ -52,40 +41,158 @@ structured_entry = {{
     "Power": "",
     "Year Built": "",
     "Area": "",
-    "Metadata": {{
-        "Other information": "in key value pairs" (information that could be useful for microclimate analysis)
-    }}
-}}
+    "Metadata": {
+        "Other information": "in key value pairs (information that could be useful for microclimate analysis)"
+    }
+}
 """
 
-            # Generate structured details using Ollama
-            response = ollama.generate(model="llama3.1", prompt=prompt)
-            print(response["response"])
-            response_text = response["response"]
-
-            # Attempt to convert response_text into a JSON object
-            try:
-                response_json = json.loads(response_text)
-            except json.JSONDecodeError:
-                response_json = {"Generated Output": response_text}
-
-            # Alternatively, if your jsonify module provides a conversion function, you might use:
-            # response_json = jsonify(response_text)
-
-            # Construct structured JSON output
-            structured_entry = {
-                "Name": name,
-                "StructuredDetails": response_json
-            }
-            
-            # Append to the final data list
-            structured_data.append(structured_entry)
-            break
-        break
-    break
-
-# Save structured data to a new JSON file
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(structured_data, f, indent=4)
-
-print(f"Structured output saved to {output_file}")
\ No newline at end of file
+
+def build_prompt(data_center: dict) -> str:
+    address = ", ".join(filter(None, [data_center.get("address1"), data_center.get("address2"), data_center.get("address3")]))
+    overview = data_center.get("overviewHTML", "")
+    specs = data_center.get("specsHtml", "")
+    return f"""{INSTRUCTIONS}
+address:
+{address}
+
+Data Center Overview:
+{overview}
+
+Specifications:
+{specs}
+"""
+
+
+def repair_json(text: str):
+    """
+    Best-effort parse of a model answer into JSON. Tries the text as is, then only the
+    outermost {...} (drops code fences, a leading `structured_entry =` and trailing prose),
+    then without trailing commas, then with Python literals (None/True/False) converted.
+    Returns None if nothing parseable is found.
+    """
+    candidates = [text.strip()]
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        cleaned = text[start:end + 1]
+        candidates.append(cleaned)
+        cleaned = re.sub(r",\s*([}\]])", r"\1", cleaned)
+        candidates.append(cleaned)
+        for python, literal in (("None", "null"), ("True", "true"), ("False", "false")):
+            cleaned = re.sub(rf"\b{python}\b(?=\s*[,}}\]])", literal, cleaned)
+        candidates.append(cleaned)
+    for candidate in candidates:
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    return None
+
+
+class OllamaClient:
+    """Minimal client for Ollama's /api/generate with a pooled HTTP session."""
+
+    def __init__(self, host: str = OLLAMA_HOST, model: str = MODEL, pool_size: int = WORKERS,
+                 keep_alive: str = "30m", timeout: float = 600):
+        self.url = host.rstrip("/") + "/api/generate"
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def generate(self, prompt: str) -> dict:
+        response = self.session.post(self.url, json={
+            "model": self.model,
+            "prompt": prompt,
+            "format": "json",
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": 0},
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+def extract_data_center(client: OllamaClient, unique_key: str, data_center: dict) -> tuple:
+    """
+    Run one generation; returns (structured entry, generated token count, generation seconds).
+    The entry is None when the request failed, so the record is retried on the next run.
+    """
+    name = data_center.get("name", "Unknown")
+    try:
+        response = client.generate(build_prompt(data_center))
+        response_text = response.get("response", "")
+        details = repair_json(response_text)
+        if details is None:
+            details = {"Generated Output": response_text}
+        tokens = response.get("eval_count", 0)
+        seconds = response.get("eval_duration", 0) / 1e9
+    except requests.RequestException as e:
+        print(f"Error generating {unique_key}: {e}")
+        return None, 0, 0.0
+    entry = {"unique_key": unique_key, "Name": name, "StructuredDetails": details}
+    return entry, tokens, seconds
+
+
+def run(input_path: str = input_file, output_path: str = output_file, host: str = OLLAMA_HOST,
+        model: str = MODEL, workers: int = WORKERS, limit: int = None):
+    """
+    Extract every data center with `workers` generations in flight. Results are appended to
+    a JSONL journal as they arrive (keys already there are skipped on a rerun) and compacted
+    into `output_path` at the end.
+    """
+    client = OllamaClient(host, model, pool_size=workers)
+    stats = {"records": 0, "unparsed": 0, "failed": 0, "tokens": 0, "generation_seconds": 0.0}
+    started = time.perf_counter()
+    with ProgressJournal(journal_path(output_path)) as journal:
+        done_keys = journal.load_keys()
+        records = ((k, dc) for k, dc in iter_datacentermap(input_path) if k not in done_keys)
+        records = islice(records, limit)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(extract_data_center, client, k, dc) for k, dc in islice(records, workers * 2)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry, tokens, seconds = future.result()
+                    if entry is None:
+                        stats["failed"] += 1
+                        continue
+                    journal.append(entry)
+                    stats["records"] += 1
+                    stats["unparsed"] += "Generated Output" in entry["StructuredDetails"]
+                    stats["tokens"] += tokens
+                    stats["generation_seconds"] += seconds
+                    print(f"Processed {entry['unique_key']}")
+                for k, dc in islice(records, len(done)):
+                    pending.add(pool.submit(extract_data_center, client, k, dc))
+        journal.compact(output_path)
+
+    elapsed = time.perf_counter() - started
+    per_stream = stats["tokens"] / stats["generation_seconds"] if stats["generation_seconds"] else 0.0
+    print(f"Records: {stats['records']} ({stats['unparsed']} without valid JSON, {stats['failed']} failed) in {elapsed:.1f}s "
+          f"-> {stats['records'] / elapsed if elapsed else 0:.2f} records/sec")
+    print(f"Tokens: {stats['tokens']} -> {stats['tokens'] / elapsed if elapsed else 0:.1f} tokens/sec overall, "
+          f"{per_stream:.1f} tokens/sec per generation")
+    print(f"Structured output saved to {output_path}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract structured data center details with a local Ollama model.")
+    parser.add_argument("--input", default=input_file)
+    parser.add_argument("--output", default=output_file)
+    parser.add_argument("--host", default=OLLAMA_HOST, help="Ollama server (or a stub with the same API)")
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--limit", type=int, help="stop after this many new records")
+    args = parser.parse_args()
+    run(args.input, args.output, args.host, args.model, args.workers, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+
+# Default cache location for the crawler
+CACHE_FILE = "http_cache.sqlite"
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache for the crawler in SQLite, keyed by normalized URL.
+    Each entry keeps the zlib-compressed body, its ETag / Last-Modified validators, the
+    sha256 of the body and the already-parsed page (title, text, links), so a page that
+    comes back 304 or with an identical body is neither downloaded again nor re-parsed.
+    `stats` counts what happened to lookups made through this instance.
+    """
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self.stats = {"not_modified": 0, "unchanged": 0, "changed": 0, "new": 0,
+                      "bytes_downloaded": 0, "bytes_saved": 0}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " content_hash TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " body BLOB NOT NULL,"
+            " parsed BLOB NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, url: str):
+        """Return the cached entry as a dict (without the body), or None."""
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, size, parsed FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, digest, size, parsed = row
+        parsed = json.loads(zlib.decompress(parsed))
+        return {"etag": etag, "last_modified": last_modified, "content_hash": digest, "size": size,
+                "page": parsed["page"], "links": parsed["links"]}
+
+    def body(self, url: str):
+        row = self.conn.execute("SELECT body FROM pages WHERE url = ?", (url,)).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    @staticmethod
+    def validators(entry) -> dict:
+        """Conditional request headers for a cached entry."""
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def not_modified(self, url: str, entry: dict):
+        """Record a 304 and return the cached (page, links)."""
+        self.stats["not_modified"] += 1
+        self.stats["bytes_saved"] += entry["size"]
+        self.conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+        return entry["page"], entry["links"]
+
+    def reuse(self, url: str, entry, body: bytes, headers):
+        """
+        After a 200, return the cached (page, links) when the body hash matches the cached one,
+        else None. Validators are refreshed so the next crawl can send a conditional request.
+        """
+        self.stats["bytes_downloaded"] += len(body)
+        if entry is None or entry["content_hash"] != content_hash(body):
+            return None
+        self.stats["unchanged"] += 1
+        self.conn.execute(
+            "UPDATE pages SET etag = ?, last_modified = ?, fetched_at = ? WHERE url = ?",
+            (headers.get("ETag"), headers.get("Last-Modified"), time.time(), url)
+        )
+        self.conn.commit()
+        return entry["page"], entry["links"]
+
+    def put(self, url: str, entry, body: bytes, headers, page: dict, links: list):
+        """Store a newly parsed page; `entry` is the previous cache entry, if any."""
+        self.stats["new" if entry is None else "changed"] += 1
+        parsed = zlib.compress(json.dumps({"page": page, "links": links}, ensure_ascii=False).encode("utf-8"))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, size, body, parsed, fetched_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, headers.get("ETag"), headers.get("Last-Modified"), content_hash(body), len(body),
+             zlib.compress(body), parsed, time.time())
+        )
+        self.conn.commit()
+
+    def summary(self) -> str:
+        s = self.stats
+        return (f"Cache: {s['not_modified']} not modified, {s['unchanged']} unchanged (parse skipped), "
+                f"{s['changed']} changed, {s['new']} new; {s['bytes_downloaded'] / 1024:.1f} KB downloaded, "
+                f"{s['bytes_saved'] / 1024:.1f} KB not transferred")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
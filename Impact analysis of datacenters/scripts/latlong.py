@@ -1,13 +1,15 @@
-from geopy.geocoders import Nominatim
+from geocoding import GeocodingService, make_geocoder, normalize_address
 
-# Initialize the geocoder
-geolocator = Nominatim(user_agent="my_app")
+# Initialize the geocoder (answers are cached in geocode_cache.sqlite, ZIP centroids as fallback)
+service = GeocodingService(geocoder=make_geocoder(user_agent="my_app"))
 
 # Single address geocoding
 address = "1600 Amphitheatre Parkway, Mountain View, CA"
-location = geolocator.geocode(address)
-
-if location:
-    print(f"Latitude: {location.latitude}")
-    print(f"Longitude: {location.longitude}")
-
+key = normalize_address(address)
+latitude, longitude, zipcode, source = service.resolve({key: (address, None)})[key]
+service.close()
+
+if latitude is not None:
+    print(f"Latitude: {latitude}")
+    print(f"Longitude: {longitude}")
+    print(f"Source: {source}")
@@ -0,0 +1,99 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+# Default cache location and size budget
+CACHE_FILE = "llm_cache.sqlite"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def completion_key(model: str, system_prompt: str, user_prompt: str,
+                   temperature: float, max_tokens: int) -> str:
+    """Content address of a chat completion request: sha256 over everything that affects the answer."""
+    payload = json.dumps([model, system_prompt, user_prompt, temperature, max_tokens],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    On-disk cache of LLM responses in SQLite, keyed by `completion_key`.
+    When the stored responses exceed `max_bytes`, the least recently used entries are evicted.
+    `hits` / `misses` count lookups made through this instance.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str):
+        """Return the cached response text, or None on a miss."""
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return row[0]
+
+    def put(self, key: str, response: str, model: str = ""):
+        size = len(response.encode("utf-8"))
+        old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, model, response, size, time.time())
+        )
+        self.total_bytes += size - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its budget."""
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_access")
+        stale = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            stale.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def stats(self) -> dict:
+        entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": self.total_bytes,
+        }
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
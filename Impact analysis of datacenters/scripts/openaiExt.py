@@ -1,107 +1,179 @@
 import os
 import json
+import asyncio
 import openai
-from time import sleep
+
+from extraction_engine import ExtractionEngine
+from progress_journal import ProgressJournal, journal_path
+from llm_cache import LLMCache, CACHE_FILE, completion_key
+from rule_extract import rule_extract
+import stream_sources
+from batch_extract import (BATCH_SIZE, FIELD_DESCRIPTIONS, batch_item_key, batch_max_tokens, batch_messages,
+                           pack_batches, parse_batch_response)
 
 # Set your OpenAI API key (or set it via your environment variable)
 openai.api_key = "OPENAI_API_KEY"
 
-def extract_fields_from_json(facility_json_str: str) -> dict:
-    """
-    Sends the entire facility JSON (as a string) to GPT-3.5-turbo for extraction.
-    Returns a dict with standardized fields.
-    """
-    prompt = f"""
+# Extraction engine settings: requests in flight and requests started per second
+CONCURRENCY = 8
+REQUESTS_PER_SECOND = 5.0
+# Flush and fsync the progress journal after this many new records
+JOURNAL_BATCH = 25
+
+SYSTEM_PROMPT = "You are a helpful AI that extracts structured information from JSON."
+
+FIELDS = [
+    "Name", "Provider", "StreetAddress", "City", "ZipCode", "State", "Country",
+    "Whitespace", "Area", "YearBuilt", "Power", "Scale", "Certifications", "URL"
+]
+
+def empty_fields() -> dict:
+    """All extracted fields set to empty strings (used when extraction fails)."""
+    return {field: "" for field in FIELDS}
+
+def build_prompt(facility_json_str: str, fields: list = FIELDS) -> str:
+    """Build the extraction prompt for a single facility's JSON string, asking only for `fields`."""
+    bullets = "\n".join(f"- {FIELD_DESCRIPTIONS[field]}" for field in fields)
+    template = ",\n".join(f'  "{field}": ""' for field in fields)
+    return f"""
 You are an AI assistant that extracts specific standardized information from a facility's JSON data.
 Below is the facility data delimited by triple backticks:
 {facility_json_str}
 Extract and return the following fields as a valid JSON object (use empty string if not found):
-- Name
-- Street Address
-- City
-- State
-- Zip Code
-- Provider
-- Country(US, UK, etc.)
-- State
-- Whitespace(Total building area in Sq. Ft.)
-- Area(Building area in Sq. Ft.)
-- Year Built(YYYY)
-- Power(in KW)
-- Scale(Hyperscale, Enterprise, etc.)
-- Certifications
-- URL
+{bullets}
 
 Output format (strict JSON):
 {{
-  "Name": "",
-  "Provider": "",
-  "StreetAddress": "",
-  "City": "",
-  "ZipCode": "",
-  "State": "",
-  "Country": "",
-  "Whitespace": "",
-  "Area": "",
-  "YearBuilt": "",
-  "Power": "",
-  "Scale": "",
-  "Certifications": "",
-  "URL": ""
+{template}
 }}
 Do not include any extra keys.
     """
+
+def extract_fields_from_json(facility_json_str: str, cache: LLMCache = None) -> dict:
+    """
+    Sends the entire facility JSON (as a string) to GPT-3.5-turbo for extraction.
+    Returns a dict with standardized fields.
+    Responses are looked up in / stored to `cache` when one is given.
+    """
+    prompt = build_prompt(facility_json_str)
+    key = completion_key("gpt-3.5-turbo", SYSTEM_PROMPT, prompt, 0.0, 300)
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        return json.loads(cached)
     try:
         response = openai.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
-                {"role": "system", "content": "You are a helpful AI that extracts structured information from JSON."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.0,
             max_tokens=300
         )
         content = response.choices[0].message.content.strip()
-         # If response is empty, retry
         extracted_data = json.loads(content)
+        if cache:
+            cache.put(key, content, "gpt-3.5-turbo")
     except Exception as e:
         print("Error during extraction:", e)
-        extracted_data = {
-            "Name": "",
-            "Provider": "",
-            "StreetAddress": "",
-            "City": "",
-            "ZipCode": "",
-            "State": "",
-            "Country": "",
-            "Whitespace": "",
-            "Area": "",
-            "YearBuilt": "",
-            "Power": "",
-            "Scale": "",
-            "Certifications": "",
-            "URL": ""
-        }
+        extracted_data = empty_fields()
     return extracted_data
 
-def load_progress(output_file: str):
-    """Load already processed records if the output file exists."""
-    if os.path.exists(output_file):
-        with open(output_file, "r", encoding="utf-8") as f:
-            progress = json.load(f)
-    else:
-        progress = []
-    return progress
+async def extract_fields_async(engine: ExtractionEngine, facility_json_str: str,
+                               cache: LLMCache = None, fields: list = FIELDS) -> dict:
+    """
+    Async version of `extract_fields_from_json` that goes through the extraction engine.
+    Only `fields` are requested from the model.
+    """
+    prompt = build_prompt(facility_json_str, fields)
+    key = completion_key(engine.model, SYSTEM_PROMPT, prompt, 0.0, 300)
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        return json.loads(cached)
+    try:
+        content = await engine.complete(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.0,
+            max_tokens=300
+        )
+        extracted_data = json.loads(content)
+        # Only responses that parsed are cached, so bad outputs are retried on the next run
+        if cache:
+            cache.put(key, content, engine.model)
+    except Exception as e:
+        print("Error during extraction:", e)
+        extracted_data = {field: "" for field in fields}
+    return extracted_data
+
+async def extract_batch_async(engine: ExtractionEngine, facilities: dict,
+                              cache: LLMCache = None, fields: list = FIELDS, missing: dict = None) -> dict:
+    """
+    Extract `fields` for several facilities (unique_key -> facility JSON string) with one request.
+    `missing` (unique_key -> field list) narrows what each facility needs; its cache entry is keyed
+    on that list alone, so it does not depend on what the rest of the batch asked for.
+    Each facility in the answer is validated on its own; only the ones that are missing
+    or invalid fall back to single-facility calls. Returns unique_key -> extracted fields.
+    """
+    wanted = {key: (missing or {}).get(key, fields) for key in facilities}
+    results = {}
+    pending = {}
+    for key, facility_json_str in facilities.items():
+        cached = cache.get(batch_item_key(engine.model, facility_json_str, wanted[key])) if cache else None
+        if cached is not None:
+            results[key] = json.loads(cached)
+        else:
+            pending[key] = facility_json_str
+
+    if len(pending) > 1:
+        try:
+            content = await engine.complete(
+                batch_messages(pending, fields),
+                temperature=0.0,
+                max_tokens=batch_max_tokens(engine.model, len(pending))
+            )
+            parsed = parse_batch_response(content, pending.keys(), fields)
+        except Exception as e:
+            print("Error during batch extraction:", e)
+            parsed = {}
+        for key, extracted in parsed.items():
+            extracted = {field: extracted[field] for field in wanted[key]}
+            results[key] = extracted
+            if cache:
+                cache.put(batch_item_key(engine.model, pending[key], wanted[key]), json.dumps(extracted), engine.model)
+
+    failed = [key for key in pending if key not in results]
+    engine.stats["batch_fallbacks"] = engine.stats.get("batch_fallbacks", 0) + (len(failed) if len(pending) > 1 else 0)
+    singles = await asyncio.gather(*(extract_fields_async(engine, pending[key], cache, wanted[key]) for key in failed))
+    results.update(zip(failed, singles))
+    return results
 
-def save_progress(output_file: str, data: list):
-    """Save the progress (list of processed facilities) to the output file."""
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def build_result(unique_key: str, source: str, extracted: dict, fallback_url: str) -> dict:
+    """Shape one output record; the scraped URL is used when the model returns none."""
+    result = {"unique_key": unique_key, "source": source}
+    for field in FIELDS:
+        result[field] = extracted.get(field, "")
+    result["URL"] = result["URL"] or fallback_url
+    return result
 
-def process_hawk(input_file: str, output_file: str):
+def load_progress(journal: ProgressJournal, output_file: str) -> set:
     """
-    Processes datacenterhawk data.
-    The structure: 
+    Rebuild the set of processed unique_keys by streaming the progress journal.
+    An output file left by an older run (before the journal existed) is imported first.
+    """
+    if os.path.getsize(journal.path) == 0 and os.path.exists(output_file):
+        with open(output_file, "r", encoding="utf-8") as f:
+            for record in json.load(f):
+                journal.append(record)
+        journal.flush()
+    return journal.load_keys()
+
+def iter_hawk(input_file: str):
+    """
+    Stream (unique_key, facility, fallback_url) from datacenterhawk data.
+    The structure:
     {
       "markets": {
          "Northern Virginia": {
@@ -116,57 +188,14 @@ def process_hawk(input_file: str, output_file: str):
       }
     }
     """
-    progress = load_progress(output_file)
-    processed_keys = {record["unique_key"] for record in progress if record.get("unique_key")}
-    
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    markets = data.get("markets", {})
-    for market_key, market_data in markets.items():
-        market_name = market_data.get("name", market_key)
-        facilities = market_data.get("facilities", {})
-        for fac_key, fac_data in facilities.items():
-            unique_key = f"{market_name}_{fac_key}"
-            if unique_key in processed_keys:
-                continue  # Skip if already processed
-            # Combine market context with facility data
-            facility_combined = {
-                "market": market_name,
-                **fac_data
-            }
-            facility_json_str = json.dumps(facility_combined, ensure_ascii=False)
-            extracted = extract_fields_from_json(facility_json_str)
-            result = {
-                "unique_key": unique_key,
-                "source": "datacenterhawk",
-                "Name": extracted.get("Name", ""),
-                "Provider": extracted.get("Provider", ""),
-                "StreetAddress": extracted.get("StreetAddress", ""),
-                "City": extracted.get("City", ""),
-                "ZipCode": extracted.get("ZipCode", ""),
-                "State": extracted.get("State", ""),
-                "Country": extracted.get("Country", ""),
-                "Whitespace": extracted.get("Whitespace", ""),
-                "Area": extracted.get("Area", ""),
-                "YearBuilt": extracted.get("YearBuilt", ""),
-                "Power": extracted.get("Power", ""),
-                "Scale": extracted.get("Scale", ""),
-                "Certifications": extracted.get("Certifications", ""),
-                "URL": extracted.get("URL", "") or fac_data.get("url", "")
-            }
-            progress.append(result)
-            processed_keys.add(unique_key)
-            print(f"Processed {unique_key}")
-            sleep(0.5)
-            save_progress(output_file, progress)
-    save_progress(output_file, progress)
-    print(f"Finished processing datacenterhawk. Total records: {len(progress)}")
+    # Facilities come combined with their market context
+    for unique_key, facility_combined in stream_sources.iter_hawk(input_file):
+        yield unique_key, facility_combined, facility_combined.get("url", "")
 
-def process_centers(input_file: str, output_file: str):
+def iter_centers(input_file: str):
     """
-    Processes datacenters.com data.
-    The structure: 
+    Stream (unique_key, facility, fallback_url) from datacenters.com data.
+    The structure:
     {
       "facility_id": {
           "Name": "...",
@@ -179,52 +208,17 @@ def process_centers(input_file: str, output_file: str):
       ...
     }
     """
-    progress = load_progress(output_file)
-    processed_keys = {record["unique_key"] for record in progress if record.get("unique_key")}
-    
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    for facility_id, facility_data in data.items():
-        unique_key = facility_id  # Unique identifier for this source
-        if unique_key in processed_keys:
-            continue
+    for facility_id, facility_data in stream_sources.iter_centers(input_file):
         combined_data = facility_data.copy()
         desc1 = facility_data.get("Description1", "")
         desc2 = facility_data.get("Description2", "")
         combined_data["combinedDescription"] = desc1 + "\n" + desc2
-        facility_json_str = json.dumps(combined_data, ensure_ascii=False)
-        extracted = extract_fields_from_json(facility_json_str)
-        result = {
-            "unique_key": unique_key,
-            "source": "datacenters.com",
-            "Name": extracted.get("Name", ""),
-            "Provider": extracted.get("Provider", ""),
-            "StreetAddress": extracted.get("StreetAddress", ""),
-            "City": extracted.get("City", ""),
-            "ZipCode": extracted.get("ZipCode", ""),
-            "State": extracted.get("State", ""),
-            "Country": extracted.get("Country", ""),
-            "Whitespace": extracted.get("Whitespace", ""),
-            "Area": extracted.get("Area", ""),
-            "YearBuilt": extracted.get("YearBuilt", ""),
-            "Power": extracted.get("Power", ""),
-            "Scale": extracted.get("Scale", ""),
-            "Certifications": extracted.get("Certifications", ""),
-            "URL": extracted.get("URL", "") or facility_data.get("Url", "")
-        }
-        progress.append(result)
-        processed_keys.add(unique_key)
-        print(f"Processed {unique_key}")
-        sleep(0.5)
-        save_progress(output_file, progress)
-    save_progress(output_file, progress)
-    print(f"Finished processing datacenters.com. Total records: {len(progress)}")
+        yield facility_id, combined_data, facility_data.get("Url", "")
 
-def process_datacentermap(input_file: str, output_file: str):
+def iter_datacentermap(input_file: str):
     """
-    Processes datacentermap data.
-    The structure: 
+    Stream (unique_key, facility, fallback_url) from datacentermap data.
+    The structure:
     {
       "Virginia": {
          "count": "...",
@@ -253,62 +247,108 @@ def process_datacentermap(input_file: str, output_file: str):
     }
     For each state, for each detail (e.g., city), and for each address, we combine context.
     """
-    progress = load_progress(output_file)
-    processed_keys = {record["unique_key"] for record in progress if record.get("unique_key")}
-    
-    with open(input_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    for state, state_data in data.items():
-        details = state_data.get("details", [])
-        for detail in details:
-            city_name = detail.get("name", "")
-            addresses = detail.get("addresses", [])
-            for address in addresses:
-                addr_url = address.get("url", "")
-                unique_key = f"{state}_{city_name}_{addr_url}"
-                if unique_key in processed_keys:
+    for unique_key, combined_data in stream_sources.iter_datacentermap(input_file):
+        yield unique_key, combined_data, combined_data.get("url", "")
+
+def skip_processed(records, processed_keys: set):
+    """Drop records whose unique_key was already processed (also dedups within the input)."""
+    for record in records:
+        if record[0] in processed_keys:
+            continue
+        processed_keys.add(record[0])
+        yield record
+
+async def run_extraction(records, output_file: str, source: str,
+                         concurrency: int = CONCURRENCY,
+                         requests_per_second: float = REQUESTS_PER_SECOND,
+                         cache_file: str = CACHE_FILE, batch_size: int = BATCH_SIZE,
+                         **engine_options):
+    """
+    Extract fields for every (unique_key, facility, fallback_url) record concurrently.
+    Each result is appended to a JSONL journal next to `output_file`; keys already in the
+    journal are skipped, so an interrupted run resumes where it stopped. The journal is
+    compacted into `output_file` at the end.
+    Model responses are cached in `cache_file` (pass None to disable), so reruns of
+    unchanged prompts cost no API calls.
+    Up to `batch_size` facilities share one request (fewer if the model's context window
+    is too small); batch_size=1 sends one facility per request.
+    A rule-based pass (rule_extract.py) fills the fields that are already structured in the
+    scraped data first; the model is only asked for the rest, and not called at all when
+    nothing is left.
+    """
+    cache = LLMCache(cache_file) if cache_file else None
+    with ProgressJournal(journal_path(output_file), batch_size=JOURNAL_BATCH) as journal:
+        processed_keys = load_progress(journal, output_file)
+
+        rule_stats = {"facilities": 0, "llm_skipped": 0, "fields_from_rules": 0, "fields_sent_to_llm": 0}
+
+        def llm_items():
+            """Run the rule-based pass; yield only facilities that still have fields for the model."""
+            for unique_key, facility, fallback_url in skip_processed(records, processed_keys):
+                facility_json_str = json.dumps(facility, ensure_ascii=False)
+                known = rule_extract(source, facility, facility_json_str)
+                missing = [field for field in FIELDS if field not in known]
+                rule_stats["facilities"] += 1
+                rule_stats["fields_from_rules"] += sum(1 for value in known.values() if value)
+                rule_stats["fields_sent_to_llm"] += len(missing)
+                if not missing:
+                    # Everything was parseable: record it without calling the model
+                    rule_stats["llm_skipped"] += 1
+                    journal.append(build_result(unique_key, source, known, fallback_url))
+                    print(f"Processed {unique_key} (rules only)")
                     continue
-                combined_data = {
-                    "state": state,
-                    "city": city_name,
-                    "detail_url": detail.get("url", ""),
-                    **address
-                }
-                facility_json_str = json.dumps(combined_data, ensure_ascii=False)
-                extracted = extract_fields_from_json(facility_json_str)
-                result = {
-                    "unique_key": unique_key,
-                    "source": "datacentermap",
-                    "Name": extracted.get("Name", ""),
-                    "Provider": extracted.get("Provider", ""),
-                    "StreetAddress": extracted.get("StreetAddress", ""),
-                    "City": extracted.get("City", ""),
-                    "ZipCode": extracted.get("ZipCode", ""),
-                    "State": extracted.get("State", ""),
-                    "Country": extracted.get("Country", ""),
-                    "Whitespace": extracted.get("Whitespace", ""),
-                    "Area": extracted.get("Area", ""),
-                    "YearBuilt": extracted.get("YearBuilt", ""),
-                    "Power": extracted.get("Power", ""),
-                    "Scale": extracted.get("Scale", ""),
-                    "Certifications": extracted.get("Certifications", ""),
-                    "URL": extracted.get("URL", "") or address.get("url", "")
-                }
-                progress.append(result)
-                processed_keys.add(unique_key)
-                print(f"Processed {unique_key}")
-                sleep(0.5)
-                save_progress(output_file, progress)
-    save_progress(output_file, progress)
-    print(f"Finished processing datacentermap. Total records: {len(progress)}")
+                yield unique_key, facility_json_str, fallback_url, known, missing
+
+        async with ExtractionEngine(concurrency=concurrency, requests_per_second=requests_per_second,
+                                    **engine_options) as engine:
+            async def worker(batch):
+                # Ask for the union of the fields still missing in this batch
+                fields = [field for field in FIELDS if any(field in item[4] for item in batch)]
+                if len(batch) == 1:
+                    unique_key, facility_json_str = batch[0][:2]
+                    extracted = {unique_key: await extract_fields_async(engine, facility_json_str, cache, fields)}
+                else:
+                    facilities = {item[0]: item[1] for item in batch}
+                    missing = {item[0]: item[4] for item in batch}
+                    extracted = await extract_batch_async(engine, facilities, cache, fields, missing)
+                return [
+                    build_result(unique_key, source, {**extracted[unique_key], **known}, fallback_url)
+                    for unique_key, _, fallback_url, known, _ in batch
+                ]
+
+            batches = pack_batches(llm_items(), engine.model, FIELDS, batch_size)
+            async for results in engine.map_unordered(worker, batches):
+                for result in results:
+                    journal.append(result)
+                    print(f"Processed {result['unique_key']}")
+            print(f"Engine stats for {source}: {engine.stats}")
+        print(f"Rule-based pass for {source}: {rule_stats['llm_skipped']} of {rule_stats['facilities']} "
+              f"facilities needed no LLM call; {rule_stats['fields_from_rules']} fields filled by rules, "
+              f"{rule_stats['fields_sent_to_llm']} left for the model")
+        journal.compact(output_file)
+        print(f"Finished processing {source}. Total records: {journal.count}")
+    if cache:
+        print(f"LLM cache for {source}: {cache.stats()}")
+        cache.close()
+
+def process_hawk(input_file: str, output_file: str, **engine_options):
+    """Processes datacenterhawk data (see `iter_hawk` for the structure)."""
+    asyncio.run(run_extraction(iter_hawk(input_file), output_file, "datacenterhawk", **engine_options))
+
+def process_centers(input_file: str, output_file: str, **engine_options):
+    """Processes datacenters.com data (see `iter_centers` for the structure)."""
+    asyncio.run(run_extraction(iter_centers(input_file), output_file, "datacenters.com", **engine_options))
+
+def process_datacentermap(input_file: str, output_file: str, **engine_options):
+    """Processes datacentermap data (see `iter_datacentermap` for the structure)."""
+    asyncio.run(run_extraction(iter_datacentermap(input_file), output_file, "datacentermap", **engine_options))
 
 def main():
     # Update file paths as necessary
     process_datacentermap("map_final.json", "map_extracted.json")
     process_hawk("hawk_final.json", "hawk_extracted.json")
     process_centers("centers_final.json", "centers_extracted.json")
-    
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,90 @@
+"""
+Datacenter x year panel for the difference-in-differences analysis in "Final Analysis.ipynb".
+
+Every datacenter row is repeated once per year (np.repeat over the rows, np.tile over the
+years) with `operational = year >= yearbuilt`, and the result is left-joined with the
+per-cluster annual weather on (cluster, year). Large datacenter lists can be expanded in
+chunks and streamed to CSV or Parquet instead of being held in memory.
+
+    from panel import expand_panel, build_panel
+    expanded_datacenter_df = expand_panel(datacenter_df)
+    merged_df = build_panel(datacenter_df, master_weather_df)
+    build_panel(datacenter_df, master_weather_df, chunk_size=5000, output="panel.parquet")
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+YEARS = range(1999, 2026)  # the years the weather data covers, inclusive
+CHUNK_SIZE = 10_000  # datacenters per chunk (x 27 panel rows)
+
+
+def expand_panel(datacenters: pd.DataFrame, years=YEARS, built_column: str = "yearbuilt") -> pd.DataFrame:
+    """
+    One row per (datacenter, year), in datacenter order then year order, with `year` and
+    `operational` (1 from the year built on; 0 before it or when the year is unknown).
+    """
+    years = np.asarray(list(years), dtype=np.int64)
+    rows = np.repeat(np.arange(len(datacenters)), len(years))
+    panel = datacenters.iloc[rows].reset_index(drop=True)
+    panel["year"] = np.tile(years, len(datacenters))
+    built = pd.to_numeric(panel[built_column], errors="coerce").to_numpy(dtype=float)
+    panel["operational"] = (panel["year"].to_numpy() >= built).astype(np.int64)
+    return panel
+
+
+def merge_weather(panel: pd.DataFrame, weather: pd.DataFrame, on=("cluster", "year")) -> pd.DataFrame:
+    """Left join with the annual weather; clashing columns get _x / _y as in the notebook."""
+    return panel.merge(weather, on=list(on), how="left")
+
+
+def iter_panel(datacenters: pd.DataFrame, weather: pd.DataFrame = None, years=YEARS,
+               chunk_size: int = CHUNK_SIZE, on=("cluster", "year")):
+    """Yield the (merged) panel `chunk_size` datacenters at a time."""
+    for start in range(0, len(datacenters), chunk_size):
+        panel = expand_panel(datacenters.iloc[start:start + chunk_size], years)
+        yield merge_weather(panel, weather, on) if weather is not None else panel
+
+
+def write_panel(chunks, path: str) -> int:
+    """Stream panel chunks to `path` (.parquet, anything else as CSV); returns the rows written."""
+    rows = 0
+    tmp = path + ".tmp"
+    if path.endswith(".parquet"):
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pq.write_table(pa.table({}), tmp)
+    else:
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=rows == 0)
+                rows += len(chunk)
+    os.replace(tmp, path)
+    return rows
+
+
+def build_panel(datacenters: pd.DataFrame, weather: pd.DataFrame = None, years=YEARS, chunk_size: int = None,
+                output: str = None, on=("cluster", "year")):
+    """
+    The full panel as one DataFrame, or, with `output`, written chunk by chunk to that file
+    (the number of rows written is returned then).
+    """
+    if output is not None:
+        return write_panel(iter_panel(datacenters, weather, years, chunk_size or CHUNK_SIZE, on), output)
+    if chunk_size is None:
+        panel = expand_panel(datacenters, years)
+        return merge_weather(panel, weather, on) if weather is not None else panel
+    return pd.concat(iter_panel(datacenters, weather, years, chunk_size, on), ignore_index=True)
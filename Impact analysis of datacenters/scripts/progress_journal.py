@@ -0,0 +1,119 @@
+import os
+import json
+
+
+def journal_path(output_file: str) -> str:
+    """Journal file that sits next to the final output, e.g. map_extracted.json -> map_extracted.jsonl"""
+    return os.path.splitext(output_file)[0] + ".jsonl"
+
+
+def _drop_torn_tail(path: str):
+    """Cut a partially written last line (left by a crash mid-write) so appends stay valid JSONL."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last newline
+        pos = size - 1
+        chunk = 4096
+        while pos > 0:
+            start = max(0, pos - chunk)
+            f.seek(start)
+            block = f.read(pos - start)
+            idx = block.rfind(b"\n")
+            if idx != -1:
+                f.truncate(start + idx + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+class ProgressJournal:
+    """
+    Append-only JSON Lines checkpoint: one record per line.
+    Records are buffered and written, flushed and fsync'd every `batch_size` appends,
+    so a crash loses at most one batch and can never corrupt earlier records.
+    """
+
+    def __init__(self, path: str, batch_size: int = 25):
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._buffer = []
+        if os.path.exists(path):
+            _drop_torn_tail(path)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def iter_records(self):
+        """Stream records already on disk (unreadable lines are skipped)."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def load_keys(self) -> set:
+        """Rebuild the set of processed unique_keys by streaming the journal."""
+        keys = set()
+        for record in self.iter_records():
+            if record.get("unique_key"):
+                keys.add(record["unique_key"])
+        self.count = len(keys)
+        return keys
+
+    def append(self, record: dict):
+        self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def compact(self, output_file: str):
+        """
+        Write the journal out as the final JSON array (same layout as json.dump(..., indent=2)).
+        Only the first record of each unique_key is kept; records without one are all kept.
+        The file is written to a temp path and renamed, so the previous output stays intact on failure.
+        """
+        self.flush()
+        tmp_file = output_file + ".tmp"
+        seen = set()
+        first = True
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("[")
+            for record in self.iter_records():
+                key = record.get("unique_key")
+                if key is not None:  # records without a key are kept as they are, never merged
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                body = json.dumps(record, indent=2).replace("\n", "\n  ")
+                f.write(("\n  " if first else ",\n  ") + body)
+                first = False
+            f.write("]" if first else "\n]")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, output_file)
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
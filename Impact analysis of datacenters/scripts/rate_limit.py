@@ -0,0 +1,30 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Async token bucket limiter.
+    Refills `rate` tokens per second up to `capacity`; each request takes one token, or `cost`
+    tokens for APIs that weigh requests (a cost above `capacity` waits for a full bucket and
+    leaves it in debt).
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, cost: float = 1):
+        need = min(cost, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= need:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((need - self.tokens) / self.rate)
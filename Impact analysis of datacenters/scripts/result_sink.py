@@ -0,0 +1,190 @@
+import io
+import os
+import csv
+import glob
+import time
+import threading
+
+import pandas as pd
+
+
+def _read_csv_rows(path: str):
+    """
+    Parse a CSV written by ResultSink (or pandas' to_csv) and cut anything after the last
+    complete row, i.e. a batch torn by a crash mid-write. Returns the complete rows, header included.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        text = f.read()
+    consumed = 0
+
+    def lines():
+        nonlocal consumed
+        for line in io.StringIO(text, newline=""):
+            consumed += len(line)
+            yield line
+
+    rows, complete = [], 0
+    try:
+        for row in csv.reader(lines(), strict=True):
+            if text[consumed - 1] not in "\r\n":
+                break
+            rows.append(row)
+            complete = consumed
+    except csv.Error:
+        pass
+    if complete < len(text):
+        print(f"Dropping {len(text) - complete} characters of a torn write at the end of {path}")
+        with open(path, "rb+") as f:
+            f.truncate(len(text[:complete].encode("utf-8")))
+    return rows
+
+
+def _split_header(rows: list, columns: list = None):
+    """
+    (header, data rows). The first row is the header, unless `columns` is given and the first row
+    is not it: a file from before the sink wrote headers, whose columns are then `columns`.
+    """
+    if rows and (columns is None or rows[0] == list(columns)):
+        return rows[0], rows[1:]
+    return list(columns or []), rows
+
+
+def read_sink_csv(path: str, columns: list = None) -> pd.DataFrame:
+    """
+    A CSV written by ResultSink as a DataFrame of strings, named by its header row. Pass the sink's
+    `columns` to also read an older header-less file.
+    """
+    header, rows = _split_header(_read_csv_rows(path), columns)
+    return pd.DataFrame(rows, columns=header, dtype=str)
+
+
+class ResultSink:
+    """
+    Buffered writer for scraped rows. Rows are kept in memory and written in one go every
+    `batch_size` rows, and on close. With `flush_seconds`, a background thread also writes
+    whatever has been buffered for that long, so a slow scraper does not sit on its rows
+    until the batch fills up. write / flush / close may be called from several threads.
+
+    - csv: a new file starts with a header row, and rows are appended with a single write + fsync
+      per batch; a torn last batch is cut off the next time the file is opened. An existing file is
+      appended to as it is, so an older header-less output does not get a header mid-file.
+    - parquet: `path` is a directory and every batch becomes its own part file, written to a
+      temporary name and renamed into place.
+
+    With `key` (a column or list of columns), rows whose key is already in the output, from
+    this run or an earlier one, are dropped. A crash loses at most the unflushed batch.
+    """
+
+    def __init__(self, path: str, columns: list, key=None, batch_size: int = 100,
+                 flush_seconds: float = 30.0, fmt: str = None):
+        self.path = path
+        self.columns = list(columns)
+        self.key = [key] if isinstance(key, str) else key
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+        self.keys = set()
+        self.written = 0
+        self.duplicates = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        if self.fmt == "parquet":
+            os.makedirs(path, exist_ok=True)
+            for stale in glob.glob(os.path.join(path, "*.tmp")):
+                os.remove(stale)
+            self._part = max((int(os.path.basename(p)[5:10]) + 1 for p in self._parts()), default=0)
+        if self.key:
+            self._load_keys()
+        self._flusher = None
+        if flush_seconds:
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def _row_key(self, values):
+        key = tuple(str(v) for v in values)
+        return key[0] if len(key) == 1 else key
+
+    def _load_keys(self):
+        if self.fmt == "parquet":
+            for part in self._parts():
+                df = pd.read_parquet(part, columns=self.key)
+                self.keys.update(self._row_key(values) for values in df.astype(str).itertuples(index=False))
+        elif os.path.exists(self.path):
+            header, rows = _split_header(_read_csv_rows(self.path), self.columns)
+            positions = [header.index(column) for column in self.key]
+            for row in rows:
+                if len(row) > max(positions):
+                    self.keys.add(self._row_key([row[p] for p in positions]))
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_seconds / 4):
+            with self._lock:
+                if self._buffer and time.monotonic() - self._last_flush >= self.flush_seconds:
+                    self.flush()
+
+    def write(self, row: dict) -> bool:
+        """Buffer one row; returns False if it was dropped as a duplicate."""
+        with self._lock:
+            if self.key:
+                key = self._row_key([row.get(column, "") for column in self.key])
+                if key in self.keys:
+                    self.duplicates += 1
+                    return False
+                self.keys.add(key)
+            self._buffer.append([row.get(column, "") for column in self.columns])
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+            return True
+
+    def __contains__(self, key) -> bool:
+        return key in self.keys
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self.fmt == "parquet":
+            final = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+            tmp = final + ".tmp"
+            pd.DataFrame(self._buffer, columns=self.columns).to_parquet(tmp, index=False)
+            with open(tmp, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp, final)
+            self._part += 1
+        else:
+            out = io.StringIO()
+            writer = csv.writer(out, lineterminator="\n")
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                writer.writerow(self.columns)
+            writer.writerows(self._buffer)
+            data = out.getvalue().encode("utf-8")
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
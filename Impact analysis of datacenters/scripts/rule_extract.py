@@ -0,0 +1,274 @@
+import re
+
+from units import SQM_TO_SQFT
+
+US_STATES = {
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR", "California": "CA",
+    "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE", "District of Columbia": "DC",
+    "Florida": "FL", "Georgia": "GA", "Hawaii": "HI", "Idaho": "ID", "Illinois": "IL",
+    "Indiana": "IN", "Iowa": "IA", "Kansas": "KS", "Kentucky": "KY", "Louisiana": "LA",
+    "Maine": "ME", "Maryland": "MD", "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN",
+    "Mississippi": "MS", "Missouri": "MO", "Montana": "MT", "Nebraska": "NE", "Nevada": "NV",
+    "New Hampshire": "NH", "New Jersey": "NJ", "New Mexico": "NM", "New York": "NY",
+    "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH", "Oklahoma": "OK", "Oregon": "OR",
+    "Pennsylvania": "PA", "Rhode Island": "RI", "South Carolina": "SC", "South Dakota": "SD",
+    "Tennessee": "TN", "Texas": "TX", "Utah": "UT", "Vermont": "VT", "Virginia": "VA",
+    "Washington": "WA", "West Virginia": "WV", "Wisconsin": "WI", "Wyoming": "WY",
+}
+STATE_CODES = set(US_STATES.values())
+STATES_BY_NAME = {name.lower(): code for name, code in US_STATES.items()}
+COUNTRY_NAMES = {"usa", "us", "united states", "united states of america"}
+# The codes the extraction prompt asks for ("Country(US, UK, etc.)")
+COUNTRY_CODE = "US"
+
+TAG_RE = re.compile(r"<[^>]+>")
+STATE_ZIP_RE = re.compile(r"^(?P<state>[A-Za-z][A-Za-z ]*?)\.?\s*(?P<zip>\d{5})?(?:-\d{4})?$")
+ZIP_RE = re.compile(r"\b\d{5}(?:-\d{4})?\b")
+MULTI_POWER_RE = re.compile(r"(\d+)\s*[x×]\s*(\d+(?:\.\d+)?)\s*(MW|kW)\b", re.IGNORECASE)
+POWER_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(MW|kW)\b", re.IGNORECASE)
+AREA_RE = re.compile(
+    r"(\d[\d,]*(?:\.\d+)?)\s*(sq\.?\s*f(?:ee)?t\.?|sq\.\s*f\.|sqft|SF|square\s+feet|sq\.?\s*m\.?|sqm|m2|m²)(?![A-Za-z])",
+    re.IGNORECASE
+)
+WHITESPACE_LABEL_RE = re.compile(r"(white\s*space|colocation\s+space|raised\s+floor)", re.IGNORECASE)
+AREA_LABEL_RE = re.compile(r"(building|total\s+space|total\s+sf|facility\s+size|gross|total\s+area)", re.IGNORECASE)
+YEAR_RE = re.compile(r"(?:year\s+built|built\s+in|built|opened\s+in|commissioned\s+in)\D{0,20}((?:19|20)\d{2})\b",
+                     re.IGNORECASE)
+# A scale word only counts when it describes the facility ("edge data center", "Scale: Enterprise"),
+# not in "cutting edge" or "Enterprise Drive"; "hyperscale" is unambiguous on its own
+SCALE_RE = re.compile(
+    r"\b(?:(hyperscale)\b|"
+    r"(?<!cutting\W)(?<!leading\W)(enterprise|edge|wholesale|retail)\s+(?:colocation\s+)?"
+    r"(?:data\s*cent(?:er|re)s?|facilit(?:y|ies)|colocation|campus(?:es)?|sites?)\b|"
+    r"scale\W{1,3}(hyperscale|enterprise|edge|wholesale|retail)\b)",
+    re.IGNORECASE
+)
+SCALES = {"hyperscale": "Hyperscale", "enterprise": "Enterprise", "edge": "Edge", "wholesale": "Wholesale",
+          "retail": "Retail Colocation"}
+CERT_RE = re.compile(
+    r"\b(SOC\s*[123](?:\s*Type\s*(?:II|I|2|1))?|ISO\s*\d{4,5}|PCI[\s-]*DSS|HIPAA|HITRUST(?:\s*CSF)?|"
+    r"LEED(?:\s+(?:Platinum|Gold|Silver|Certified))?|SSAE\s*\d+|NIST\s*800-\d+|FISMA|FedRAMP|"
+    r"Tier\s*(?:I{1,3}V?|IV|[1-4])\b)",
+    re.IGNORECASE
+)
+
+
+def html_to_text(value) -> str:
+    """Cheap tag strip; values may be raw HTML or text already cleaned by extractInfo.py."""
+    if not isinstance(value, str):
+        return ""
+    return re.sub(r"\s+", " ", TAG_RE.sub(" ", value)).strip()
+
+
+def state_code(value) -> str:
+    """Two-letter code for a US state given as a code or a full name; '' if it is neither."""
+    if not isinstance(value, str):
+        return ""
+    value = value.strip().rstrip(".")
+    if value.upper() in STATE_CODES:
+        return value.upper()
+    return STATES_BY_NAME.get(value.lower(), "")
+
+
+def parse_address(text: str) -> dict:
+    """
+    Split "street, city, ST 12345[, USA]" style addresses.
+    Returns only the parts that were recognized with confidence.
+    """
+    fields = {}
+    parts = [p.strip() for p in re.split(r",|\n", text or "") if p.strip()]
+    if parts and parts[-1].lower() in COUNTRY_NAMES:
+        fields["Country"] = COUNTRY_CODE
+        parts = parts[:-1]
+    for i in range(len(parts) - 1, 0, -1):
+        m = STATE_ZIP_RE.match(parts[i])
+        if not m:
+            continue
+        state = state_code(m.group("state"))
+        if not state:
+            continue
+        fields["State"] = state
+        fields["Country"] = COUNTRY_CODE
+        if m.group("zip"):
+            fields["ZipCode"] = m.group("zip")
+        fields["City"] = parts[i - 1]
+        street = ", ".join(parts[:i - 1])
+        if street and street[0].isdigit():
+            fields["StreetAddress"] = street
+        break
+    if "ZipCode" not in fields:
+        zips = ZIP_RE.findall(text or "")
+        if len(zips) == 1:
+            fields["ZipCode"] = zips[0][:5]
+    return fields
+
+
+def _kilowatts(value: float, unit: str) -> str:
+    kw = value * 1000 if unit.lower() == "mw" else value
+    return f"{kw:.3f}".rstrip("0").rstrip(".")
+
+
+def parse_power(text: str) -> str:
+    """
+    Power in kW, as the prompt asks for ("Power(in KW)"): '2 x 10 MW' -> '20000',
+    '36,000 kW' -> '36000', '6.8 MW' -> '6800'; '' if there is no power figure.
+    """
+    m = MULTI_POWER_RE.search(text or "")
+    if m:
+        return _kilowatts(int(m.group(1)) * float(m.group(2)), m.group(3))
+    m = POWER_RE.search(text or "")
+    if m:
+        return _kilowatts(float(m.group(1).replace(",", "")), m.group(2))
+    return ""
+
+
+def parse_area(text: str) -> str:
+    """
+    Area in whole square feet, as the prompt asks for ("in Sq. Ft.") and units.convert_to_sqft
+    truncates: '12,000 sq ft' -> '12000', '500 sqm' -> '5382'; '' if there is no area figure.
+    """
+    m = AREA_RE.search(text or "")
+    if not m:
+        return ""
+    value = float(m.group(1).replace(",", ""))
+    # Every square-foot spelling has an "f" (sq ft, SF, square feet); the metre ones don't
+    if "f" not in m.group(2).lower():
+        value *= SQM_TO_SQFT
+    return str(int(value))
+
+
+def parse_labeled_areas(text: str) -> dict:
+    """Pick whitespace / building area figures that follow their labels in spec text."""
+    fields = {}
+    for label_re, field in ((WHITESPACE_LABEL_RE, "Whitespace"), (AREA_LABEL_RE, "Area")):
+        for m in label_re.finditer(text or ""):
+            area = parse_area(text[m.end():m.end() + 40])
+            if area:
+                fields[field] = area
+                break
+    return fields
+
+
+def parse_table(table: dict) -> dict:
+    """Map key/value spec tables (datacenterhawk tableInfo, datacenters.com TableInfo) onto fields."""
+    fields = {}
+    for key, value in (table or {}).items():
+        if not isinstance(value, str) or not value.strip():
+            continue
+        key_l = key.lower()
+        value = value.strip()
+        if "power" in key_l or "mw" in key_l:
+            power = parse_power(value)
+            if power:
+                fields.setdefault("Power", power)
+        elif "year" in key_l:
+            m = re.search(r"(?:19|20)\d{2}", value)
+            if m:
+                fields.setdefault("YearBuilt", m.group(0))
+        elif WHITESPACE_LABEL_RE.search(key_l):
+            fields.setdefault("Whitespace", parse_area(value) or "")
+        elif AREA_LABEL_RE.search(key_l) or "sf" in key_l or "square" in key_l or "space" in key_l:
+            fields.setdefault("Area", parse_area(value) or "")
+        elif key_l in ("provider", "operator", "owner"):
+            fields.setdefault("Provider", value)
+    return {k: v for k, v in fields.items() if v}
+
+
+def keyword_fields(text: str) -> dict:
+    """
+    Scale and certifications by keyword. Only fields that were found are returned: a missing
+    mention may still be phrased in a way the patterns don't know, so those go to the LLM.
+    """
+    scales = []
+    for m in SCALE_RE.finditer(text):
+        scale = SCALES[next(g for g in m.groups() if g).lower()]
+        if scale not in scales:
+            scales.append(scale)
+    certs = []
+    for m in CERT_RE.finditer(text):
+        cert = re.sub(r"\s+", " ", m.group(1)).strip()
+        if cert.upper() not in (c.upper() for c in certs):
+            certs.append(cert)
+    fields = {"Scale": ", ".join(scales), "Certifications": ", ".join(certs)}
+    return {k: v for k, v in fields.items() if v}
+
+
+def extract_hawk(facility: dict) -> dict:
+    """datacenterhawk: name / address / description / url / tableInfo (+ market)."""
+    fields = parse_address(facility.get("address", ""))
+    name = (facility.get("name") or "").strip()
+    if name and name != "Unknown":
+        fields["Name"] = name
+        if " · " in name:
+            fields["Provider"] = name.split(" · ", 1)[0].strip()
+    fields.update(parse_table(facility.get("tableInfo") or facility.get("table_info")))
+    if facility.get("url"):
+        fields["URL"] = facility["url"]
+    return fields
+
+
+def extract_centers(facility: dict) -> dict:
+    """datacenters.com: Name / Address / Description1 / Description2 / TableInfo / Url."""
+    fields = parse_address(facility.get("Address", ""))
+    name = (facility.get("Name") or "").strip()
+    if name:
+        fields["Name"] = name
+        if ":" in name:
+            fields["Provider"] = name.split(":", 1)[0].strip()
+    fields.update(parse_table(facility.get("TableInfo")))
+    if facility.get("Url"):
+        fields["URL"] = facility["Url"]
+    return fields
+
+
+def extract_datacentermap(facility: dict) -> dict:
+    """datacentermap: state / city from the tree, address1..3, overviewHTML / specsHtml, url."""
+    address = ", ".join(
+        facility.get(k, "").strip() for k in ("address1", "address2", "address3")
+        if isinstance(facility.get(k), str) and facility.get(k).strip()
+    )
+    fields = parse_address(address)
+    # The site tree's state wins over the address line, when it is a recognizable US state
+    state = state_code(facility.get("state"))
+    if state:
+        fields["State"] = state
+        fields.setdefault("Country", COUNTRY_CODE)
+    if facility.get("city"):
+        fields["City"] = facility["city"]
+    if "StreetAddress" not in fields:
+        for key in ("address2", "address1"):
+            value = (facility.get(key) or "").strip()
+            if value[:1].isdigit():
+                fields["StreetAddress"] = value
+                break
+    if facility.get("name"):
+        fields["Name"] = facility["name"].strip()
+    specs = html_to_text(facility.get("specsHtml"))
+    power = parse_power(specs)
+    if power:
+        fields["Power"] = power
+    fields.update(parse_labeled_areas(specs))
+    m = YEAR_RE.search(specs)
+    if m:
+        fields["YearBuilt"] = m.group(1)
+    if facility.get("url"):
+        fields["URL"] = facility["url"]
+    return fields
+
+
+EXTRACTORS = {
+    "datacenterhawk": extract_hawk,
+    "datacenters.com": extract_centers,
+    "datacentermap": extract_datacentermap,
+}
+
+
+def rule_extract(source: str, facility: dict, facility_text: str) -> dict:
+    """
+    Deterministic pass over one facility. Returns only the fields it could fill, in the
+    units and codes the LLM prompt asks for; the rest are left to the model. `facility_text`
+    is the JSON string sent to the model, scanned for keywords.
+    """
+    fields = {k: v for k, v in EXTRACTORS[source](facility).items() if v}
+    fields.update(keyword_fields(html_to_text(facility_text)))
+    return fields
@@ -0,0 +1,151 @@
+import time
+import queue
+import threading
+
+from selenium import webdriver
+from selenium.common.exceptions import StaleElementReferenceException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Upper bound for any single wait; conditions return as soon as they are met
+DEFAULT_TIMEOUT = 20
+
+
+def make_driver(headless: bool = True):
+    """Chrome, headless by default, with images off (the scrapers only read text)."""
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--window-size=1366,900")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.page_load_strategy = "eager"
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        service = Service(ChromeDriverManager().install())
+    except ImportError:  # selenium >= 4.6 finds or downloads the driver itself
+        service = Service()
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
+def wait_for(driver, xpath: str, condition=EC.presence_of_element_located, timeout: float = DEFAULT_TIMEOUT):
+    """Wait until `condition` holds for the element at `xpath` and return what the condition returns."""
+    return WebDriverWait(driver, timeout).until(condition((By.XPATH, xpath)))
+
+
+def wait_for_text_change(driver, xpath: str, old_text: str, timeout: float = DEFAULT_TIMEOUT):
+    """Wait until the first element at `xpath` shows something other than `old_text` (e.g. after paging)."""
+    def changed(d):
+        elements = d.find_elements(By.XPATH, xpath)
+        return bool(elements) and elements[0].text != old_text
+
+    WebDriverWait(driver, timeout, ignored_exceptions=[StaleElementReferenceException]).until(changed)
+
+
+class BrowserPool:
+    """
+    Spreads items over `workers` browsers. Every worker thread owns one driver, runs
+    `setup(driver)` once, then calls `task(driver, item)` for items from a shared queue.
+    `on_result(item, result)` is called under a lock, so it can write to a single file.
+    A task that raises is reported and skipped (its item is retried on the next run);
+    a browser that crashes is replaced. A browser that cannot be started (or set up) is
+    counted in stats["driver_failures"] and its worker stops; items no worker got to are
+    counted in stats["unprocessed"].
+    """
+
+    def __init__(self, workers: int = 4, headless: bool = True, setup=None, report_every: int = 25):
+        self.workers = workers
+        self.headless = headless
+        self.setup = setup
+        self.report_every = report_every
+        self.lock = threading.Lock()
+        self.stats = {"done": 0, "failed": 0, "driver_failures": 0, "unprocessed": 0}
+
+    def _start_driver(self):
+        """A started driver, or None (counted in stats) when Chrome or `setup` fails."""
+        driver = None
+        try:
+            driver = make_driver(self.headless)
+            if self.setup:
+                self.setup(driver)
+            return driver
+        except Exception as e:
+            print(f"Could not start a browser: {type(e).__name__}: {e}")
+            with self.lock:
+                self.stats["driver_failures"] += 1
+            if driver is not None:
+                self._quit(driver)
+            return None
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass  # already gone
+
+    def _worker(self, items, task, on_result):
+        driver = self._start_driver()
+        if driver is None:
+            return
+        try:
+            while True:
+                try:
+                    item = items.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = task(driver, item)
+                except WebDriverException as e:
+                    print(f"Error processing {item}: {e.msg}")
+                    with self.lock:
+                        self.stats["failed"] += 1
+                    if not self._alive(driver):
+                        self._quit(driver)
+                        driver = self._start_driver()
+                        if driver is None:
+                            return
+                    continue
+                with self.lock:
+                    on_result(item, result)
+                    self.stats["done"] += 1
+                    if self.stats["done"] % self.report_every == 0:
+                        self.report()
+        finally:
+            if driver is not None:
+                self._quit(driver)
+
+    @staticmethod
+    def _alive(driver) -> bool:
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.stats["done"] / elapsed * 60 if elapsed else 0.0
+        print(f"{self.stats['done']} done, {self.stats['failed']} failed, {rate:.1f} addresses/minute"
+              + (f", {self.stats['driver_failures']} browsers failed to start" if self.stats["driver_failures"] else ""))
+
+    def run(self, items, task, on_result):
+        pending = queue.Queue()
+        for item in items:
+            pending.put(item)
+        self.started = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, args=(pending, task, on_result), daemon=True)
+                   for _ in range(min(self.workers, pending.qsize()))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats["unprocessed"] = pending.qsize()
+        if self.stats["unprocessed"]:
+            print(f"{self.stats['unprocessed']} items were not processed (no browser left to run them)")
+        self.report()
+        return self.stats
@@ -1,66 +1,302 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import time
+import asyncio
+import argparse
 import json
-import sys
+import time
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from http_cache import HttpCache, CACHE_FILE
+
+USER_AGENT = "Mozilla/5.0 (compatible; dc-impact-crawler/1.0)"
+# Seconds between two requests to the same host (the old crawler slept 1s after every link)
+POLITENESS_DELAY = 1.0
+# Requests in flight per host / overall
+PER_HOST_CONCURRENCY = 2
+CONCURRENCY = 16
+# Backoff after a "Your activity has been limited" page, doubled on every further hit
+LIMIT_BACKOFF = 60.0
+MAX_LIMIT_HITS = 5
 
-# Set of visited URLs to avoid revisiting
-visited = set()
-# List to store crawled datas s
-crawled_data = []
 
 def is_valid(url):
     parsed = urlparse(url)
     return bool(parsed.netloc) and bool(parsed.scheme)
 
+
 def is_limit_reached(soup):
     title = soup.find('title')
     if title and "Your activity has been limited" in title.get_text():
-        
+
         return True
     return False
 
-def crawl(url, depth): 
-    if depth == 0:
-        return
-    if url in visited:
-        return
-    visited.add(url)
-    print(f"Crawling: {url} at depth {depth}")
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code != 200:
+
+def normalize_url(url):
+    """
+    Canonical form used for dedup: lower-case scheme and host, no default port, no fragment,
+    sorted query parameters and "/" for an empty path.
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, query, ""))
+
+
+class RobotsCache:
+    """robots.txt per host, fetched once per crawl; an unreachable robots.txt allows everything."""
+
+    def __init__(self, session, user_agent=USER_AGENT):
+        self.session = session
+        self.user_agent = user_agent
+        self.parsers = {}
+        self.locks = {}
+
+    async def get(self, url):
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        if origin in self.parsers:
+            return self.parsers[origin]
+        async with self.locks.setdefault(origin, asyncio.Lock()):
+            if origin not in self.parsers:
+                parser = RobotFileParser()
+                try:
+                    async with self.session.get(origin + "/robots.txt") as response:
+                        if response.status in (401, 403):
+                            parser.disallow_all = True
+                        elif response.status == 200:
+                            parser.parse((await response.text(errors="replace")).splitlines())
+                        else:
+                            parser.allow_all = True
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    parser.allow_all = True
+                self.parsers[origin] = parser
+        return self.parsers[origin]
+
+    async def allowed(self, url):
+        return (await self.get(url)).can_fetch(self.user_agent, url)
+
+    async def crawl_delay(self, url):
+        return (await self.get(url)).crawl_delay(self.user_agent)
+
+
+class HostThrottle:
+    """Per-host concurrency limit plus a minimum delay between request starts."""
+
+    def __init__(self, concurrency=PER_HOST_CONCURRENCY, delay=POLITENESS_DELAY):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self.next_start = max(self.next_start, time.monotonic() + seconds)
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self.lock:
+            wait = self.next_start - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.next_start = max(self.next_start, time.monotonic()) + self.delay
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class Crawler:
+    """
+    Breadth-first crawler: a frontier queue of (url, depth) consumed by `concurrency` workers.
+    A page at depth d is fetched and its links are queued at d - 1 (same meaning as the old
+    recursive crawl(url, depth)). Pages are written to a JSONL file as they arrive.
+    """
+
+    def __init__(self, output_file, concurrency=CONCURRENCY, per_host=PER_HOST_CONCURRENCY,
+                 delay=POLITENESS_DELAY, limit_backoff=LIMIT_BACKOFF, max_limit_hits=MAX_LIMIT_HITS,
+                 same_host=False, respect_robots=True, timeout=10, cache=None):
+        self.output_file = output_file
+        self.cache = cache
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.limit_backoff = limit_backoff
+        self.max_limit_hits = max_limit_hits
+        self.same_host = same_host
+        self.respect_robots = respect_robots
+        self.timeout = timeout
+        self.seen = set()
+        self.throttles = {}
+        self.limit_hits = {}
+        self.stopped = False
+        self.stats = {"fetched": 0, "failed": 0, "skipped_robots": 0, "limited": 0}
+
+    def throttle(self, host):
+        if host not in self.throttles:
+            self.throttles[host] = HostThrottle(self.per_host, self.delay)
+        return self.throttles[host]
+
+    def enqueue(self, url, depth):
+        if depth <= 0 or self.stopped:
+            return
+        url = normalize_url(url)
+        if url in self.seen:
             return
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Check if we hit the limit
+        if self.same_host and urlparse(url).hostname not in self.hosts:
+            return
+        self.seen.add(url)
+        self.frontier.put_nowait((url, depth))
+
+    async def fetch(self, url, headers=None):
+        """Return (status, body bytes, response headers) for a GET; raises aiohttp.ClientError on failure."""
+        async with self.session.get(url, headers=headers) as response:
+            return response.status, await response.read(), response.headers
+
+    def parse(self, url, body):
+        soup = BeautifulSoup(body, 'html.parser')
         if is_limit_reached(soup):
-            print("Crawling limit reached! Saving data and exiting...")
-            with open("crawled_data.json", "w", encoding="utf-8") as jsonfile:
-                json.dump(crawled_data, jsonfile, ensure_ascii=False, indent=4)
-            sys.exit(0)
-            
-        # Extract the title of the page
+            return None, []
         title = soup.find('title').get_text() if soup.find('title') else 'No Title'
-        content = soup.get_text()
-        
-        print(f"Title: {title}")
-        # Append to the list
-        crawled_data.append({'URL': url, 'Title': title, 'Content': content})
-        # Find all links on the page
-        for link in soup.find_all('a', href=True):
-            href = link.get('href')
-            next_url = urljoin(url, href)
-            if is_valid(next_url):
-                crawl(next_url, depth - 1)
-                time.sleep(1)
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to crawl {url}: {e}")
+        page = {'URL': url, 'Title': title, 'Content': soup.get_text()}
+        links = [urljoin(url, link.get('href')) for link in soup.find_all('a', href=True)]
+        return page, links
+
+    def on_limited(self, url, depth, host):
+        """Back off the host and retry the page later; give up on the crawl after too many hits."""
+        hits = self.limit_hits.get(host, 0) + 1
+        self.limit_hits[host] = hits
+        self.stats["limited"] += 1
+        if hits >= self.max_limit_hits:
+            print("Crawling limit reached! Saving data and exiting...")
+            self.stopped = True
+            return
+        backoff = self.limit_backoff * 2 ** (hits - 1)
+        print(f"Activity limited on {host}, backing off {backoff:.0f}s")
+        self.throttle(host).pause(backoff)
+        self.frontier.put_nowait((url, depth))
+
+    async def visit(self, url, depth, out):
+        host = urlparse(url).netloc
+        if self.respect_robots:
+            if not await self.robots.allowed(url):
+                self.stats["skipped_robots"] += 1
+                return
+            crawl_delay = await self.robots.crawl_delay(url)
+            if crawl_delay:
+                self.throttle(host).delay = max(self.delay, float(crawl_delay))
+        print(f"Crawling: {url} at depth {depth}")
+        entry = self.cache.get(url) if self.cache else None
+        try:
+            async with self.throttle(host):
+                if self.stopped:
+                    return
+                result = await self.fetch(url, HttpCache.validators(entry))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Failed to crawl {url}: {e}")
+            self.stats["failed"] += 1
+            return
+        status, body, headers = result
+        if status == 429:
+            self.on_limited(url, depth, host)
+            return
+        if status == 304 and entry is not None:
+            page, links = self.cache.not_modified(url, entry)
+        elif status != 200:
+            return
+        else:
+            cached = self.cache.reuse(url, entry, body, headers) if self.cache else None
+            if cached is not None:
+                page, links = cached
+            else:
+                page, links = self.parse(url, body)
+                if page is None:
+                    self.on_limited(url, depth, host)
+                    return
+                if self.cache:
+                    self.cache.put(url, entry, body, headers, page, links)
+        self.limit_hits[host] = 0
+        self.stats["fetched"] += 1
+        print(f"Title: {page['Title']}")
+        out.write(json.dumps(page, ensure_ascii=False) + "\n")
+        out.flush()
+        for link in links:
+            try:
+                if is_valid(link):
+                    self.enqueue(link, depth - 1)
+            except ValueError as e:  # e.g. a port out of range
+                print(f"Skipping malformed link {link!r} on {url}: {e}")
+
+    async def worker(self, out):
+        while True:
+            url, depth = await self.frontier.get()
+            try:
+                if not self.stopped:
+                    await self.visit(url, depth, out)
+            except Exception as e:
+                # One bad page must not take its worker (and eventually the crawl) down
+                print(f"Failed to crawl {url}: {type(e).__name__}: {e}")
+                self.stats["failed"] += 1
+            finally:
+                self.frontier.task_done()
+
+    async def crawl(self, start_urls, depth):
+        self.frontier = asyncio.Queue()
+        self.hosts = {urlparse(normalize_url(url)).hostname for url in start_urls}
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": USER_AGENT}) as session:
+            self.session = session
+            self.robots = RobotsCache(session)
+            for url in start_urls:
+                self.enqueue(url, depth)
+            with open(self.output_file, "w", encoding="utf-8") as out:
+                workers = [asyncio.create_task(self.worker(out)) for _ in range(self.concurrency)]
+                await self.frontier.join()
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        return self.stats
+
+
+def crawl(url, depth, output_file="crawled_data.jsonl", cache_file=CACHE_FILE, **options):
+    """
+    Crawl from `url` down to `depth` levels (1 = only the page itself).
+    With a `cache_file`, pages are revalidated against the previous crawl instead of re-downloaded.
+    """
+    started = time.perf_counter()
+    cache = HttpCache(cache_file) if cache_file else None
+    try:
+        stats = asyncio.run(Crawler(output_file, cache=cache, **options).crawl([url], depth))
+    finally:
+        if cache:
+            print(cache.summary())
+            cache.close()
+    elapsed = time.perf_counter() - started
+    print(f"Fetched {stats['fetched']} pages in {elapsed:.1f}s ({stats['fetched'] / elapsed if elapsed else 0:.2f} pages/sec), "
+          f"{stats['failed']} failed, {stats['skipped_robots']} disallowed by robots.txt, "
+          f"{stats['limited']} limited responses")
+    print(f"Crawled pages saved to {output_file}")
+    return stats
+
 
 if __name__ == "__main__":
-    start_url = "https://www.datacentermap.com/usa/california/santa-clara/"
-    crawl(start_url, depth=2)
-    # Save to JSON file in case we didn't hit the limit
-    with open("crawled_data.json", "w", encoding="utf-8") as jsonfile:
-        json.dump(crawled_data, jsonfile, ensure_ascii=False, indent=4)
+    parser = argparse.ArgumentParser(description="Breadth-first crawler writing pages to JSONL.")
+    parser.add_argument("--url", default="https://www.datacentermap.com/usa/california/santa-clara/")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--output", default="crawled_data.jsonl")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY)
+    parser.add_argument("--delay", type=float, default=POLITENESS_DELAY, help="seconds between requests to one host")
+    parser.add_argument("--same-host", action="store_true", help="only follow links on the start URL's host")
+    parser.add_argument("--ignore-robots", action="store_true")
+    parser.add_argument("--cache", default=CACHE_FILE, help="HTTP cache file for incremental recrawls")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    crawl(args.url, args.depth, args.output, None if args.no_cache else args.cache, concurrency=args.concurrency, per_host=args.per_host,
+          delay=args.delay, same_host=args.same_host, respect_robots=not args.ignore_robots)
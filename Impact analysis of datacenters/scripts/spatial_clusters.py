@@ -0,0 +1,237 @@
+"""
+Spatial clusters of facilities (top_clusters_with_midpoints.csv) on a haversine BallTree.
+
+Same recipe as the DBSCAN cells of Futher_refining_datasets.ipynb (facilities built after 2000,
+min_samples 2, the 100 largest clusters, midpoints as the mean of their members), but with the
+radius in kilometres on the sphere instead of 0.005 degrees of plain lat/lon, and neighbourhoods
+found through a BallTree so clustering stays O(n log n). The core points of a clustering can be
+saved and later used to place newly geocoded facilities into the existing clusters without
+re-clustering, and the same index answers nearest-facility and within-radius queries.
+
+    python spatial_clusters.py cluster --input ../data/power_imputed_dataset.csv \
+        --output top_clusters_with_midpoints.csv --summary cluster_summary.csv --model cluster_cores.parquet
+    python spatial_clusters.py cluster --input ../data/power_imputed_dataset.csv --store --root /tmp/stages
+    python spatial_clusters.py assign --model cluster_cores.parquet --input ../data/GeoCoded/hf_geocoded.csv
+    python spatial_clusters.py nearest --input top_clusters_with_midpoints.csv --lat 39.04 --lon -77.49 --k 3
+    python spatial_clusters.py within --input top_clusters_with_midpoints.csv --lat 39.04 --lon -77.49 --radius-km 5
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0088
+EPS_KM = 0.5  # ~0.005 degrees of latitude, the notebook's eps
+MIN_SAMPLES = 2
+TOP_CLUSTERS = 100
+BUILT_AFTER = 2000
+NOISE = -1
+# Power / area columns, in order of preference, for the per-cluster aggregates
+POWER_COLUMNS = ["aggregated_power_imputed", "aggregated_power", "power_standardized", "Power_Standardized"]
+AREA_COLUMNS = ["aggregated_area", "area_standardized", "Area_Standardized"]
+
+
+def _radians(lat, lon) -> np.ndarray:
+    return np.radians(np.column_stack([np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)]))
+
+
+def _first_present(df: pd.DataFrame, candidates: list):
+    return next((c for c in candidates if c in df.columns), None)
+
+
+class FacilityIndex:
+    """Haversine BallTree over facility coordinates; distances are in kilometres."""
+
+    def __init__(self, lat, lon):
+        self.tree = BallTree(_radians(lat, lon), metric="haversine")
+
+    def nearest(self, lat, lon, k: int = 1):
+        """(distances, indices), each shaped (len(lat), k), of the k closest facilities."""
+        distances, indices = self.tree.query(_radians(np.atleast_1d(lat), np.atleast_1d(lon)), k=k)
+        return distances * EARTH_RADIUS_KM, indices
+
+    def within(self, lat, lon, radius_km: float, sort: bool = True):
+        """(distances, indices) per query point: arrays of the facilities within `radius_km`."""
+        indices, distances = self.tree.query_radius(_radians(np.atleast_1d(lat), np.atleast_1d(lon)),
+                                                    r=radius_km / EARTH_RADIUS_KM, return_distance=True,
+                                                    sort_results=sort)
+        return [d * EARTH_RADIUS_KM for d in distances], list(indices)
+
+
+class SpatialClusters:
+    """
+    DBSCAN with the haversine metric. After `fit`, the core points and their labels are kept:
+    `assign` puts a new facility in the cluster of the nearest core point within `eps_km`
+    (DBSCAN's rule for border points) and leaves the rest as noise (-1).
+    """
+
+    def __init__(self, eps_km: float = EPS_KM, min_samples: int = MIN_SAMPLES):
+        self.eps_km = eps_km
+        self.min_samples = min_samples
+        self.cores = None
+        self.index = None
+
+    def fit(self, lat, lon) -> np.ndarray:
+        dbscan = DBSCAN(eps=self.eps_km / EARTH_RADIUS_KM, min_samples=self.min_samples,
+                        metric="haversine", algorithm="ball_tree")
+        labels = dbscan.fit_predict(_radians(lat, lon))
+        core = dbscan.core_sample_indices_
+        self._set_cores(pd.DataFrame({"latitude": np.asarray(lat, dtype=float)[core],
+                                      "longitude": np.asarray(lon, dtype=float)[core],
+                                      "cluster": labels[core]}))
+        return labels
+
+    def _set_cores(self, cores: pd.DataFrame):
+        self.cores = cores.reset_index(drop=True)
+        self.index = FacilityIndex(self.cores["latitude"], self.cores["longitude"]) if len(self.cores) else None
+
+    def assign(self, lat, lon) -> np.ndarray:
+        lat, lon = np.atleast_1d(lat), np.atleast_1d(lon)
+        labels = np.full(len(lat), NOISE, dtype=np.int64)
+        if self.index is None or not len(lat):
+            return labels
+        distances, indices = self.index.nearest(lat, lon)
+        close = distances[:, 0] <= self.eps_km
+        labels[close] = self.cores["cluster"].to_numpy()[indices[close, 0]]
+        return labels
+
+    def save(self, path: str):
+        """Core points with their cluster labels, plus eps / min_samples in the file metadata."""
+        table = pa.Table.from_pandas(self.cores, preserve_index=False)
+        table = table.replace_schema_metadata({"eps_km": str(self.eps_km), "min_samples": str(self.min_samples)})
+        pq.write_table(table, path, compression="zstd")
+
+    @classmethod
+    def load(cls, path: str) -> "SpatialClusters":
+        table = pq.read_table(path)
+        meta = table.schema.metadata
+        model = cls(float(meta[b"eps_km"]), int(meta[b"min_samples"]))
+        model._set_cores(table.to_pandas())
+        return model
+
+
+def prepare_facilities(df: pd.DataFrame, built_after: float = BUILT_AFTER) -> pd.DataFrame:
+    """
+    The notebook's filter: coordinates (and, where the columns exist, imputed power and state)
+    present and, unless `built_after` is None, built after that year.
+    """
+    df = df.dropna(subset=["latitude", "longitude"] + [c for c in ("aggregated_power_imputed", "state")
+                                                        if c in df.columns])
+    if built_after is not None and "yearbuilt" in df.columns:
+        df = df[pd.to_numeric(df["yearbuilt"], errors="coerce") > built_after]
+    return df.copy()
+
+
+def cluster_summary(facilities: pd.DataFrame, labels) -> pd.DataFrame:
+    """One row per cluster (noise excluded): size, midpoint, total power / area, most common state."""
+    df = facilities.assign(cluster=np.asarray(labels))
+    df = df[df["cluster"] != NOISE]
+    grouped = df.groupby("cluster", sort=False)
+    summary = pd.DataFrame({
+        "data_center_count": grouped.size(),
+        "cluster_mid_lat": grouped["latitude"].mean(),
+        "cluster_mid_lon": grouped["longitude"].mean(),
+    })
+    power, area = _first_present(df, POWER_COLUMNS), _first_present(df, AREA_COLUMNS)
+    if power:
+        summary["total_power"] = grouped[power].sum(min_count=1)
+    if area:
+        summary["total_area"] = grouped[area].sum(min_count=1)
+        summary["avg_area"] = grouped[area].mean()
+    if "state" in df.columns:
+        summary["state"] = grouped["state"].agg(lambda s: s.mode().iloc[0] if not s.mode().empty else np.nan)
+    return summary.reset_index().sort_values(["data_center_count", "cluster"], ascending=[False, True],
+                                             ignore_index=True)
+
+
+def top_clusters_with_midpoints(facilities: pd.DataFrame, labels, top: int = TOP_CLUSTERS) -> pd.DataFrame:
+    """The facility rows of the `top` largest clusters with cluster / cluster_mid_lat / cluster_mid_lon."""
+    summary = cluster_summary(facilities, labels)
+    keep = summary.head(top)[["cluster", "cluster_mid_lat", "cluster_mid_lon"]]
+    df = facilities.assign(cluster=np.asarray(labels))
+    return df[df["cluster"].isin(keep["cluster"])].merge(keep, on="cluster", how="left")
+
+
+def _read(paths: list) -> pd.DataFrame:
+    return pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Haversine DBSCAN clusters of the geocoded facilities.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cluster = commands.add_parser("cluster", help="cluster facilities and write the top clusters")
+    cluster.add_argument("--input", nargs="+", required=True, help="CSVs with latitude / longitude columns")
+    cluster.add_argument("--output", default="top_clusters_with_midpoints.csv")
+    cluster.add_argument("--summary", help="also write the per-cluster table here")
+    cluster.add_argument("--model", help="save the core points here for `assign`")
+    cluster.add_argument("--store", action="store_true", help="also write the top_clusters stage of stage_store")
+    cluster.add_argument("--root", help="stage_store directory for --store (default: data/stages)")
+    cluster.add_argument("--eps-km", type=float, default=EPS_KM)
+    cluster.add_argument("--min-samples", type=int, default=MIN_SAMPLES)
+    cluster.add_argument("--top", type=int, default=TOP_CLUSTERS)
+    cluster.add_argument("--built-after", type=float, default=BUILT_AFTER,
+                         help="keep facilities built after this year (0 keeps all, unknown years too)")
+
+    assign = commands.add_parser("assign", help="place new facilities in saved clusters")
+    assign.add_argument("--model", required=True)
+    assign.add_argument("--input", nargs="+", required=True)
+    assign.add_argument("--output", default="assigned_clusters.csv")
+
+    for name in ("nearest", "within"):
+        query = commands.add_parser(name, help=f"{name} facilities to a point")
+        query.add_argument("--input", nargs="+", required=True)
+        query.add_argument("--lat", type=float, required=True)
+        query.add_argument("--lon", type=float, required=True)
+        if name == "nearest":
+            query.add_argument("--k", type=int, default=5)
+        else:
+            query.add_argument("--radius-km", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.command == "cluster":
+        facilities = prepare_facilities(_read(args.input), args.built_after or None)
+        model = SpatialClusters(args.eps_km, args.min_samples)
+        labels = model.fit(facilities["latitude"], facilities["longitude"])
+        summary = cluster_summary(facilities, labels)
+        top = top_clusters_with_midpoints(facilities, labels, args.top)
+        print(f"{len(facilities)} facilities -> {len(summary)} clusters "
+              f"({int((labels == NOISE).sum())} noise); top {args.top} hold {len(top)} facilities")
+        top.to_csv(args.output, index=False)
+        if args.summary:
+            summary.to_csv(args.summary, index=False)
+        if args.model:
+            model.save(args.model)
+        if args.store:
+            from stage_store import STAGE_DIR, write_stage
+            if "yearbuilt" in top.columns:
+                top = top.assign(build_decade=(pd.to_numeric(top["yearbuilt"], errors="coerce") // 10) * 10)
+            print(f"Stored as {write_stage('top_clusters', top, root=args.root or STAGE_DIR)}")
+    elif args.command == "assign":
+        model = SpatialClusters.load(args.model)
+        facilities = _read(args.input)
+        located = facilities["latitude"].notna() & facilities["longitude"].notna()
+        facilities["cluster"] = NOISE
+        facilities.loc[located, "cluster"] = model.assign(facilities.loc[located, "latitude"],
+                                                          facilities.loc[located, "longitude"])
+        print(f"{int((facilities['cluster'] != NOISE).sum())} of {len(facilities)} facilities joined an existing cluster")
+        facilities.to_csv(args.output, index=False)
+    else:
+        facilities = _read(args.input).dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+        index = FacilityIndex(facilities["latitude"], facilities["longitude"])
+        if args.command == "nearest":
+            distances, indices = index.nearest(args.lat, args.lon, min(args.k, len(facilities)))
+            distances, indices = distances[0], indices[0]
+        else:
+            distances, indices = index.within(args.lat, args.lon, args.radius_km)
+            distances, indices = distances[0], indices[0]
+        columns = [c for c in ["name", "provider", "cluster", "latitude", "longitude"] if c in facilities.columns]
+        print(facilities.iloc[indices][columns].assign(distance_km=np.round(distances, 3)).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
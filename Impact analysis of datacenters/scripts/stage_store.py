@@ -0,0 +1,342 @@
+"""
+Typed Parquet copies of the pipeline's intermediate datasets.
+
+    llm_extracted/*.json -> power/*.csv -> area_power/*.csv -> cleaned/*.csv -> GeoCoded/*.csv
+        -> weather_data_merged_dataset.csv -> power_imputed_dataset.csv -> top_clusters_with_midpoints.csv
+
+Every stage has an explicit schema below, so a load comes back with the same dtypes whichever
+site it came from (ZIP codes always as strings, measurements as floats, the ftype_* flags as
+booleans) and no notebook has to re-coerce columns with pd.to_numeric. The scraped stages keep
+YearBuilt as text: it still holds values like "1980s" until the merge turns it into a number.
+
+Stages scraped from several sites are partitioned by `dataset` (hawk / centers / map), so asking
+for one site only opens that site's file; any other filter is pushed down to the Parquet
+row-group statistics.
+
+    python stage_store.py convert                  # CSV/JSON under data/ -> data/stages/
+    python stage_store.py convert --stages power_imputed
+    python stage_store.py info
+
+The last stage, top_clusters, has no CSV under data/: Futher_refining_datasets.ipynb writes it with
+write_stage, and when it is not there `convert` builds it from the stored power_imputed stage with
+spatial_clusters (haversine DBSCAN). So, on a fresh checkout:
+
+    1. python stage_store.py convert               # every stage, top_clusters included
+    2. Futher_refining_datasets.ipynb              # optional: rewrites top_clusters with the notebook's DBSCAN
+       (or python spatial_clusters.py cluster --input ../data/power_imputed_dataset.csv --store)
+    3. climatedata.ipynb, Final Analysis.ipynb     # read top_clusters through load_climatedata / load_final_analysis
+
+    from stage_store import read_stage, load_final_analysis
+    df = read_stage("geocoded", columns=["name", "latitude", "longitude"],
+                    filters=[("dataset", "==", "hawk"), ("state", "==", "VA")])
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+STAGE_DIR = os.path.join(DATA_DIR, "stages")
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 64_000
+DATASETS = ["hawk", "centers", "map"]
+
+# Columns shared by the scraped stages, as the LLM extraction names them
+RAW_FIELDS = ["unique_key", "source", "Name", "Provider", "StreetAddress", "City", "ZipCode", "State", "Country",
+              "Whitespace", "Area", "YearBuilt", "Power", "Scale", "Certifications", "URL"]
+# Columns of the merged (one row per deduplicated facility) dataset
+MERGED_FIELDS = [
+    ("latitude", pa.float64()), ("longitude", pa.float64()), ("name", pa.string()), ("provider", pa.string()),
+    ("full_address", pa.string()), ("facility_type", pa.string()), ("data_center_count", pa.int64()),
+    ("aggregated_power", pa.float64()), ("aggregated_area", pa.float64()), ("yearbuilt", pa.float64()),
+    ("sources", pa.string()), ("avg_name_similarity", pa.float64()), ("avg_provider_similarity", pa.float64()),
+]
+
+
+def _raw_schema(lowercase=False, extra=()):
+    fields = [(name, pa.string()) for name in RAW_FIELDS]
+    if lowercase:
+        fields = [(name.lower(), kind) for name, kind in fields]
+    return pa.schema(fields + list(extra))
+
+
+POWER_IMPUTED_SCHEMA = pa.schema(
+    [field for field in MERGED_FIELDS if field[0] != "facility_type"]
+    + [("state", pa.string()), ("facility_type_orig", pa.string()), ("log_power", pa.float64()),
+       ("log_area", pa.float64()), ("ftype_Building", pa.bool_()), ("ftype_Campus", pa.bool_()),
+       ("ftype_Individual", pa.bool_()), ("aggregated_power_imputed", pa.float64())])
+
+# name -> schema, source files relative to data/ ({dataset: path} for the per-site stages)
+STAGES = {
+    "llm_extracted": {
+        "schema": _raw_schema(),
+        "sources": {d: f"llm_extracted/{d}_extracted.json" for d in DATASETS},
+    },
+    "power": {
+        "schema": _raw_schema(extra=[("Power_Standardized", pa.float64())]),
+        "sources": {d: f"power/{d}_power.csv" for d in DATASETS},
+    },
+    "area_power": {
+        "schema": _raw_schema(extra=[("Power_Standardized", pa.float64()), ("Area_Standardized", pa.float64())]),
+        "sources": {d: f"area_power/{d}_area_cleaned.csv" for d in DATASETS},
+    },
+    "cleaned": {
+        "schema": _raw_schema(extra=[("Power_Standardized", pa.float64()), ("Area_Standardized", pa.float64())]),
+        "sources": {d: f"cleaned/{d}_cleaned.csv" for d in DATASETS},
+    },
+    "geocoded": {
+        "schema": _raw_schema(lowercase=True, extra=[
+            ("power_standardized", pa.float64()), ("area_standardized", pa.float64()),
+            ("full_address", pa.string()), ("latitude", pa.float64()), ("longitude", pa.float64())]),
+        "sources": {"hawk": "GeoCoded/hf_geocoded.csv", "centers": "GeoCoded/cf_geocoded.csv",
+                    "map": "GeoCoded/mf_geocoded.csv"},
+    },
+    # The notebooks call this merged_dataset.csv; the copy under data/ is the weather-merge input
+    "weather_merged": {
+        "schema": pa.schema(MERGED_FIELDS),
+        "sources": "weather_data_merged_dataset.csv",
+    },
+    "power_imputed": {
+        "schema": POWER_IMPUTED_SCHEMA,
+        "sources": "power_imputed_dataset.csv",
+    },
+    # Written by Futher_refining_datasets.ipynb (or built from power_imputed), read by climatedata / Final Analysis
+    "top_clusters": {
+        "schema": pa.schema(list(POWER_IMPUTED_SCHEMA) + [
+            pa.field("build_decade", pa.float64()), pa.field("cluster", pa.int64()),
+            pa.field("cluster_mid_lat", pa.float64()), pa.field("cluster_mid_lon", pa.float64())]),
+        "sources": "top_clusters_with_midpoints.csv",
+    },
+}
+
+
+def is_partitioned(stage: str) -> bool:
+    return isinstance(STAGES[stage]["sources"], dict)
+
+
+def stage_path(stage: str, root: str = STAGE_DIR) -> str:
+    return os.path.join(root, stage)
+
+
+def _stage_info(stage: str) -> dict:
+    if stage not in STAGES:
+        raise KeyError(f"Unknown stage {stage!r}; expected one of {', '.join(STAGES)}")
+    return STAGES[stage]
+
+
+def _as_string(series: pd.Series) -> pd.Series:
+    """Text column; numbers read back by an earlier CSV round-trip (20147.0) lose their ".0"."""
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series.astype(object).where(series.notna(), None).map(lambda v: v if v is None else str(v))
+    values = series.astype(float)
+    whole = values.notna() & (values == np.trunc(values))
+    text = values.astype(object).map(lambda v: None if pd.isna(v) else repr(v))
+    text[whole] = values[whole].astype(np.int64).astype(str)
+    return text
+
+
+def _as_bool(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    text = series.astype(str).str.strip().str.lower()
+    return text.map({"true": True, "1": True, "1.0": True, "false": False, "0": False, "0.0": False})
+
+
+def coerce(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """DataFrame -> Table with exactly `schema`'s columns and types; unknown columns are an error."""
+    unknown = [c for c in df.columns if c not in schema.names]
+    if unknown:
+        raise ValueError(f"Columns not in the stage schema: {unknown}")
+    arrays = []
+    for field in schema:
+        if field.name not in df.columns:
+            arrays.append(pa.nulls(len(df), field.type))
+            continue
+        column = df[field.name]
+        if pa.types.is_string(field.type):
+            column = _as_string(column)
+        elif pa.types.is_boolean(field.type):
+            column = _as_bool(column)
+        elif pa.types.is_integer(field.type):
+            column = pd.to_numeric(column, errors="coerce").astype("Int64")
+        elif pa.types.is_floating(field.type):
+            column = pd.to_numeric(column, errors="coerce").astype(float)
+        elif pa.types.is_timestamp(field.type):
+            column = pd.to_datetime(column, errors="coerce")
+        arrays.append(pa.array(column, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _write_table(table: pa.Table, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+
+
+def write_stage(stage: str, df: pd.DataFrame, dataset: str = None, root: str = STAGE_DIR) -> str:
+    """
+    Store `df` as the stage (or, for the per-site stages, as its `dataset` partition).
+    Replaces what was there before; returns the file written.
+    """
+    info = _stage_info(stage)
+    if is_partitioned(stage):
+        if dataset is None:
+            raise ValueError(f"Stage {stage!r} is stored per dataset; pass dataset=")
+        path = os.path.join(stage_path(stage, root), f"dataset={dataset}", "part-0.parquet")
+    else:
+        path = os.path.join(stage_path(stage, root), "part-0.parquet")
+    table = coerce(df.drop(columns=["dataset"], errors="ignore"), info["schema"])
+    _write_table(table, path)
+    return path
+
+
+def _dataset(stage: str, root: str):
+    info = _stage_info(stage)
+    path = stage_path(stage, root)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No stored {stage!r} stage under {root}; run `python stage_store.py convert`")
+    if is_partitioned(stage):
+        partitioning = ds.partitioning(pa.schema([("dataset", pa.string())]), flavor="hive")
+        schema = info["schema"].append(pa.field("dataset", pa.string()))
+        return ds.dataset(path, format="parquet", partitioning=partitioning, schema=schema)
+    return ds.dataset(path, format="parquet", schema=info["schema"])
+
+
+def _expression(filters):
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def read_stage(stage: str, columns: list = None, filters=None, root: str = STAGE_DIR) -> pd.DataFrame:
+    """
+    Load a stage with its schema's dtypes. `columns` limits what is decoded; `filters` is a pyarrow
+    expression or the DNF list form read_parquet takes, e.g. [("dataset", "==", "hawk")].
+    """
+    table = _dataset(stage, root).to_table(columns=columns, filter=_expression(filters))
+    return table.to_pandas()
+
+
+def read_by_dataset(stage: str, columns: list = None, filters=None, root: str = STAGE_DIR) -> dict:
+    """{dataset: DataFrame} for a per-site stage, each frame without the partition column."""
+    datasets = {}
+    for dataset in DATASETS:
+        condition = ds.field("dataset") == dataset
+        if filters is not None:
+            condition = condition & _expression(filters)
+        datasets[dataset] = read_stage(stage, columns, condition, root).drop(columns=["dataset"], errors="ignore")
+    return datasets
+
+
+# One call per notebook
+def load_initial_preparation(root: str = STAGE_DIR) -> dict:
+    """Inital data preparation: the LLM-extracted records per site."""
+    return read_by_dataset("llm_extracted", root=root)
+
+
+def load_refining(stage: str = "cleaned", root: str = STAGE_DIR) -> dict:
+    """
+    Futher_refining_datasets: the cleaned per-site tables (df_hawk_cleaned etc.), or with
+    stage="area_power" the tables the notebook starts from.
+    """
+    return read_by_dataset(stage, root=root)
+
+
+def load_power_estimation(root: str = STAGE_DIR) -> pd.DataFrame:
+    """power_estimation: the merged facility table."""
+    return read_stage("weather_merged", root=root)
+
+
+def load_climatedata(root: str = STAGE_DIR) -> pd.DataFrame:
+    """climatedata: only the columns the weather lookup needs."""
+    return read_stage("top_clusters", ["cluster", "cluster_mid_lat", "cluster_mid_lon", "yearbuilt"], root=root)
+
+
+def load_final_analysis(root: str = STAGE_DIR) -> pd.DataFrame:
+    """Final Analysis: the clustered facilities, already typed."""
+    return read_stage("top_clusters", root=root)
+
+
+def read_source(path: str) -> pd.DataFrame:
+    """A stage's original CSV/JSON file, every column as text (the schema decides the types)."""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return pd.DataFrame(json.load(f), dtype=object)
+    return pd.read_csv(path, dtype=str, keep_default_na=True)
+
+
+def build_top_clusters(root: str = STAGE_DIR) -> pd.DataFrame:
+    """
+    The top_clusters stage from the stored power_imputed stage: the facilities of the largest
+    spatial_clusters clusters with their midpoints, plus the notebook's build_decade.
+    """
+    from spatial_clusters import SpatialClusters, prepare_facilities, top_clusters_with_midpoints
+
+    facilities = prepare_facilities(read_stage("power_imputed", root=root))
+    labels = SpatialClusters().fit(facilities["latitude"], facilities["longitude"])
+    top = top_clusters_with_midpoints(facilities, labels)
+    return top.assign(build_decade=(top["yearbuilt"] // 10) * 10)
+
+
+def convert(stages=None, data_dir: str = DATA_DIR, root: str = STAGE_DIR):
+    """
+    Write the stored copy of each stage whose source files exist under `data_dir`. Without a
+    top_clusters CSV, that stage is built from the power_imputed stage stored under `root`.
+    """
+    for stage in stages or STAGES:
+        sources = _stage_info(stage)["sources"]
+        items = sources.items() if is_partitioned(stage) else [(None, sources)]
+        for dataset, relative in items:
+            path = os.path.join(data_dir, relative)
+            if not os.path.exists(path) and stage == "top_clusters":
+                if not os.path.isdir(stage_path("power_imputed", root)):
+                    print(f"{stage}: {relative} not found and no power_imputed stage to build it from, skipped")
+                    continue
+                out = write_stage(stage, build_top_clusters(root), root=root)
+                print(f"{stage}: built from power_imputed -> {os.path.relpath(out, root)}")
+                continue
+            if not os.path.exists(path):
+                print(f"{stage}: {relative} not found, skipped")
+                continue
+            df = read_source(path)
+            out = write_stage(stage, df, dataset, root)
+            print(f"{stage}: {relative} ({len(df)} rows, {os.path.getsize(path) / 1e3:.0f} kB) "
+                  f"-> {os.path.relpath(out, root)} ({os.path.getsize(out) / 1e3:.0f} kB)")
+
+
+def info(root: str = STAGE_DIR):
+    for stage in STAGES:
+        path = stage_path(stage, root)
+        if not os.path.isdir(path):
+            print(f"{stage:<15} not stored")
+            continue
+        dataset = _dataset(stage, root)
+        size = sum(os.path.getsize(f) for f in dataset.files)
+        print(f"{stage:<15} {dataset.count_rows():>7} rows  {len(dataset.files)} file(s)  {size / 1e3:>6.0f} kB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typed Parquet store for the pipeline stages.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    conv = commands.add_parser("convert", help="write Parquet copies of the CSV/JSON stages")
+    conv.add_argument("--stages", nargs="+", choices=list(STAGES))
+    conv.add_argument("--data-dir", default=DATA_DIR)
+    conv.add_argument("--root", default=STAGE_DIR)
+    show = commands.add_parser("info", help="list the stored stages")
+    show.add_argument("--root", default=STAGE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert(args.stages, args.data_dir, args.root)
+    else:
+        info(args.root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+
+try:
+    import ijson
+except ImportError:  # fall back to json.load (same results, no streaming)
+    ijson = None
+
+
+def _build(event, value, events):
+    """Assemble the value that starts with (event, value) from the rest of the event stream."""
+    if event not in ("start_map", "start_array"):
+        return value
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    for event, value in events:
+        builder.event(event, value)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
+
+
+def _walk(value, path, want):
+    if want(path):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, child in value.items():
+            yield from _walk(child, path + (key,), want)
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            yield from _walk(child, path + (index,), want)
+
+
+def iter_values(input_file: str, want):
+    """
+    Yield (path, value) for every value in the JSON file whose path satisfies `want(path)`.
+    A path is a tuple of object keys and array indexes, e.g. ("Virginia", "details", 0, "name").
+    Only the wanted values are ever materialized, so memory does not grow with the file.
+    Keys are tracked as tuples, so keys containing dots (e.g. "St. Louis") are safe.
+    """
+    with open(input_file, "rb") as f:
+        if ijson is None:
+            yield from _walk(json.load(f), (), want)
+            return
+        events = iter(ijson.basic_parse(f, use_float=True))
+        path, is_array = [], []
+        for event, value in events:
+            if event == "map_key":
+                path[-1] = value
+                continue
+            if event in ("end_map", "end_array"):
+                path.pop()
+                is_array.pop()
+                continue
+            if is_array and is_array[-1]:
+                path[-1] += 1
+            current = tuple(path)
+            if want(current):
+                yield current, _build(event, value, events)
+            elif event in ("start_map", "start_array"):
+                path.append(-1 if event == "start_array" else None)
+                is_array.append(event == "start_array")
+
+
+def iter_top_level(input_file: str):
+    """Yield (key, value) for each top-level entry, e.g. facility_id -> facility or state -> state data."""
+    for path, value in iter_values(input_file, lambda path: len(path) == 1):
+        yield path[0], value
+
+
+def iter_hawk(input_file: str):
+    """
+    Yield (unique_key, facility) for datacenterhawk data:
+    markets -> {market: {name, link, facilities: {facility_key: {...}}}}.
+    The facility carries its market name under "market"; unique_key is "<market name>_<facility_key>".
+    """
+    def want(path):
+        return (len(path) == 3 and path[0] == "markets" and path[2] == "name") or \
+               (len(path) == 4 and path[0] == "markets" and path[2] == "facilities")
+
+    market_key, market_name, pending = None, None, []
+    for path, value in iter_values(input_file, want):
+        if path[1] != market_key:
+            # New market: facilities that arrived before any "name" fall back to the market key
+            for fac_key, fac_data in pending:
+                yield f"{market_key}_{fac_key}", {"market": market_key, **fac_data}
+            market_key, market_name, pending = path[1], None, []
+        if len(path) == 3:
+            market_name = value
+            for fac_key, fac_data in pending:
+                yield f"{market_name}_{fac_key}", {"market": market_name, **fac_data}
+            pending = []
+        elif market_name is None:
+            pending.append((path[3], value))
+        else:
+            yield f"{market_name}_{path[3]}", {"market": market_name, **value}
+    for fac_key, fac_data in pending:
+        yield f"{market_key}_{fac_key}", {"market": market_key, **fac_data}
+
+
+def iter_centers(input_file: str):
+    """Yield (facility_id, facility) for datacenters.com data: {facility_id: {Name, Address, ..., Url}}."""
+    yield from iter_top_level(input_file)
+
+
+def iter_datacentermap(input_file: str):
+    """
+    Yield (unique_key, facility) for datacentermap data:
+    {state: {count, details: [{name, url, count, addresses: [{url, name, address1, ...}]}]}}.
+    The facility is the address combined with "state", "city" and "detail_url";
+    unique_key is "<state>_<city>_<address url>".
+    """
+    def want(path):
+        return len(path) >= 4 and path[1] == "details" and (
+            (len(path) == 4 and path[3] in ("name", "url")) or
+            (len(path) == 5 and path[3] == "addresses"))
+
+    def combined(state, detail, address):
+        city = detail.get("name", "")
+        facility = {"state": state, "city": city, "detail_url": detail.get("url", ""), **address}
+        return f"{state}_{city}_{address.get('url', '')}", facility
+
+    current, detail, pending = None, {}, []
+    for path, value in iter_values(input_file, want):
+        if path[:3] != current:
+            for address in pending:
+                yield combined(current[0], detail, address)
+            current, detail, pending = path[:3], {}, []
+        if len(path) == 4:
+            detail[path[3]] = value
+        else:
+            pending.append(value)
+        # Addresses are held back only until the detail's name and url have been seen
+        if "name" in detail and "url" in detail:
+            for address in pending:
+                yield combined(current[0], detail, address)
+            pending = []
+    for address in pending:
+        yield combined(current[0], detail, address)
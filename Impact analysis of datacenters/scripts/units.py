@@ -0,0 +1,149 @@
+"""
+Column-wise unit normalization for the scraped Power and Area strings.
+
+Same rules as standardize_power / convert_to_sqft / resolve_area_conflict in
+"Inital data preparation.ipynb", but every case is one Series.str.extract over the column
+instead of several re.match calls per row, and only distinct strings are parsed (the scraped
+columns repeat the same few hundred values). Each function returns a DataFrame with the
+standardized `value` and a `status` saying which rule produced it.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+ACRE_TO_SQFT = 43560  # 1 acre = 43,560 sqft
+SQM_TO_SQFT = 10.764  # 1 sqm = 10.764 sqft
+
+# Power patterns, in the order the rules are tried
+POWER_MULTIPLIER = re.compile(r"^(\d+)\s*x\s*(\d+)\s*(kW|MW)", re.IGNORECASE)  # "3 x 1500 kW"
+POWER_WITH_UNIT = re.compile(r"(\d+\.?\d*)\s*(kW|MW)", re.IGNORECASE)  # every "800 kW", summed
+POWER_RANGE = re.compile(r"(\d+\.?\d*)\s*(kW|MW)?\s*(?:to|-)\s*(\d+\.?\d*)\s*(kW|MW)?", re.IGNORECASE)
+POWER_BARE = re.compile(r"^(\d+(?:\.\d+)?)$")
+
+# Area patterns (matched on the lower-cased value)
+AREA_MILLION = re.compile(r"^([\d.]+)\s*(?:m|million)\s*sf")
+AREA_ACRES = re.compile(r"^([\d.]+)\s*acre")
+AREA_SQM = re.compile(r"^([\d.]+)\s*(?:square meters|sqm)")
+AREA_RANGE = re.compile(r"(\d+\.?\d*)\s*(?:sq.?ft.?|sf)?\s*(?:to|-)\s*(\d+\.?\d*)\s*(?:sq.?ft.?|sf)?")
+AREA_NUMBER = re.compile(r"(\d+(?:\.\d+)?)")
+
+# Parse-status codes
+MISSING = "missing"
+UNPARSED = "unparsed"
+POWER_STATUSES = ["multiplier", "unit", "units_summed", "range", "bare_mw", "bare_kw"]
+AREA_STATUSES = ["million_sf", "acres", "sqm", "range", "sqft"]
+
+
+def _number(series: pd.Series) -> pd.Series:
+    return pd.to_numeric(series, errors="coerce").astype(float)
+
+
+def _mask(series: pd.Series) -> pd.Series:
+    return series.fillna(False).astype(bool)
+
+
+def _mw(value: pd.Series, unit: pd.Series) -> pd.Series:
+    """Value in MW given a kW/MW unit column (no unit counts as kW, as in the notebook's range rule)."""
+    return value.where(_mask(unit.str.lower() == "mw"), value / 1000)
+
+
+def _select(index, cases, default_status=UNPARSED) -> pd.DataFrame:
+    """First matching case wins: `cases` is a list of (mask, values, status) in priority order."""
+    masks = [_mask(mask).to_numpy() for mask, _, _ in cases]
+    value = np.select(masks, [values.to_numpy(dtype=float) for _, values, _ in cases], default=np.nan)
+    status = np.select(masks, [status for _, _, status in cases], default=default_status)
+    return pd.DataFrame({"value": value, "status": status}, index=index)
+
+
+def _per_unique(series: pd.Series, parse) -> pd.DataFrame:
+    """Run `parse` on the distinct values of `series` only and broadcast the result back."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    parsed = parse(pd.Series(uniques, dtype=object))
+    result = parsed.iloc[codes]
+    result.index = series.index
+    return result
+
+
+def _parse_power(power: pd.Series) -> pd.DataFrame:
+    text = power.where(power.isna(), power.astype(str))
+    missing = text.isna() | (text == "") | _mask(text.str.contains("No data", regex=False)) \
+        | _mask(text.str.contains("Not Available", regex=False))
+    text = text.str.replace(",", "", regex=False).str.strip()
+
+    multiplier = text.str.extract(POWER_MULTIPLIER)
+    multiplier_mw = _mw(_number(multiplier[0]) * _number(multiplier[1]), multiplier[2])
+
+    # findall + sum: every number-with-unit in the string
+    units = text.str.extractall(POWER_WITH_UNIT)
+    unit_mw = _mw(_number(units[0]), units[1])
+    grouped = unit_mw.groupby(level=0)
+    units_total = grouped.sum().reindex(text.index)
+    units_count = grouped.size().reindex(text.index, fill_value=0)
+
+    ranges = text.str.extract(POWER_RANGE)
+    range_mw = _mw(_number(ranges[2]), ranges[3].fillna(""))
+
+    bare = _number(text.str.extract(POWER_BARE)[0])
+
+    return _select(text.index, [
+        (missing, pd.Series(np.nan, index=text.index), MISSING),
+        (multiplier[0].notna(), multiplier_mw, "multiplier"),
+        (units_count == 1, units_total, "unit"),
+        (units_count > 1, units_total, "units_summed"),
+        (ranges[2].notna(), range_mw, "range"),
+        (bare > 10000, bare / 1000, "bare_kw"),
+        (bare.notna(), bare, "bare_mw"),
+    ])
+
+
+def _parse_area(area: pd.Series) -> pd.DataFrame:
+    is_text = area.map(lambda v: isinstance(v, str))
+    text = area.where(is_text)
+    missing = text.isna() | _mask(text.str.strip() == "")
+    text = text.str.lower().str.replace(",", "", regex=False).str.strip()
+
+    million = _number(text.str.extract(AREA_MILLION)[0])
+    acres = _number(text.str.extract(AREA_ACRES)[0])
+    sqm = _number(text.str.extract(AREA_SQM)[0])
+    high = _number(text.str.extract(AREA_RANGE)[1])
+    sqft = _number(text.str.extract(AREA_NUMBER)[0])
+
+    return _select(text.index, [
+        (missing, pd.Series(np.nan, index=text.index), MISSING),
+        (million.notna(), np.trunc(million * 1_000_000), "million_sf"),
+        (acres.notna(), np.trunc(acres * ACRE_TO_SQFT), "acres"),
+        (sqm.notna(), np.trunc(sqm * SQM_TO_SQFT), "sqm"),
+        (high.notna(), np.trunc(high), "range"),
+        (sqft.notna(), np.trunc(sqft), "sqft"),
+    ])
+
+
+def standardize_power(power: pd.Series) -> pd.DataFrame:
+    """Power strings -> MW, e.g. "2 x 10 MW" -> 20, "800 kW, 1000 kW" -> 1.8, "3 to 15" -> 0.015 (kW)."""
+    return _per_unique(power, _parse_power)
+
+
+def convert_to_sqft(area: pd.Series) -> pd.DataFrame:
+    """Area strings -> whole square feet, e.g. "1.2M SF", "3 acres", "500 sqm", "3,500 SF - 15,000 SF"."""
+    return _per_unique(area, _parse_area)
+
+
+def resolve_area(area: pd.Series, whitespace: pd.Series) -> pd.DataFrame:
+    """
+    Area_Standardized: the larger of Area and Whitespace in sqft, whichever is present.
+    `status` is "area", "whitespace", "both" or "missing"; the per-column parse statuses
+    are returned as `area_status` / `whitespace_status`.
+    """
+    area_sqft = convert_to_sqft(area)
+    whitespace_sqft = convert_to_sqft(whitespace)
+    has_area = area_sqft["value"].notna()
+    has_whitespace = whitespace_sqft["value"].notna()
+    status = np.select([has_area & has_whitespace, has_area, has_whitespace], ["both", "area", "whitespace"],
+                       default=MISSING)
+    return pd.DataFrame({
+        "value": np.fmax(area_sqft["value"], whitespace_sqft["value"]),
+        "status": status,
+        "area_status": area_sqft["status"],
+        "whitespace_status": whitespace_sqft["status"],
+    }, index=area.index)
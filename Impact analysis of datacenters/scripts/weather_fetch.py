@@ -0,0 +1,348 @@
+"""
+Daily weather history for the cluster midpoints, fetched once and aggregated from a local cache.
+
+Clusters are deduplicated by their midpoint rounded to PRECISION decimals, and each location's
+raw daily series (1999-2025 from the Open-Meteo archive API) is stored as one zstd Parquet file
+in the cache directory. Locations already cached are never requested again, so a run that
+fails half-way picks up where it stopped, and new aggregates are computed from the cache with
+no network calls at all. Requests run concurrently under budgets of weighted API calls per
+minute, hour and day (Open-Meteo counts a long multi-variable request as many calls); a
+range too long for one minute's budget is split into several requests, and the location is
+only cached once all of them succeeded.
+
+    python weather_fetch.py --input top_clusters_with_midpoints.csv --output cluster_weather.csv
+    python weather_fetch.py --input ... --aggregate max_temp=temperature_2m_mean:max --per-year --offline
+    python weather_fetch.py --input ... --base-url http://127.0.0.1:8800/v1/archive   # local stub
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import aiohttp
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from rate_limit import TokenBucket
+
+ARCHIVE_URL = os.environ.get("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+CACHE_DIR = "weather_cache"
+START_DATE = "1999-01-01"
+END_DATE = "2025-03-23"
+DAILY = ["temperature_2m_mean", "relative_humidity_2m_mean", "dew_point_2m_mean", "precipitation_sum"]
+PRECISION = 2  # ~1 km, well inside one cell of the archive's reanalysis grid
+# Open-Meteo's free-tier limits, in weighted calls
+CALLS_PER_MINUTE = 600
+CALLS_PER_HOUR = 5000
+CALLS_PER_DAY = 10000
+CONCURRENCY = 4
+MAX_RETRIES = 5
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+FUNCTIONS = {"mean": np.nanmean, "max": np.nanmax, "min": np.nanmin, "sum": np.nansum, "std": np.nanstd}
+# Output column -> (daily variable, function); the columns the notebook's loop produced
+AGGREGATES = {
+    "avg_temperature": ("temperature_2m_mean", "mean"),
+    "avg_humidity": ("relative_humidity_2m_mean", "mean"),
+    "avg_dew_point": ("dew_point_2m_mean", "mean"),
+    "avg_precipitation": ("precipitation_sum", "mean"),
+}
+
+
+def location_key(lat: float, lon: float, precision: int = PRECISION) -> tuple:
+    return round(float(lat), precision), round(float(lon), precision)
+
+
+def request_weight(start: str, end: str, variables: list) -> float:
+    """How many calls Open-Meteo charges for one request: per 14 days and per 10 variables."""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    return max(1.0, days / 14) * max(1.0, len(variables) / 10)
+
+
+def split_range(start: str, end: str, variables: list, max_weight: float) -> list:
+    """[start, end] as consecutive (start, end) ranges whose request weight is at most `max_weight`."""
+    if max_weight == float("inf"):
+        return [(start, end)]
+    max_days = max(14, int(14 * max_weight / max(1.0, len(variables) / 10)))
+    ranges = []
+    first, last = pd.Timestamp(start), pd.Timestamp(end)
+    while first <= last:
+        stop = min(last, first + pd.Timedelta(days=max_days - 1))
+        ranges.append((first.strftime("%Y-%m-%d"), stop.strftime("%Y-%m-%d")))
+        first = stop + pd.Timedelta(days=1)
+    return ranges
+
+
+def parse_aggregate(text: str) -> tuple:
+    """"name=variable:function" -> (name, (variable, function))"""
+    name, _, spec = text.partition("=")
+    variable, _, function = spec.partition(":")
+    if not name or not variable or function not in FUNCTIONS:
+        raise argparse.ArgumentTypeError(f"expected NAME=VARIABLE:{'|'.join(FUNCTIONS)}, got {text!r}")
+    return name, (variable, function)
+
+
+class WeatherCache:
+    """
+    One Parquet file per location: a `date` column plus one float32 column per daily variable.
+    The covered date range is kept in the file's metadata.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: tuple) -> str:
+        lat, lon = key
+        return os.path.join(self.directory, f"{lat:+.4f}_{lon:+.4f}.parquet")
+
+    def _meta(self, key: tuple):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        schema = pq.read_schema(path)
+        meta = json.loads(schema.metadata[b"weather"])
+        meta["variables"] = [name for name in schema.names if name != "date"]
+        return meta
+
+    def variables(self, key: tuple) -> list:
+        """The daily variables cached for `key` (empty when it is not cached)."""
+        meta = self._meta(key)
+        return meta["variables"] if meta else []
+
+    def missing(self, key: tuple, variables: list, start: str, end: str) -> list:
+        """Variables that still have to be fetched for `key` over [start, end]."""
+        meta = self._meta(key)
+        if meta is None or meta["start"] > start or meta["end"] < end:
+            return list(variables)
+        return [v for v in variables if v not in meta["variables"]]
+
+    def load(self, key: tuple, columns: list = None) -> pd.DataFrame:
+        return pq.read_table(self.path(key), columns=["date"] + columns if columns else None).to_pandas()
+
+    def save(self, key: tuple, daily: pd.DataFrame, start: str, end: str):
+        """Store `daily`, keeping cached variables it doesn't have when the date range is the same."""
+        meta = self._meta(key)
+        if meta is not None and meta["start"] == start and meta["end"] == end:
+            cached = self.load(key)
+            keep = [c for c in cached.columns if c not in daily.columns]
+            daily = daily.merge(cached[["date"] + keep], on="date", how="left") if keep else daily
+        table = pa.Table.from_pandas(daily, preserve_index=False)
+        table = table.replace_schema_metadata({"weather": json.dumps({"start": start, "end": end})})
+        tmp = self.path(key) + ".tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, self.path(key))
+
+    def __contains__(self, key) -> bool:
+        return os.path.exists(self.path(key))
+
+
+class WeatherFetcher:
+    """
+    Fetches the uncached locations concurrently: at most `concurrency` requests in flight and at
+    most `calls_per_minute` / `calls_per_hour` / `calls_per_day` weighted calls started per
+    minute / hour / day (0 or None disables a limit); 429/5xx/connection errors back off and
+    retry (honoring Retry-After). Failed locations are reported and left out of the cache.
+    """
+
+    def __init__(self, cache: WeatherCache, base_url: str = ARCHIVE_URL, calls_per_minute: float = CALLS_PER_MINUTE,
+                 concurrency: int = CONCURRENCY, max_retries: int = MAX_RETRIES, timeout: float = 120.0,
+                 calls_per_hour: float = CALLS_PER_HOUR, calls_per_day: float = CALLS_PER_DAY):
+        self.cache = cache
+        self.base_url = base_url
+        self.limits = {seconds: calls for seconds, calls in
+                       ((60, calls_per_minute), (3600, calls_per_hour), (86400, calls_per_day)) if calls}
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.stats = {"cached": 0, "requests": 0, "retries": 0, "fetched": 0, "failed": 0, "weight": 0.0}
+        self.failures = {}
+
+    @property
+    def max_weight(self) -> float:
+        """The heaviest single request every limit can admit at once."""
+        return min(self.limits.values(), default=float("inf"))
+
+    async def _get(self, session, key, variables, start, end, buckets, semaphore):
+        params = {"latitude": key[0], "longitude": key[1], "start_date": start, "end_date": end,
+                  "daily": ",".join(variables), "timezone": "auto"}
+        weight = request_weight(start, end, variables)
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                for bucket in buckets:
+                    await bucket.acquire(weight)
+                self.stats["requests"] += 1
+                self.stats["weight"] += weight
+                delay = None
+                try:
+                    async with session.get(self.base_url, params=params) as response:
+                        if response.status == 200:
+                            return await response.json()
+                        if response.status not in RETRYABLE_STATUS:
+                            body = await response.text()
+                            try:
+                                reason = json.loads(body).get("reason", body)
+                            except ValueError:
+                                reason = body
+                            raise ValueError(f"HTTP {response.status}: {reason[:200]}")
+                        error = f"HTTP {response.status}"
+                        try:
+                            delay = float(response.headers.get("Retry-After"))
+                        except (TypeError, ValueError):
+                            pass
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__}: {e}"
+                if attempt == self.max_retries:
+                    raise ConnectionError(f"{error} after {attempt + 1} attempts")
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay if delay is not None else min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+
+    async def _fetch_one(self, session, key, variables, start, end, buckets, semaphore):
+        try:
+            frames = []
+            for first, last in split_range(start, end, variables, self.max_weight):
+                daily = (await self._get(session, key, variables, first, last, buckets, semaphore))["daily"]
+                frame = pd.DataFrame({"date": pd.to_datetime(daily["time"]).date})
+                for variable in variables:
+                    frame[variable] = np.asarray(daily[variable], dtype=np.float64).astype(np.float32)
+                frames.append(frame)
+            self.cache.save(key, pd.concat(frames, ignore_index=True), start, end)
+            self.stats["fetched"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.failures[key] = str(e)
+            print(f"Weather retrieval error @{key}: {e}")
+
+    async def _run(self, todo: dict, start: str, end: str):
+        buckets = [TokenBucket(calls / seconds, calls) for seconds, calls in self.limits.items()]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            await asyncio.gather(*(self._fetch_one(session, key, variables, start, end, buckets, semaphore)
+                                   for key, variables in todo.items()))
+
+    def fetch(self, keys, variables: list, start: str = START_DATE, end: str = END_DATE, offline: bool = False):
+        """Make sure every location in `keys` has `variables` over [start, end] in the cache."""
+        todo = {}
+        for key in keys:
+            missing = self.cache.missing(key, variables, start, end)
+            if missing:
+                todo[key] = missing
+            else:
+                self.stats["cached"] += 1
+        if todo and offline:
+            print(f"--offline: {len(todo)} locations are not cached and were skipped")
+        elif todo:
+            started = time.perf_counter()
+            asyncio.run(self._run(todo, start, end))
+            elapsed = time.perf_counter() - started
+            print(f"Fetched {self.stats['fetched']} locations in {elapsed:.1f}s "
+                  f"({self.stats['requests']} requests, {self.stats['weight']:.0f} weighted calls, "
+                  f"{self.stats['retries']} retries, {self.stats['failed']} failed)")
+        print(f"{self.stats['cached']} of {len(todo) + self.stats['cached']} locations served from the cache")
+        return self.stats
+
+
+def aggregate(cache: WeatherCache, keys, aggregates: dict = None, per_year: bool = False) -> pd.DataFrame:
+    """
+    One row per cached location (per year with `per_year`) with each aggregate column.
+    Locations whose cache lacks any of the variables (never fetched, or the fetch failed) are
+    left out and listed in the result's attrs["missing"].
+    """
+    aggregates = aggregates or AGGREGATES
+    variables = sorted({variable for variable, _ in aggregates.values()})
+    rows, missing = [], []
+    for key in keys:
+        if not set(variables) <= set(cache.variables(key)):
+            missing.append(key)
+            continue
+        daily = cache.load(key, variables)
+        groups = pd.to_datetime(daily["date"]).dt.year if per_year else np.zeros(len(daily), dtype=int)
+        for group, frame in daily.groupby(groups):
+            row = {"lat_key": key[0], "lon_key": key[1]}
+            if per_year:
+                row["year"] = group
+            for name, (variable, function) in aggregates.items():
+                values = frame[variable].to_numpy(dtype=np.float64)
+                row[name] = float(FUNCTIONS[function](values)) if np.isfinite(values).any() else np.nan
+            rows.append(row)
+    if missing:
+        print(f"{len(missing)} locations lack some of {variables} in the cache and were left out")
+    result = pd.DataFrame(rows)
+    result.attrs["missing"] = missing
+    return result
+
+
+def fetch_cluster_weather(clusters: pd.DataFrame, cache_dir: str = CACHE_DIR, aggregates: dict = None,
+                          per_year: bool = False, precision: int = PRECISION, start: str = START_DATE,
+                          end: str = END_DATE, offline: bool = False, **fetcher_options) -> pd.DataFrame:
+    """
+    cluster / cluster_mid_lat / cluster_mid_lon / yearbuilt rows -> one row per cluster (or
+    cluster and year) with the aggregate columns, fetching only what the cache lacks.
+    """
+    aggregates = aggregates or AGGREGATES
+    unique = clusters[["cluster", "cluster_mid_lat", "cluster_mid_lon", "yearbuilt"]].drop_duplicates("cluster")
+    unique = unique.rename(columns={"cluster": "cluster_id", "cluster_mid_lat": "latitude",
+                                    "cluster_mid_lon": "longitude"})
+    keys = [location_key(lat, lon, precision) for lat, lon in zip(unique["latitude"], unique["longitude"])]
+    unique["lat_key"] = [k[0] for k in keys]
+    unique["lon_key"] = [k[1] for k in keys]
+    locations = list(dict.fromkeys(keys))
+    print(f"{len(unique)} clusters at {len(locations)} distinct locations")
+
+    cache = WeatherCache(cache_dir)
+    variables = sorted({variable for variable, _ in aggregates.values()})
+    WeatherFetcher(cache, **fetcher_options).fetch(locations, variables, start, end, offline)
+    weather = aggregate(cache, locations, aggregates, per_year)
+    if weather.empty:
+        result = unique.drop(columns=["lat_key", "lon_key"]).iloc[:0]
+    else:
+        result = unique.merge(weather, on=["lat_key", "lon_key"]).drop(columns=["lat_key", "lon_key"])
+    # Clusters whose location could not be aggregated (not cached, or a variable failed to fetch)
+    missing = set(weather.attrs["missing"])
+    result.attrs["missing"] = unique.loc[[key in missing for key in keys], "cluster_id"].tolist()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached, concurrent weather history for the cluster midpoints.")
+    parser.add_argument("--input", default="top_clusters_with_midpoints.csv",
+                        help="clusters CSV, or 'store' for the top_clusters stage in stage_store")
+    parser.add_argument("--output", default="cluster_weather.csv")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--base-url", default=ARCHIVE_URL, help="archive endpoint (or a local stub)")
+    parser.add_argument("--start", default=START_DATE)
+    parser.add_argument("--end", default=END_DATE)
+    parser.add_argument("--precision", type=int, default=PRECISION, help="decimals locations are rounded to")
+    parser.add_argument("--calls-per-minute", type=float, default=CALLS_PER_MINUTE)
+    parser.add_argument("--calls-per-hour", type=float, default=CALLS_PER_HOUR, help="0 disables the limit")
+    parser.add_argument("--calls-per-day", type=float, default=CALLS_PER_DAY, help="0 disables the limit")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--aggregate", type=parse_aggregate, action="append",
+                        help="NAME=VARIABLE:FUNCTION, repeatable (default: the four averages)")
+    parser.add_argument("--per-year", action="store_true", help="one row per cluster and year")
+    parser.add_argument("--offline", action="store_true", help="use the cache only, never the network")
+    args = parser.parse_args()
+
+    if args.input == "store":
+        from stage_store import load_climatedata
+        clusters = load_climatedata()
+    else:
+        clusters = pd.read_csv(args.input)
+    result = fetch_cluster_weather(
+        clusters, args.cache_dir, dict(args.aggregate) if args.aggregate else None, args.per_year,
+        args.precision, args.start, args.end, args.offline,
+        base_url=args.base_url, calls_per_minute=args.calls_per_minute, calls_per_hour=args.calls_per_hour,
+        calls_per_day=args.calls_per_day, concurrency=args.concurrency)
+    result.to_csv(args.output, index=False)
+    print(f"Wrote {len(result)} rows to {args.output}")
+    if result.attrs["missing"]:
+        print(f"No weather for {len(result.attrs['missing'])} clusters: {result.attrs['missing']}")
+
+
+if __name__ == "__main__":
+    main()
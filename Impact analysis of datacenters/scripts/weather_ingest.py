@@ -0,0 +1,201 @@
+"""
+Annual weather per cluster from the hourly Open-Meteo CSV exports in "Temp data/".
+
+Each file is named after its cluster id and looks like
+
+    latitude,longitude,elevation,utc_offset_seconds,timezone,timezone_abbreviation
+    39.0,-77.5,100.0,-14400,America/New_York,EDT
+
+    time,temperature_2m (°C),dew_point_2m (°C),...
+    1999-01-01T00:00,1.2,-3.4,...
+
+Files are streamed through pyarrow's CSV reader CHUNK_BYTES at a time, decoding only the
+needed columns and parsing `time` with the fixed export format, and per-year sums and counts
+are accumulated block by block, so memory stays bounded by the chunk size however long the
+series is. The result matches the notebook's `groupby("year").mean()` plus the latitude /
+longitude / elevation metadata and the cluster id.
+
+Files are aggregated in a process pool and each result is cached next to the data, keyed by
+the file's mtime and size, so re-running on an unchanged directory only reads the cache.
+
+    python weather_ingest.py --dir "../notebooks/Temp data" --output master_weather.csv
+"""
+import os
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+TEMP_DIR = "./Temp data"
+CACHE_NAME = ".annual_cache"
+CHUNK_BYTES = 1 << 20  # CSV bytes per block; the reader keeps a few dozen blocks in flight
+TIME_FORMAT = "%Y-%m-%dT%H:%M"
+HEADER_LINE = 3  # two metadata lines, a blank line, then the column header
+METADATA_KEYS = ["latitude", "longitude", "elevation"]
+
+
+def read_metadata(path: str) -> dict:
+    """The metadata line as {name: value}, and the data columns, from the top of an export."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        lines = [line for _, line in zip(range(HEADER_LINE + 1), f)]
+    keys, values = (next(csv.reader([line])) for line in lines[:2])
+    metadata = {k.strip(): v.strip() for k, v in zip(keys, values)}
+    metadata["columns"] = next(csv.reader([lines[HEADER_LINE]])) if len(lines) > HEADER_LINE else []
+    return metadata
+
+
+def _grow(array: np.ndarray, length: int) -> np.ndarray:
+    return array if len(array) >= length else np.concatenate([array, np.zeros(length - len(array))])
+
+
+def _accumulate(total: np.ndarray, year: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    """Add the per-year sums (or counts) of this block to `total`, which is indexed by year."""
+    block = np.bincount(year, weights)
+    total = _grow(total, len(block))
+    total[:len(block)] += block
+    return total
+
+
+def aggregate_file(path: str, columns: list = None, chunk_bytes: int = CHUNK_BYTES) -> pd.DataFrame:
+    """Per-year means of `columns` (default: every column but time) for one export file."""
+    metadata = read_metadata(path)
+    columns = columns or [c for c in metadata["columns"] if c != "time"]
+    # Single-threaded per file: the process pool runs the files in parallel
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(skip_rows=HEADER_LINE, block_size=chunk_bytes, use_threads=False),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=["time"] + columns,
+            column_types={"time": pa.timestamp("s"), **{c: pa.float64() for c in columns}},
+            timestamp_parsers=[TIME_FORMAT]))
+    # Running per-year totals, indexed by the year itself
+    sums = {c: np.zeros(0) for c in columns}
+    counts = {c: np.zeros(0) for c in columns}
+    seconds, stamps = np.zeros(0), np.zeros(0)
+    for batch in reader:
+        batch = batch.filter(pc.is_valid(batch.column("time")))
+        year = pc.year(batch.column("time")).to_numpy()
+        seconds = _accumulate(seconds, year, batch.column("time").cast(pa.int64()).to_numpy())
+        stamps = _accumulate(stamps, year)
+        for c in columns:
+            values = batch.column(c).to_numpy(zero_copy_only=False)
+            present = ~np.isnan(values)
+            sums[c] = _accumulate(sums[c], year[present], values[present])
+            counts[c] = _accumulate(counts[c], year[present])
+
+    years = np.flatnonzero(stamps)
+    annual = pd.DataFrame({"year": years.astype(np.int32)})
+    annual["time"] = pd.to_datetime(seconds[years] / stamps[years], unit="s").astype("datetime64[us]")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for c in columns:
+            annual[c] = _grow(sums[c], len(stamps))[years] / _grow(counts[c], len(stamps))[years]
+    for key in METADATA_KEYS:
+        annual[key] = float(metadata[key]) if metadata.get(key) else None
+    annual["cluster"] = int(os.path.splitext(os.path.basename(path))[0])
+    return annual
+
+
+class AnnualCache:
+    """
+    One Parquet file per source file, valid while the source's mtime and size are unchanged.
+    An entry aggregated over all columns also answers requests for a subset of them.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, source: str) -> str:
+        return os.path.join(self.directory, os.path.basename(source) + ".parquet")
+
+    @staticmethod
+    def signature(source: str) -> dict:
+        stat = os.stat(source)
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def get(self, source: str, columns=None):
+        path = self._path(source)
+        if not os.path.exists(path):
+            return None
+        table = pq.read_table(path)
+        meta = json.loads(table.schema.metadata[b"signature"])
+        if meta["file"] != self.signature(source):
+            return None
+        if columns is None:
+            return table.to_pandas() if meta["columns"] is None else None
+        if not set(columns) <= set(table.column_names):
+            return None
+        return table.select(["year", "time"] + list(columns) + METADATA_KEYS + ["cluster"]).to_pandas()
+
+    def put(self, source: str, columns, annual: pd.DataFrame):
+        table = pa.Table.from_pandas(annual, preserve_index=False)
+        meta = {"file": self.signature(source), "columns": columns}
+        table = table.replace_schema_metadata({"signature": json.dumps(meta)})
+        tmp = self._path(source) + ".tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, self._path(source))
+
+
+def cluster_files(directory: str = TEMP_DIR) -> list:
+    """The export files (named <cluster id>.csv) in `directory`, by cluster id."""
+    names = [f for f in os.listdir(directory) if f.endswith(".csv") and os.path.splitext(f)[0].isdigit()]
+    return [os.path.join(directory, f) for f in sorted(names, key=lambda f: int(os.path.splitext(f)[0]))]
+
+
+def aggregate_directory(directory: str = TEMP_DIR, columns: list = None, workers: int = None,
+                        chunk_bytes: int = CHUNK_BYTES, use_cache: bool = True) -> pd.DataFrame:
+    """master_weather_df: the annual aggregates of every cluster file, cached per file."""
+    started = time.perf_counter()
+    files = cluster_files(directory)
+    cache = AnnualCache(os.path.join(directory, CACHE_NAME)) if use_cache else None
+    results, todo = {}, []
+    for path in files:
+        cached = cache.get(path, columns) if cache else None
+        if cached is not None:
+            results[path] = cached
+        else:
+            todo.append(path)
+
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            fresh = dict(zip(todo, pool.map(aggregate_file, todo, [columns] * len(todo), [chunk_bytes] * len(todo))))
+    else:
+        fresh = {path: aggregate_file(path, columns, chunk_bytes) for path in todo}
+    for path, annual in fresh.items():
+        if cache:
+            cache.put(path, columns, annual)
+        results[path] = annual
+
+    print(f"{len(files)} cluster files: {len(files) - len(todo)} from the cache, {len(todo)} aggregated "
+          f"with {max(workers, 1)} worker(s) in {time.perf_counter() - started:.2f}s")
+    if not results:
+        return pd.DataFrame()
+    return pd.concat([results[path] for path in files], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annual per-cluster weather from the hourly exports.")
+    parser.add_argument("--dir", default=TEMP_DIR)
+    parser.add_argument("--output", default="master_weather.csv")
+    parser.add_argument("--columns", nargs="+", help="weather columns to aggregate (default: all)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    master = aggregate_directory(args.dir, args.columns, args.workers, args.chunk_bytes, not args.no_cache)
+    master.to_csv(args.output, index=False)
+    print(f"Wrote {len(master)} cluster-years to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Shared fixtures. The scripts import each other as top-level modules, so scripts/ goes on
+sys.path; the stand-in servers are aiohttp applications on free local ports.
+"""
+import os
+import sys
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+@pytest.fixture
+def stub_server():
+    """start(app) -> base URL of `app` served from a background event loop until the test ends."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runners = []
+
+    async def setup(app):
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        runners.append(runner)
+        return runner.addresses[0][1]
+
+    def start(app):
+        port = asyncio.run_coroutine_threadsafe(setup(app), loop).result(10)
+        return f"http://127.0.0.1:{port}"
+
+    yield start
+    for runner in runners:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+    loop.close()
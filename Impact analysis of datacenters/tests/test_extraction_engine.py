@@ -0,0 +1,174 @@
+"""ExtractionEngine and openaiExt.run_extraction against a stand-in chat-completions server."""
+import re
+import json
+import time
+import asyncio
+
+import openai
+import pytest
+from aiohttp import web
+
+from extraction_engine import ExtractionEngine
+from llm_cache import LLMCache
+import openaiExt
+
+FIELD_LINE = re.compile(r'^\s*"(\w+)": ""', re.MULTILINE)
+BATCH_DATA = "The facilities, as a JSON object mapping unique_key to facility data:\n"
+
+
+def completion(content: str, model: str) -> dict:
+    return {"id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}
+
+
+class ChatStub:
+    """
+    Answers every requested field with "stub <field>": one object for a single-facility prompt,
+    an array keyed by unique_key for a batch prompt. The first `fail_first` requests get
+    `fail_status`; in-flight requests are counted and each one takes `delay` seconds.
+    """
+
+    def __init__(self, fail_first: int = 0, fail_status: int = 429, delay: float = 0.0):
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat)
+        return app
+
+    async def chat(self, request):
+        body = await request.json()
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.requests <= self.fail_first:
+                return web.json_response({"error": {"message": "stub failure", "type": "stub"}},
+                                         status=self.fail_status, headers={"Retry-After": "0"})
+            prompt = body["messages"][-1]["content"]
+            self.prompts.append(prompt)
+            fields = [f for f in FIELD_LINE.findall(prompt) if f != "unique_key"]
+            answer = {field: f"stub {field}" for field in fields}
+            if BATCH_DATA in prompt:
+                facilities = json.loads(prompt.split(BATCH_DATA, 1)[1])
+                content = json.dumps([{"unique_key": key, **answer} for key in facilities])
+            else:
+                content = json.dumps(answer)
+            return web.json_response(completion(content, body["model"]))
+        finally:
+            self.in_flight -= 1
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def complete_all(base_url: str, n: int, **options):
+    async with ExtractionEngine(base_url=base_url + "/v1", api_key="test", **options) as engine:
+        answers = await asyncio.gather(*(engine.complete([{"role": "user", "content": '"Name": ""'}])
+                                         for _ in range(n)))
+        return answers, dict(engine.stats)
+
+
+def test_complete_retries_rate_limited_requests(stub_server):
+    stub = ChatStub(fail_first=2)
+    answers, stats = run(complete_all(stub_server(stub.app()), 1, max_retries=3, requests_per_second=None))
+    assert json.loads(answers[0]) == {"Name": "stub Name"}
+    assert stats == {"requests": 3, "retries": 2, "failures": 0}
+
+
+def test_complete_gives_up_on_non_retryable_errors(stub_server):
+    stub = ChatStub(fail_first=1, fail_status=400)
+    with pytest.raises(openai.BadRequestError):
+        run(complete_all(stub_server(stub.app()), 1, max_retries=3, requests_per_second=None))
+    assert stub.requests == 1
+
+
+def test_concurrency_is_bounded(stub_server):
+    stub = ChatStub(delay=0.05)
+    answers, stats = run(complete_all(stub_server(stub.app()), 12, concurrency=3, requests_per_second=None))
+    assert len(answers) == 12 and stats["requests"] == 12
+    assert stub.max_in_flight == 3
+
+
+def test_requests_per_second_is_enforced(stub_server):
+    stub = ChatStub()
+    started = time.perf_counter()
+    run(complete_all(stub_server(stub.app()), 6, concurrency=6, requests_per_second=10))
+    # The bucket starts full (capacity = rate), so six requests under 10/s start at once
+    assert time.perf_counter() - started < 1.0
+    started = time.perf_counter()
+    run(complete_all(stub_server(ChatStub().app()), 4, concurrency=4, requests_per_second=2))
+    # Two tokens at start, then one every 0.5s for the other two
+    assert time.perf_counter() - started >= 0.9
+
+
+def write_hawk(path, n: int):
+    facilities = {f"facility_{i}": {"name": f"Site {i}", "url": f"https://example.com/site-{i}",
+                                    "description": f"Colocation site number {i}"} for i in range(n)}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"markets": {"nova": {"name": "Northern Virginia", "link": "https://example.com/nova",
+                                        "facilities": facilities}}}, f)
+
+
+def test_run_extraction_batches_resumes_and_caches(stub_server, tmp_path):
+    stub = ChatStub()
+    base_url = stub_server(stub.app()) + "/v1"
+    source = tmp_path / "hawk.json"
+    write_hawk(source, 5)
+    cache = str(tmp_path / "llm_cache.sqlite")
+    options = dict(cache_file=cache, batch_size=4, requests_per_second=None, base_url=base_url, api_key="test")
+
+    output = str(tmp_path / "hawk_extracted.json")
+    run(openaiExt.run_extraction(openaiExt.iter_hawk(str(source)), output, "datacenterhawk", **options))
+    with open(output, encoding="utf-8") as f:
+        records = json.load(f)
+    assert sorted(r["unique_key"] for r in records) == [f"Northern Virginia_facility_{i}" for i in range(5)]
+    for record in records:
+        assert set(openaiExt.FIELDS) <= set(record)
+        assert record["source"] == "datacenterhawk"
+    # Five facilities in batches of at most four: two requests
+    assert stub.requests == 2
+    assert any(BATCH_DATA in prompt for prompt in stub.prompts)
+
+    # Same output: everything is in the journal, nothing is requested again
+    run(openaiExt.run_extraction(openaiExt.iter_hawk(str(source)), output, "datacenterhawk", **options))
+    assert stub.requests == 2
+
+    # A fresh output with the same cache: every facility is a cache hit
+    fresh = str(tmp_path / "again.json")
+    run(openaiExt.run_extraction(openaiExt.iter_hawk(str(source)), fresh, "datacenterhawk", **options))
+    assert stub.requests == 2
+    with open(fresh, encoding="utf-8") as f:
+        # Results are journaled in completion order
+        by_key = {r["unique_key"]: r for r in records}
+        assert {r["unique_key"]: r for r in json.load(f)} == by_key
+
+
+def test_batch_cache_is_keyed_on_each_facilitys_own_fields(stub_server, tmp_path):
+    stub = ChatStub()
+    base_url = stub_server(stub.app()) + "/v1"
+    cache = LLMCache(str(tmp_path / "llm_cache.sqlite"))
+
+    async def extract(facilities, missing):
+        async with ExtractionEngine(base_url=base_url, api_key="test", requests_per_second=None) as engine:
+            return await openaiExt.extract_batch_async(engine, facilities, cache, openaiExt.FIELDS, missing)
+
+    first = run(extract({"a": '{"name": "A"}', "b": '{"name": "B"}'}, {"a": ["Name"], "b": ["Name", "Power"]}))
+    assert first == {"a": {"Name": "stub Name"}, "b": {"Name": "stub Name", "Power": "stub Power"}}
+    assert stub.requests == 1
+
+    # "a" shares a batch with a facility missing other fields: still a cache hit, only "c" is requested
+    second = run(extract({"a": '{"name": "A"}', "c": '{"name": "C"}'}, {"a": ["Name"], "c": ["City"]}))
+    assert second == {"a": {"Name": "stub Name"}, "c": {"City": "stub City"}}
+    assert stub.requests == 2
+    cache.close()
@@ -0,0 +1,105 @@
+"""hostLLm's concurrent extraction against a stand-in Ollama /api/generate server."""
+import json
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import hostLLm
+
+
+class OllamaStub:
+    """
+    Answers /api/generate with a JSON object naming the data center. Prompts that mention a
+    name in `fail` get HTTP 500; names in `fenced` are answered the way chatty models do,
+    in a code fence with a trailing comma. Each generation takes `delay` seconds.
+    """
+
+    def __init__(self, fail=(), fenced=(), delay: float = 0.05):
+        self.fail = set(fail)
+        self.fenced = set(fenced)
+        self.delay = delay
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/generate", self.generate)
+        return app
+
+    async def generate(self, request):
+        body = await request.json()
+        self.bodies.append(body)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            name = next((line for line in body["prompt"].splitlines() if line.startswith("Site ")), "")
+            name = name.split(",")[0]
+            if name in self.fail:
+                return web.json_response({"error": "model crashed"}, status=500)
+            answer = json.dumps({"Name": name, "Address": "Unknown", "Power": "10 MW"})
+            if name in self.fenced:
+                answer = "```json\n" + answer[:-1] + ",\n}\n```"
+            return web.json_response({"model": body["model"], "response": answer, "done": True,
+                                      "eval_count": 10, "eval_duration": 100_000_000})
+        finally:
+            self.in_flight -= 1
+
+
+def write_datacentermap(path, n: int):
+    addresses = [{"url": f"https://example.com/site-{i}", "name": f"Site {i}", "address1": f"Site {i}",
+                  "address2": f"{100 + i} Main Street", "address3": "Ashburn, VA 20147",
+                  "overviewHTML": "Colocation campus", "specsHtml": "Power: 10 MW"} for i in range(n)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"Virginia": {"count": str(n), "details": [
+            {"name": "Ashburn", "url": "https://example.com/ashburn", "count": str(n), "addresses": addresses}]}}, f)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"Name": "A"}', {"Name": "A"}),
+    ('```json\n{"Name": "A",}\n```', {"Name": "A"}),
+    ('structured_entry = {"Name": "A", "Power": None}\nHope this helps!', {"Name": "A", "Power": None}),
+    ('no json here', None),
+    ('["not", "an", "object"]', None),
+])
+def test_repair_json(text, expected):
+    assert hostLLm.repair_json(text) == expected
+
+
+def test_run_keeps_workers_busy_and_journals_results(stub_server, tmp_path):
+    stub = OllamaStub(fail={"Site 2"}, fenced={"Site 4"})
+    host = stub_server(stub.app())
+    source, output = tmp_path / "addresses.json", str(tmp_path / "structured.json")
+    write_datacentermap(source, 8)
+
+    stats = hostLLm.run(str(source), output, host, "stub-model", workers=3)
+    assert stats["records"] == 7 and stats["failed"] == 1 and stats["unparsed"] == 0
+    assert stats["tokens"] == 70
+    assert stub.max_in_flight == 3
+    # Every prompt starts with the same instructions, so the server can reuse the prefix
+    assert all(body["prompt"].startswith(hostLLm.INSTRUCTIONS) for body in stub.bodies)
+    assert {(b["model"], b["format"], b["stream"], b["options"]["temperature"]) for b in stub.bodies} == \
+        {("stub-model", "json", False, 0)}
+    with open(output, encoding="utf-8") as f:
+        entries = {e["Name"]: e["StructuredDetails"] for e in json.load(f)}
+    assert sorted(entries) == [f"Site {i}" for i in range(8) if i != 2]
+    assert entries["Site 4"] == {"Name": "Site 4", "Address": "Unknown", "Power": "10 MW"}
+
+    # The failed record is retried on the next run; the others come from the journal
+    stub.fail.clear()
+    requests = len(stub.bodies)
+    stats = hostLLm.run(str(source), output, host, "stub-model", workers=3)
+    assert stats["records"] == 1 and len(stub.bodies) == requests + 1
+    with open(output, encoding="utf-8") as f:
+        assert len(json.load(f)) == 8
+
+
+def test_unreachable_server_fails_records_without_crashing(tmp_path):
+    source, output = tmp_path / "addresses.json", str(tmp_path / "structured.json")
+    write_datacentermap(source, 2)
+    stats = hostLLm.run(str(source), output, "http://127.0.0.1:9", "stub-model", workers=2)
+    assert stats["records"] == 0 and stats["failed"] == 2
+    with open(output, encoding="utf-8") as f:
+        assert json.load(f) == []
@@ -0,0 +1,46 @@
+"""ResultSink's CSV output: header, resume without duplicates, older header-less files, torn writes."""
+from result_sink import ResultSink, read_sink_csv
+
+COLUMNS = ["Provider", "Location Name", "Address"]
+
+
+def row(i: int) -> dict:
+    return {"Provider": f"Provider {i}", "Location Name": f"Site {i}", "Address": f"{i} Main Street"}
+
+
+def test_new_file_gets_one_header_across_runs(tmp_path):
+    path = str(tmp_path / "out.csv")
+    with ResultSink(path, COLUMNS, key=COLUMNS, batch_size=2, flush_seconds=None) as sink:
+        for i in range(3):
+            sink.write(row(i))
+    with ResultSink(path, COLUMNS, key=COLUMNS, flush_seconds=None) as sink:
+        assert not sink.write(row(1))
+        assert sink.write(row(3))
+
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "Provider,Location Name,Address" and lines.count(lines[0]) == 1
+    assert read_sink_csv(path)["Location Name"].tolist() == ["Site 0", "Site 1", "Site 2", "Site 3"]
+
+
+def test_header_less_file_is_appended_to_as_it_is(tmp_path):
+    path = tmp_path / "old.csv"
+    path.write_text("Provider 0,Site 0,0 Main Street\n", encoding="utf-8")
+    with ResultSink(str(path), COLUMNS, key=COLUMNS, flush_seconds=None) as sink:
+        assert not sink.write(row(0))
+        assert sink.write(row(1))
+
+    assert path.read_text(encoding="utf-8").splitlines()[0] == "Provider 0,Site 0,0 Main Street"
+    assert read_sink_csv(str(path), COLUMNS)["Location Name"].tolist() == ["Site 0", "Site 1"]
+
+
+def test_torn_last_batch_is_cut_on_reopen(tmp_path):
+    path = tmp_path / "out.csv"
+    with ResultSink(str(path), COLUMNS, key=COLUMNS, flush_seconds=None) as sink:
+        sink.write(row(0))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('Provider 1,"Site 1')
+
+    with ResultSink(str(path), COLUMNS, key=COLUMNS, flush_seconds=None) as sink:
+        assert sink.write(row(1))
+    assert read_sink_csv(str(path))["Location Name"].tolist() == ["Site 0", "Site 1"]
@@ -0,0 +1,167 @@
+"""
+BrowserPool with stand-in drivers, the scrapers' XPaths against static HTML fixtures, and,
+where Chrome can be started, find.py / Selenium_Scraper.py end to end on the fixture site.
+"""
+import os
+import sys
+
+import pytest
+from aiohttp import web
+from lxml import html
+from selenium.common.exceptions import WebDriverException
+
+from conftest import FIXTURES_DIR
+import find
+import selenium_runner
+import Selenium_Scraper
+from result_sink import read_sink_csv
+from selenium_runner import BrowserPool
+
+SITE_DIR = os.path.join(FIXTURES_DIR, "datacenters")
+
+
+class FakeDriver:
+    """Enough of a WebDriver for BrowserPool: current_url fails once the browser has crashed."""
+
+    def __init__(self):
+        self.crashed = False
+        self.quits = 0
+
+    @property
+    def current_url(self):
+        if self.crashed:
+            raise WebDriverException("browser crashed")
+        return "about:blank"
+
+    def quit(self):
+        self.quits += 1
+        if self.quits > 1 or self.crashed:
+            raise WebDriverException("session already gone")
+
+
+def fake_browsers(monkeypatch, fail_from: int = None):
+    """Patch make_driver; drivers number fail_from and later cannot be started."""
+    drivers = []
+
+    def make_driver(headless=True):
+        if fail_from is not None and len(drivers) + 1 >= fail_from:
+            drivers.append(None)
+            raise WebDriverException("chrome not reachable")
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    monkeypatch.setattr(selenium_runner, "make_driver", make_driver)
+    return drivers
+
+
+def test_pool_runs_every_item_once(monkeypatch):
+    drivers = fake_browsers(monkeypatch)
+    results = []
+    stats = BrowserPool(workers=3).run(range(20), lambda driver, item: item * 2,
+                                       lambda item, result: results.append(result))
+    assert sorted(results) == [i * 2 for i in range(20)]
+    assert stats == {"done": 20, "failed": 0, "driver_failures": 0, "unprocessed": 0}
+    assert [d.quits for d in drivers] == [1, 1, 1]
+
+
+def test_pool_replaces_a_crashed_browser(monkeypatch):
+    drivers = fake_browsers(monkeypatch)
+
+    def task(driver, item):
+        if item == 3:
+            driver.crashed = True
+            raise WebDriverException("tab crashed")
+        return item
+
+    stats = BrowserPool(workers=1).run(range(6), task, lambda item, result: None)
+    assert stats == {"done": 5, "failed": 1, "driver_failures": 0, "unprocessed": 0}
+    assert len(drivers) == 2 and drivers[1].quits == 1
+
+
+def test_pool_survives_browsers_that_fail_to_start(monkeypatch):
+    # The first browser starts, crashes on item 3 and cannot be restarted; the other never starts
+    drivers = fake_browsers(monkeypatch, fail_from=2)
+    seen = []
+
+    def task(driver, item):
+        if item == 3:
+            driver.crashed = True
+            raise WebDriverException("tab crashed")
+        seen.append(item)
+        return item
+
+    stats = BrowserPool(workers=2).run(range(8), task, lambda item, result: None)
+    assert stats["driver_failures"] == 2 and stats["failed"] == 1
+    assert stats["done"] == len(seen) == 3
+    assert stats["unprocessed"] == 4
+    # The crashed driver was quit once, when it was replaced
+    assert drivers[0].quits == 1
+
+
+def test_pool_counts_a_failing_setup(monkeypatch):
+    drivers = fake_browsers(monkeypatch)
+
+    def setup(driver):
+        raise WebDriverException("login page did not load")
+
+    stats = BrowserPool(workers=2, setup=setup).run(range(4), lambda driver, item: item, lambda item, result: None)
+    assert stats == {"done": 0, "failed": 0, "driver_failures": 2, "unprocessed": 4}
+    assert all(d.quits == 1 for d in drivers)
+
+
+def parse_fixture(name: str):
+    return html.parse(os.path.join(SITE_DIR, name)).getroot()
+
+
+def test_listing_xpaths_match_the_fixture():
+    page = parse_fixture("locations.html")
+    assert len(page.xpath(find.SEARCH_BOX)) == 1
+    providers, names, addresses = (page.xpath(x) for x in (find.TILE_PROVIDER, find.TILE_NAME, find.TILE_ADDRESS))
+    assert [p.text_content() for p in providers] == ["Equinix", "Digital Realty"]
+    assert [n.text_content() for n in names] == ["DC1 Ashburn", "IAD39"]
+    assert len(addresses) == 2 and len(page.xpath(find.TILE_DETAILS)) == 2
+    # NEXT_PAGE is the second arrow of the first pagination bar, not "previous" or the bottom bar
+    (button,) = page.xpath(find.NEXT_PAGE)
+    assert button.get("id") == "next"
+
+
+def test_summary_xpath_matches_the_fixture():
+    page = parse_fixture("location.html")
+    (summary,) = page.xpath(Selenium_Scraper.SUMMARY)
+    assert summary.text_content() == "Summary of site 1"
+
+
+@pytest.fixture
+def chrome():
+    """Skip unless a headless Chrome can be started here."""
+    try:
+        driver = selenium_runner.make_driver()
+    except Exception as e:
+        pytest.skip(f"no Chrome available: {type(e).__name__}")
+    driver.quit()
+
+
+@pytest.fixture
+def fixture_site(stub_server):
+    app = web.Application()
+    app.router.add_static("/", SITE_DIR)
+    return stub_server(app)
+
+
+def test_find_scrapes_every_page(chrome, fixture_site, tmp_path, monkeypatch):
+    output = str(tmp_path / "datacenters.csv")
+    monkeypatch.setattr(sys, "argv", ["find.py", "--url", fixture_site + "/locations.html", "--output", output])
+    find.main()
+    assert read_sink_csv(output)["Location Name"].tolist() == ["DC1 Ashburn", "IAD39", "Sterling VI", "Richmond NAP"]
+
+
+def test_selenium_scraper_reads_summaries_and_resumes(chrome, fixture_site, tmp_path, monkeypatch):
+    output = str(tmp_path / "datacentersSumm.csv")
+    argv = ["Selenium_Scraper.py", "--url", fixture_site + "/locations.html", "--output", output]
+    monkeypatch.setattr(sys, "argv", argv)
+    Selenium_Scraper.main()
+    rows = read_sink_csv(output)
+    assert rows["Summary"].tolist() == [f"Summary of site {i}" for i in range(1, 5)]
+    # A second run finds every tile in the output and opens no location tab
+    Selenium_Scraper.main()
+    assert read_sink_csv(output).equals(rows)
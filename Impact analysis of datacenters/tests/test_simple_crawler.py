@@ -0,0 +1,162 @@
+"""simple_crawler against a small local site: robots.txt, dedup, revalidation, rate limiting."""
+import json
+import asyncio
+import hashlib
+
+import pytest
+from aiohttp import web
+
+import simple_crawler
+from simple_crawler import Crawler, crawl, normalize_url
+
+LIMITED = "<html><head><title>Your activity has been limited</title></head><body>Slow down</body></html>"
+
+
+def page(title: str, *links: str) -> str:
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<html><head><title>{title}</title></head><body><p>{title} text</p>{anchors}</body></html>"
+
+
+class FixtureSite:
+    """
+    Pages by path (query strings included). Every response carries an ETag and a matching
+    If-None-Match gets a 304. `limited` maps a path to how many times it answers with the
+    "activity limited" page before serving the real one.
+    """
+
+    def __init__(self, pages: dict, robots: str = "", limited: dict = None):
+        self.pages = pages
+        self.robots = robots
+        self.limited = dict(limited or {})
+        self.requests = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self.handle)
+        return app
+
+    async def handle(self, request):
+        path = request.path_qs
+        self.requests.append((path, request.headers.get("If-None-Match")))
+        if path == "/robots.txt":
+            return web.Response(text=self.robots) if self.robots else web.Response(status=404)
+        if self.limited.get(path, 0) > 0:
+            self.limited[path] -= 1
+            return web.Response(text=LIMITED, content_type="text/html")
+        if path not in self.pages:
+            return web.Response(status=404, text="not found")
+        body = self.pages[path]
+        etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    def fetched(self, path: str) -> int:
+        return sum(1 for p, _ in self.requests if p == path)
+
+
+SITE = {
+    "/": page("Home", "/a", "/b?y=2&x=1", "/b?x=1&y=2", "/a#top", "/private/secret", "/missing",
+              "http://bad:99999/", "http://elsewhere.invalid/"),
+    "/a": page("A", "/c"),
+    "/b?x=1&y=2": page("B"),
+    "/c": page("C"),
+    "/private/secret": page("Secret"),
+}
+ROBOTS = "User-agent: *\nDisallow: /private\n"
+
+
+def read_pages(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {json.loads(line)["Title"]: json.loads(line) for line in f}
+
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Example.COM:80?b=2&a=1#frag") == "http://example.com/?a=1&b=2"
+    assert normalize_url("https://example.com:8443/x") == "https://example.com:8443/x"
+    with pytest.raises(ValueError):
+        normalize_url("http://bad:99999/")
+
+
+def test_crawl_respects_depth_robots_and_dedup(stub_server, tmp_path):
+    site = FixtureSite(SITE, ROBOTS)
+    base = stub_server(site.app())
+    output = tmp_path / "pages.jsonl"
+    stats = crawl(base + "/", 2, str(output), None, delay=0, same_host=True)
+
+    assert sorted(read_pages(output)) == ["A", "B", "Home"]
+    assert stats == {"fetched": 3, "failed": 0, "skipped_robots": 1, "limited": 0}
+    # The two spellings of /b and /a#top are one page each; /c is beyond the depth
+    assert site.fetched("/b?x=1&y=2") == 1 and site.fetched("/a") == 1
+    assert site.fetched("/c") == 0 and site.fetched("/private/secret") == 0
+    assert site.fetched("/robots.txt") == 1
+
+
+def test_recrawl_revalidates_from_the_cache(stub_server, tmp_path):
+    site = FixtureSite(SITE, ROBOTS)
+    base = stub_server(site.app())
+    cache = str(tmp_path / "http_cache.sqlite")
+    first, second = tmp_path / "first.jsonl", tmp_path / "second.jsonl"
+    crawl(base + "/", 2, str(first), cache, delay=0, same_host=True)
+    site.requests.clear()
+    crawl(base + "/", 2, str(second), cache, delay=0, same_host=True)
+
+    assert read_pages(second) == read_pages(first)
+    conditional = [path for path, etag in site.requests if etag]
+    assert sorted(conditional) == ["/", "/a", "/b?x=1&y=2"]
+
+
+def test_limited_host_backs_off_then_recovers(stub_server, tmp_path):
+    site = FixtureSite({"/": page("Home", "/a"), "/a": page("A")}, limited={"/a": 1})
+    base = stub_server(site.app())
+    output = tmp_path / "pages.jsonl"
+    stats = crawl(base + "/", 2, str(output), None, delay=0, limit_backoff=0.05, max_limit_hits=3)
+
+    assert stats["limited"] == 1 and stats["fetched"] == 2
+    assert site.fetched("/a") == 2
+
+
+def test_crawl_stops_after_max_limit_hits(stub_server, tmp_path):
+    site = FixtureSite({"/": page("Home", "/a"), "/a": page("A")}, limited={"/a": 100})
+    base = stub_server(site.app())
+    stats = crawl(base + "/", 2, str(tmp_path / "pages.jsonl"), None, delay=0, limit_backoff=0.01,
+                  max_limit_hits=2)
+
+    assert stats["limited"] == 2 and stats["fetched"] == 1
+    assert site.fetched("/a") == 2
+
+
+def test_worker_survives_an_unexpected_error(stub_server, tmp_path, monkeypatch):
+    site = FixtureSite({"/": page("Home", "/a", "/b", "/c"), "/a": page("A"), "/b": page("B"), "/c": page("C")})
+    base = stub_server(site.app())
+    parse = Crawler.parse
+
+    def flaky_parse(self, url, body):
+        if url.endswith("/b"):
+            raise RuntimeError("parser bug")
+        return parse(self, url, body)
+
+    monkeypatch.setattr(Crawler, "parse", flaky_parse)
+    output = tmp_path / "pages.jsonl"
+    # One worker: if it died on /b, /c would never be crawled and the frontier never drained
+    crawler = Crawler(str(output), concurrency=1, delay=0)
+    stats = asyncio.run(asyncio.wait_for(crawler.crawl([base + "/"], 2), timeout=10))
+
+    assert stats["failed"] == 1 and stats["fetched"] == 3
+    assert sorted(read_pages(output)) == ["A", "C", "Home"]
+
+
+def test_politeness_delay_spaces_requests_to_a_host(stub_server, tmp_path, monkeypatch):
+    site = FixtureSite({"/": page("Home", "/a", "/b"), "/a": page("A"), "/b": page("B")})
+    base = stub_server(site.app())
+    starts = []
+    fetch = Crawler.fetch
+
+    async def timed_fetch(self, url, headers=None):
+        starts.append(simple_crawler.time.monotonic())
+        return await fetch(self, url, headers)
+
+    monkeypatch.setattr(Crawler, "fetch", timed_fetch)
+    crawl(base + "/", 2, str(tmp_path / "pages.jsonl"), None, delay=0.1, respect_robots=False)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert len(starts) == 3 and min(gaps) >= 0.09
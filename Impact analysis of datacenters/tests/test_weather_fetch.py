@@ -0,0 +1,157 @@
+"""weather_fetch against a stand-in Open-Meteo archive API."""
+import numpy as np
+import pandas as pd
+import pytest
+from aiohttp import web
+
+import weather_fetch
+from weather_fetch import WeatherCache, WeatherFetcher, aggregate, fetch_cluster_weather, request_weight, split_range
+
+START, END = "2000-01-01", "2003-12-31"
+
+
+def daily_value(variable: str, lat: float, dates: pd.DatetimeIndex) -> np.ndarray:
+    """What the stub answers: a function of the variable, latitude and day of the year."""
+    return lat + (dates.dayofyear % 7).to_numpy() + sorted(weather_fetch.DAILY).index(variable)
+
+
+class ArchiveStub:
+    """
+    /v1/archive with the Open-Meteo query parameters. The first `fail_first` requests get a
+    429; latitudes in `bad` get a 400 with a reason. Every request's range is recorded.
+    """
+
+    def __init__(self, fail_first: int = 0, bad=()):
+        self.fail_first = fail_first
+        self.bad = set(bad)
+        self.requests = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/archive", self.archive)
+        return app
+
+    async def archive(self, request):
+        q = request.query
+        self.requests.append((float(q["latitude"]), q["start_date"], q["end_date"], q["daily"]))
+        if len(self.requests) <= self.fail_first:
+            return web.json_response({"error": True, "reason": "Too many requests"}, status=429,
+                                     headers={"Retry-After": "0"})
+        lat = float(q["latitude"])
+        if lat in self.bad:
+            return web.json_response({"error": True, "reason": "Latitude must be in range"}, status=400)
+        dates = pd.date_range(q["start_date"], q["end_date"])
+        daily = {"time": dates.strftime("%Y-%m-%d").tolist()}
+        for variable in q["daily"].split(","):
+            daily[variable] = daily_value(variable, lat, dates).tolist()
+        return web.json_response({"latitude": lat, "longitude": float(q["longitude"]), "daily": daily})
+
+
+@pytest.fixture
+def archive(stub_server):
+    def start(**options):
+        stub = ArchiveStub(**options)
+        return stub, stub_server(stub.app()) + "/v1/archive"
+    return start
+
+
+def fetcher(cache, base_url, per_second: float = None) -> WeatherFetcher:
+    """A fetcher with no real-world limits; `per_second` sets a one-second budget instead."""
+    fetcher = WeatherFetcher(cache, base_url, calls_per_minute=0, calls_per_hour=0, calls_per_day=0)
+    if per_second:
+        fetcher.limits = {1: per_second}
+    return fetcher
+
+
+def test_split_range_fits_each_request_in_the_budget():
+    ranges = split_range("1999-01-01", "2025-03-23", weather_fetch.DAILY, 600)
+    assert ranges[0][0] == "1999-01-01" and ranges[-1][1] == "2025-03-23"
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert pd.Timestamp(start) - pd.Timestamp(end) == pd.Timedelta(days=1)
+    assert all(request_weight(s, e, weather_fetch.DAILY) <= 600 for s, e in ranges)
+    assert split_range(START, END, weather_fetch.DAILY, float("inf")) == [(START, END)]
+
+
+def test_fetch_splits_long_ranges_and_caches(archive, tmp_path):
+    stub, url = archive()
+    cache = WeatherCache(str(tmp_path / "cache"))
+    first = fetcher(cache, url, per_second=50)
+    first.fetch([(10.0, 20.0)], weather_fetch.DAILY, START, END)
+
+    # 1461 days at 50 calls per request: 700 days (weight 50) per request
+    assert [(s, e) for _, s, e, _ in stub.requests] == [("2000-01-01", "2001-11-30"), ("2001-12-01", "2003-10-31"),
+                                                        ("2003-11-01", "2003-12-31")]
+    daily = cache.load((10.0, 20.0))
+    assert len(daily) == 1461 and daily["date"].is_monotonic_increasing
+    dates = pd.to_datetime(daily["date"])
+    np.testing.assert_allclose(daily["precipitation_sum"],
+                               daily_value("precipitation_sum", 10.0, pd.DatetimeIndex(dates)))
+
+    second = fetcher(cache, url)
+    second.fetch([(10.0, 20.0)], weather_fetch.DAILY, START, END)
+    assert len(stub.requests) == 3 and second.stats["cached"] == 1
+
+
+def test_rate_limited_requests_are_retried(archive, tmp_path):
+    stub, url = archive(fail_first=2)
+    weather = fetcher(WeatherCache(str(tmp_path / "cache")), url)
+    stats = weather.fetch([(10.0, 20.0)], weather_fetch.DAILY, START, END)
+    assert stats["fetched"] == 1 and stats["retries"] == 2 and stats["failed"] == 0
+
+
+def test_failed_location_is_reported_and_left_out(archive, tmp_path):
+    stub, url = archive(bad={99.0})
+    cache = WeatherCache(str(tmp_path / "cache"))
+    weather = fetcher(cache, url)
+    stats = weather.fetch([(10.0, 20.0), (99.0, 20.0)], weather_fetch.DAILY, START, END)
+    assert stats["fetched"] == 1 and stats["failed"] == 1
+    assert "Latitude must be in range" in weather.failures[(99.0, 20.0)]
+    assert (99.0, 20.0) not in cache
+    result = aggregate(cache, [(10.0, 20.0), (99.0, 20.0)])
+    assert result["lat_key"].tolist() == [10.0] and result.attrs["missing"] == [(99.0, 20.0)]
+
+
+def test_aggregate_skips_locations_missing_a_variable(archive, tmp_path):
+    stub, url = archive()
+    cache = WeatherCache(str(tmp_path / "cache"))
+    fetcher(cache, url).fetch([(10.0, 20.0)], weather_fetch.DAILY, START, END)
+    fetcher(cache, url).fetch([(30.0, 40.0)], ["temperature_2m_mean"], START, END)
+
+    result = aggregate(cache, [(10.0, 20.0), (30.0, 40.0)])
+    assert result["lat_key"].tolist() == [10.0]
+    assert result.attrs["missing"] == [(30.0, 40.0)]
+    # Asking only for what both have aggregates both
+    only_temperature = {"avg_temperature": ("temperature_2m_mean", "mean")}
+    assert aggregate(cache, [(10.0, 20.0), (30.0, 40.0)], only_temperature)["lat_key"].tolist() == [10.0, 30.0]
+
+
+def test_fetch_cluster_weather_end_to_end_and_offline(archive, tmp_path):
+    stub, url = archive()
+    clusters = pd.DataFrame({
+        "cluster": [1, 1, 2, 3],
+        "cluster_mid_lat": [10.001, 10.001, 10.004, 30.0],
+        "cluster_mid_lon": [20.0, 20.0, 20.0, 40.0],
+        "yearbuilt": [2001, 2001, 2005, 2010],
+    })
+    cache_dir = str(tmp_path / "cache")
+    options = dict(cache_dir=cache_dir, start=START, end=END, calls_per_minute=0, calls_per_hour=0,
+                   calls_per_day=0, base_url=url)
+    result = fetch_cluster_weather(clusters, **options)
+    # Clusters 1 and 2 round to the same location, so only two locations are requested
+    assert len({(lat, lon) for lat, lon, _, _ in stub.requests}) == 2
+    assert result["cluster_id"].tolist() == [1, 2, 3] and result.attrs["missing"] == []
+    dates = pd.date_range(START, END)
+    expected = daily_value("temperature_2m_mean", 30.0, dates).mean()
+    assert result.loc[result["cluster_id"] == 3, "avg_temperature"].item() == pytest.approx(expected, rel=1e-6)
+
+    # New aggregates and per-year rows come from the cache without any request
+    requests = len(stub.requests)
+    per_year = fetch_cluster_weather(clusters, aggregates={"max_temp": ("temperature_2m_mean", "max")},
+                                     per_year=True, offline=True, **options)
+    assert len(stub.requests) == requests
+    assert len(per_year) == 3 * 4 and set(per_year["year"]) == {2000, 2001, 2002, 2003}
+
+    # Offline with a variable nobody fetched: every cluster is reported instead of crashing
+    missing = fetch_cluster_weather(clusters, aggregates={"wind": ("wind_speed_10m_max", "max")}, offline=True,
+                                    **options)
+    assert missing.empty and missing.attrs["missing"] == [1, 2, 3]
@@ -1,5 +1,8 @@
 # spotify_predictor.py
 
+import argparse
+
+import joblib
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
@@ -9,6 +12,11 @@ from sklearn.pipeline import make_pipeline
 from sklearn.metrics import accuracy_score, ConfusionMatrixDisplay
 import matplotlib.pyplot as plt
 
+FEATURES = ["danceability", "energy", "loudness", "speechiness", "acousticness",
+            "instrumentalness", "liveness", "valence", "tempo"]
+THRESHOLD = 0.5
+MODEL_FILE = "banger_model.joblib"
+
 
 # ─── 1. Load Data ────────────────────────────────────────────────────────────
 
@@ -70,42 +78,78 @@ def train_and_evaluate(pipe, X_train, X_test, y_train, y_test) -> None:
 
 # ─── 4. Live Demo ────────────────────────────────────────────────────────────
 
-def live_demo(pipe, feature_names: list[str]) -> None:
+def parse_features(line: str) -> list[float]:
+    """The 9 feature values of one input line, separated by commas and/or spaces."""
+    values = [float(v) for v in line.replace(",", " ").split()]
+    if len(values) != len(FEATURES):
+        raise ValueError(f"expected {len(FEATURES)} values, got {len(values)}")
+    return values
+
+
+def live_demo(pipe, feature_names: list[str], threshold: float = THRESHOLD) -> None:
     """
     • Loop:
       – Read a line of 9 numeric feature values (danceability…tempo)
       – If blank, break
       – Validate input length
-      – Build DataFrame with `feature_names`
-      – Compute proba = pipe.predict_proba(df_live)[0,1]
+      – Compute proba with the NumPy fast path (no one-row DataFrame)
       – Label = "BANGER" if proba > threshold else "Meh"
       – Print label and probability
     """
-    # TODO: implement user prompts and live prediction
     input_data = input("Enter 9 feature values separated by commas: ")
     if not input_data.strip():
         return
-    feature_values = list(map(float, input_data.split(' ')))
-    if len(feature_values) != 9:
+    try:
+        feature_values = parse_features(input_data)
+    except ValueError:
         print("Invalid input length. Please enter exactly 9 values.")
         return
-    df_live = pd.DataFrame([feature_values], columns=feature_names)
-    proba = pipe.predict_proba(df_live)[0, 1]
-    label = "BANGER" if proba > 0.5 else "Meh"
+    proba = predict_banger_proba(pipe, np.array([feature_values]))[0]
+    label = "BANGER" if proba > threshold else "Meh"
     print(f"Label: {label}, Probability: {proba:.2f}")
 
 
-# ─── 5. Main ────────────────────────────────────────────────────────────────
+# ─── 5. Persistence & Fast Scoring ──────────────────────────────────────────
 
-def main() -> None:
-    """Orchestrate loading, splitting, pipeline, evaluation, and demo."""
-    # 1) Load data
-    # 2) Split (test_size=0.3, stratify=y, random_state=42)
-    # 3) Build pipeline
-    # 4) Train & evaluate
-    # 5) Run live demo
+def save_model(pipe, path: str = MODEL_FILE, threshold: float = THRESHOLD) -> str:
+    """Write the fitted pipeline, its decision threshold and feature order to `path`."""
+    joblib.dump({"pipeline": pipe, "threshold": threshold, "features": FEATURES}, path)
+    return path
+
+
+def load_model(path: str = MODEL_FILE) -> dict:
+    """The artifact written by `save_model`: {"pipeline", "threshold", "features"}."""
+    artifact = joblib.load(path)
+    if artifact["features"] != FEATURES:
+        raise ValueError(f"{path} was trained on features {artifact['features']}")
+    return artifact
+
+
+def predict_banger_proba(pipe, X: np.ndarray) -> np.ndarray:
+    """
+    P(banger) for the rows of a (n, 9) array in FEATURES order. Standardization is done
+    in NumPy and the forest is called on the array directly, which is what the pipeline
+    does internally, minus the DataFrame construction and feature-name validation.
+    A FlatForest (see flat_forest.py) scores the raw rows itself.
+    """
+    if hasattr(pipe, "predict_banger_proba"):
+        return pipe.predict_banger_proba(X)
+    X = np.asarray(X, dtype=np.float64)
+    for _, step in pipe.steps[:-1]:
+        if isinstance(step, StandardScaler):
+            X = (X - step.mean_) / step.scale_
+        else:
+            X = step.transform(X)
+    model = pipe.steps[-1][1]
+    return model.predict_proba(X)[:, list(model.classes_).index(True)]
+
+
+# ─── 6. Main ────────────────────────────────────────────────────────────────
+
+def fit_model(data_path: str):
+    """Load `data_path`, split, build, train and evaluate; returns (pipe, feature_names)."""
     print("Loading data...")
-    X,y = load_data("./dataset.csv")
+    X,y = load_data(data_path)
     
     print("Splitting data...")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, stratify=y, random_state=42)
@@ -115,11 +159,144 @@ def main() -> None:
     
     print("Training and evaluating...")
     train_and_evaluate(pipe, X_train, X_test, y_train, y_test)
-    feature_names = X.columns.tolist()
-    
+    return pipe, X.columns.tolist()
+
+
+def main() -> None:
+    """Orchestrate loading, splitting, pipeline, evaluation, and demo."""
+    parser = argparse.ArgumentParser(description="Predict whether a track is a banger (popularity >= 70).")
+    parser.add_argument("--data", default="./dataset.csv")
+    parser.add_argument("--registry", default="models", help="directory of trained models, keyed by data + params")
+    parser.add_argument("--retrain", action="store_true", help="fit again even if the data is unchanged")
+    parser.add_argument("--use", default="active",
+                        help="registered model to score with: active (the last trained, streamed or tuned; "
+                             "the default), default (build_pipeline's forest) or a fingerprint")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("demo", help="score tracks typed at the prompt (the default)")
+    train = commands.add_parser("train", help="train (if the data changed) and register the model")
+    train.add_argument("--model", help="also write the artifact to this file")
+    train.add_argument("--stream", action="store_true", help="out-of-core: chunked passes + an incremental model")
+    train.add_argument("--chunksize", type=int, default=100_000)
+    train.add_argument("--epochs", type=int, default=3)
+    train.add_argument("--kind", choices=["mlp", "sgd"], default="mlp", help="incremental model for --stream")
+    serve = commands.add_parser("serve", help="score tracks over HTTP or stdin")
+    serve.add_argument("--model", help="artifact file to serve instead of the registered model")
+    serve.add_argument("--stdin", action="store_true", help="read one track per line from stdin")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--max-batch", type=int, default=256)
+    serve.add_argument("--max-wait-ms", type=float, default=2.0)
+    serve.add_argument("--flat", help="serve a forest written by `export` instead of a joblib pipeline")
+    bench = commands.add_parser("bench-serve", help="latency / throughput of the scoring paths")
+    bench.add_argument("--model", help="artifact file to benchmark instead of the registered model")
+    bench.add_argument("--clients", type=int, default=16)
+    bench.add_argument("--requests", type=int, default=50, help="single-track requests per client")
+    bench_train = commands.add_parser("bench-train", help="rows/sec and peak RSS: in-memory vs streaming training")
+    bench_train.add_argument("--scale", type=int, default=1, help="copies of the dataset to train on")
+    bench_train.add_argument("--chunksize", type=int, default=100_000)
+    bench_train.add_argument("--epochs", type=int, default=3)
+    bench_train.add_argument("--no-legacy", action="store_true", help="skip the in-memory forest")
+    tune = commands.add_parser("tune", help="successive-halving search of the forest and the threshold")
+    tune.add_argument("--candidates", type=int, default=27)
+    tune.add_argument("--budget", type=float, default=600,
+                      help="seconds in which search fits may start; running fits, the refit and the baseline come on top")
+    tune.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    tune.add_argument("--threshold-metric", choices=["f1", "balanced_accuracy", "accuracy"], default="f1")
+    tune.add_argument("--no-baseline", action="store_true", help="skip refitting build_pipeline() for comparison")
+    tune.add_argument("--model", help="also write the tuned artifact to this file")
+    tune.add_argument("--report", default="tune_report.json")
+    export = commands.add_parser("export", help="flatten the forest (scaler folded in) into NumPy arrays")
+    export.add_argument("--model", help="artifact file to export instead of the registered model")
+    export.add_argument("--output", default="banger_forest.npz")
+    export.add_argument("--bench", action="store_true", help="check agreement, latency and size against the pipeline")
+    export.add_argument("--bench-rows", type=int, default=10_000, help="rows of --data for --bench")
+    args = parser.parse_args()
+
+    from model_registry import ModelRegistry, get_or_train
+
+    if args.command == "tune":
+        import tuning
+        pipe, threshold, report = tuning.tune(args.data, args.candidates, args.budget, args.workers,
+                                              args.threshold_metric, not args.no_baseline)
+        tuning.print_report(report)
+        tuning.write_report(report, args.report)
+        registry = ModelRegistry(args.registry)
+        fingerprint = registry.fingerprint(args.data, {"tuned": True, **report["best_params"]})
+        model = registry.put(fingerprint, {"pipeline": pipe, "threshold": threshold, "features": FEATURES},
+                             {k: v for k, v in report.items() if k != "rungs"})
+        registry.activate(args.data, fingerprint)
+        print(f"Registered and activated model {fingerprint} ({model.path}); report in {args.report}")
+        if args.model:
+            print(f"Saved {save_model(pipe, args.model, threshold)}")
+        return
+
+    if args.command == "bench-train":
+        import streaming_train
+        streaming_train.benchmark(args.data, args.scale, args.chunksize, args.epochs, legacy=not args.no_legacy)
+        return
+    if args.command == "train" and args.stream:
+        import streaming_train
+        registry = ModelRegistry(args.registry)
+        options = {"stream": True, "kind": args.kind, "chunksize": args.chunksize, "epochs": args.epochs}
+        fingerprint = registry.fingerprint(args.data, {**options, **streaming_train.make_model(args.kind).get_params()})
+        model = None if args.retrain else registry.get(fingerprint)
+        if model is not None:
+            print(f"Using registered model {fingerprint} (training data unchanged)")
+        else:
+            pipe, report = streaming_train.stream_train(args.data, args.chunksize, args.epochs, args.kind)
+            model = registry.put(fingerprint, {"pipeline": pipe, "threshold": THRESHOLD, "features": FEATURES},
+                                 {"data": args.data, **options, **report})
+            print(", ".join(f"{k} {v:.3f}" if isinstance(v, float) else f"{k} {v}" for k, v in report.items()))
+            print(f"Registered model {fingerprint} ({model.path})")
+        registry.activate(args.data, fingerprint)
+        if args.model:
+            print(f"Saved {save_model(model.pipeline, args.model, model.threshold)}")
+        return
+
+    if args.command == "serve" and args.flat:
+        import scoring_service
+        from flat_forest import FlatForest
+        flat = FlatForest.load(args.flat)
+        scoring_service.serve({"pipeline": flat, "threshold": flat.decision_threshold, "features": FEATURES},
+                              args.stdin, args.host, args.port, args.max_batch, args.max_wait_ms)
+        return
+
+    if getattr(args, "model", None) and args.command != "train":
+        artifact = load_model(args.model)
+    else:
+        # Trains only when dataset.csv or the hyperparameters changed since the last run
+        registry = ModelRegistry(args.registry)
+        model = get_or_train(args.data, registry, args.retrain, "default" if args.command == "train" else args.use)
+        if args.command == "train":
+            registry.activate(args.data, model.fingerprint)
+        artifact = model.artifact if args.command in ("serve", "bench-serve", "export") else None
+
+    if args.command == "export":
+        from flat_forest import FlatForest, benchmark
+        flat = FlatForest.from_pipeline(artifact["pipeline"], artifact["threshold"])
+        print(f"Saved {flat.save(args.output)} ({flat.n_trees} trees, {flat.n_nodes} nodes)")
+        if args.bench:
+            X, _ = load_data(args.data)
+            X = X.sample(min(args.bench_rows, len(X)), random_state=0)
+            benchmark(artifact["pipeline"], flat, X[FEATURES].to_numpy(), FEATURES, batches=(256, len(X)))
+        return
+
+    if args.command in ("serve", "bench-serve"):
+        import scoring_service
+        if args.command == "serve":
+            scoring_service.serve(artifact, args.stdin, args.host, args.port, args.max_batch, args.max_wait_ms)
+        else:
+            scoring_service.benchmark(artifact, args.clients, args.requests)
+        return
+
+    if args.command == "train":
+        if args.model:
+            print(f"Saved {save_model(model.pipeline, args.model, model.threshold)}")
+        return
+
     print("Running live demo...")
     while True:
-        live_demo(pipe, feature_names)
+        live_demo(model.pipeline, FEATURES, model.threshold)
         cont = input("Do you want to continue? (y/n): ").strip().lower()
         if cont != 'y':
             break
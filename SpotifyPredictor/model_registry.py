@@ -0,0 +1,194 @@
+"""
+Registry of fitted banger models, so the forest is trained once per training set.
+
+Each artifact is stored under a fingerprint: the SHA-256 of the training CSV together with
+the pipeline's hyperparameters and the scikit-learn version. A run whose fingerprint is
+already registered loads that artifact instead of refitting; anything else trains and
+registers a new one. Artifacts are written by joblib without compression, so loading does
+not pay for decompression, and loading itself is deferred until the model is used.
+
+Each dataset also has an active model: the one demo / serve use. `train` activates the
+default forest, `train --stream` and `tune` activate what they produced.
+
+    registry = ModelRegistry("models")
+    model = get_or_train("dataset.csv", registry)    # trains only on a new fingerprint
+    model.pipeline.predict_proba(...)                 # loaded here
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+import joblib
+import sklearn
+
+REGISTRY_DIR = "models"
+INDEX_FILE = "index.json"
+ACTIVE_KEY = "active"  # index.json entry: data sha256 -> fingerprint of the active model
+HASH_CHUNK = 1 << 20
+
+
+def _json_params(params: dict) -> dict:
+    """The JSON-representable hyperparameters (estimator objects are described by their class)."""
+    plain = {}
+    for key, value in sorted(params.items()):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            plain[key] = value
+        elif isinstance(value, (list, tuple, dict)):
+            plain[key] = json.loads(json.dumps(value, default=repr))
+        else:
+            plain[key] = type(value).__name__
+    return plain
+
+
+class ModelRegistry:
+    """
+    Artifacts as <root>/banger-<fingerprint>.joblib with a .json of metadata next to each.
+    index.json remembers the hash of every training file by path, mtime and size, so an
+    unchanged dataset is not re-read just to be fingerprinted.
+    """
+
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILE)
+
+    def _index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_index(self, index: dict):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def data_hash(self, data_path: str) -> str:
+        """SHA-256 of the file, reused from the index while its mtime and size are unchanged."""
+        stat = os.stat(data_path)
+        key = os.path.abspath(data_path)
+        index = self._index()
+        entry = index.get(key)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["sha256"]
+        digest = hashlib.sha256()
+        with open(data_path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK):
+                digest.update(chunk)
+        index[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest.hexdigest()}
+        self._write_index(index)
+        return digest.hexdigest()
+
+    def activate(self, data_path: str, fingerprint: str):
+        """Make `fingerprint` the model demo / serve use for this dataset."""
+        digest = self.data_hash(data_path)
+        index = self._index()
+        index.setdefault(ACTIVE_KEY, {})[digest] = fingerprint
+        self._write_index(index)
+
+    def active(self, data_path: str):
+        """The active LazyModel for this dataset (its current contents), or None."""
+        fingerprint = self._index().get(ACTIVE_KEY, {}).get(self.data_hash(data_path))
+        return self.get(fingerprint) if fingerprint else None
+
+    def fingerprint(self, data_path: str, params: dict) -> str:
+        description = {"data": self.data_hash(data_path), "params": _json_params(params),
+                       "sklearn": sklearn.__version__}
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def path(self, fingerprint: str) -> str:
+        return os.path.join(self.root, f"banger-{fingerprint}.joblib")
+
+    def get(self, fingerprint: str):
+        """A LazyModel for the fingerprint, or None when it was never registered."""
+        path = self.path(fingerprint)
+        return LazyModel(path) if os.path.exists(path) else None
+
+    def put(self, fingerprint: str, artifact: dict, metadata: dict = None) -> "LazyModel":
+        path = self.path(fingerprint)
+        tmp = path + ".tmp"
+        joblib.dump(artifact, tmp)  # uncompressed: faster to load
+        os.replace(tmp, path)
+        with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "created": time.time(), **(metadata or {})}, f, indent=2)
+        return LazyModel(path)
+
+    def list(self) -> list:
+        """Metadata of every registered artifact, newest first."""
+        entries = []
+        for name in os.listdir(self.root):
+            if name.startswith("banger-") and name.endswith(".json"):
+                with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                    entries.append(json.load(f))
+        return sorted(entries, key=lambda e: e.get("created", 0), reverse=True)
+
+
+class LazyModel:
+    """
+    A registered artifact that is only read when first used. `prefetch`
+    starts that read in a background thread so it overlaps with whatever comes next.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fingerprint = os.path.basename(path)[len("banger-"):-len(".joblib")]
+        self._artifact = None
+        self._lock = threading.Lock()
+        self._loader = None
+
+    def prefetch(self) -> "LazyModel":
+        if self._artifact is None and self._loader is None:
+            self._loader = threading.Thread(target=lambda: self.artifact, daemon=True)
+            self._loader.start()
+        return self
+
+    @property
+    def artifact(self) -> dict:
+        with self._lock:
+            if self._artifact is None:
+                self._artifact = joblib.load(self.path)
+            return self._artifact
+
+    @property
+    def pipeline(self):
+        return self.artifact["pipeline"]
+
+    @property
+    def threshold(self) -> float:
+        return self.artifact["threshold"]
+
+
+def get_or_train(data_path: str, registry: ModelRegistry, retrain: bool = False, use: str = "active") -> LazyModel:
+    """
+    The model to score with. use="active": the dataset's active model (streamed or tuned),
+    falling back to the default forest; use="default": the forest of build_pipeline's
+    hyperparameters, fitted if it was never registered (or with `retrain`); anything else
+    is the fingerprint of a registered model.
+    """
+    from Spotify_Predictor import FEATURES, THRESHOLD, build_pipeline, fit_model
+
+    if use not in ("active", "default"):
+        model = registry.get(use)
+        if model is None:
+            raise KeyError(f"no registered model {use!r} in {registry.root}")
+        return model.prefetch()
+    if use == "active" and not retrain:
+        model = registry.active(data_path)
+        if model is not None:
+            print(f"Using active model {model.fingerprint}")
+            return model.prefetch()
+
+    fingerprint = registry.fingerprint(data_path, build_pipeline().get_params(deep=True))
+    model = None if retrain else registry.get(fingerprint)
+    if model is not None:
+        print(f"Using registered model {fingerprint} (training data unchanged)")
+        return model.prefetch()
+    started = time.perf_counter()
+    pipe, _ = fit_model(data_path)
+    model = registry.put(fingerprint, {"pipeline": pipe, "threshold": THRESHOLD, "features": FEATURES},
+                         {"data": os.path.abspath(data_path), "fit_seconds": time.perf_counter() - started})
+    print(f"Registered model {fingerprint} ({model.path})")
+    return model
@@ -0,0 +1,270 @@
+"""
+Scoring service for the banger model saved by `Spotify_Predictor.py train`.
+
+Requests are not scored one by one: a MicroBatcher thread collects whatever tracks arrive
+within a couple of milliseconds (up to `max_batch`) and scores them with a single
+predict_proba call on a NumPy array, so 200 trees are walked once per batch instead of
+once per track. The same batcher sits behind the HTTP endpoint and the stdin feed.
+
+    python Spotify_Predictor.py serve --model banger_model.joblib --port 8765
+    curl -d '{"tracks": [[0.6, 0.8, -5.1, 0.05, 0.1, 0.0, 0.1, 0.5, 120]]}' localhost:8765/score
+    curl localhost:8765/stats
+    python Spotify_Predictor.py serve --model banger_model.joblib --stdin < feed.txt
+    python Spotify_Predictor.py bench-serve --model banger_model.joblib --clients 16
+"""
+import sys
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from Spotify_Predictor import FEATURES, parse_features, predict_banger_proba
+
+MAX_BATCH = 256
+MAX_WAIT_MS = 2.0
+
+
+class LatencyStats:
+    """Per-request latencies and track counts, for p50 / p99 and tracks/sec."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.tracks = 0
+        self.started = time.perf_counter()
+
+    def record(self, seconds: float, tracks: int = 1):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.tracks += tracks
+
+    def summary(self) -> dict:
+        with self.lock:
+            latencies = np.array(self.latencies)
+            tracks = self.tracks
+        elapsed = time.perf_counter() - self.started
+        if not len(latencies):
+            return {"requests": 0, "tracks": 0}
+        return {
+            "requests": len(latencies),
+            "tracks": tracks,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "tracks_per_sec": tracks / elapsed if elapsed > 0 else float("nan"),
+        }
+
+
+class MicroBatcher:
+    """
+    Queue in front of a scoring function. `submit` returns a Future for the rows' P(banger);
+    the worker thread takes the first waiting request, keeps collecting for up to
+    `max_wait_ms` or until `max_batch` rows, and scores them all in one call.
+    """
+
+    def __init__(self, score_fn, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, rows) -> Future:
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        if rows.shape[1] != len(FEATURES):
+            raise ValueError(f"expected {len(FEATURES)} features per track, got {rows.shape[1]}")
+        future = Future()
+        self.queue.put((rows, future))
+        return future
+
+    def score(self, rows) -> np.ndarray:
+        return self.submit(rows).result()
+
+    def close(self):
+        self.queue.put(None)
+        self.worker.join()
+
+    def _collect(self, first):
+        batch, size, closing = [first], len(first[0]), False
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                closing = True
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, closing
+
+    def _run(self):
+        closing = False
+        while not closing:
+            first = self.queue.get()
+            if first is None:
+                break
+            batch, closing = self._collect(first)
+            try:
+                proba = self.score_fn(np.concatenate([rows for rows, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            offsets = np.cumsum([len(rows) for rows, _ in batch])[:-1]
+            for (_, future), part in zip(batch, np.split(proba, offsets)):
+                future.set_result(part)
+
+
+def label(proba: float, threshold: float) -> str:
+    return "BANGER" if proba > threshold else "Meh"
+
+
+def make_handler(batcher: MicroBatcher, threshold: float, stats: LatencyStats):
+    class ScoreHandler(BaseHTTPRequestHandler):
+        """POST /score {"tracks": [[9 values], ...]} or {"features": [9 values]}; GET /stats."""
+
+        def _reply(self, status: int, body: dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, {**stats.summary(), "batches": batcher.batches})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._reply(404, {"error": "not found"})
+                return
+            started = time.perf_counter()
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                tracks = body["tracks"] if "tracks" in body else [body["features"]]
+                proba = batcher.score(tracks)
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            stats.record(time.perf_counter() - started, len(proba))
+            self._reply(200, {"probabilities": proba.round(6).tolist(),
+                              "labels": [label(p, threshold) for p in proba]})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoreHandler
+
+
+def serve_stdin(batcher: MicroBatcher, threshold: float, stats: LatencyStats, lines=None, out=None):
+    """
+    Score one track per input line, printing "<label>\t<probability>" in input order.
+    Lines are submitted as they are read and printed as their batch completes.
+    """
+    lines = sys.stdin if lines is None else lines
+    out = sys.stdout if out is None else out
+    pending = queue.Queue(maxsize=4 * batcher.max_batch)
+
+    def read():
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                pending.put((time.perf_counter(), batcher.submit([parse_features(line)])))
+            except ValueError as e:
+                pending.put((None, e))
+        pending.put(None)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    while (item := pending.get()) is not None:
+        started, result = item
+        if started is None:
+            print(f"error\t{result}", file=out, flush=True)
+            continue
+        proba = result.result()[0]
+        stats.record(time.perf_counter() - started)
+        print(f"{label(proba, threshold)}\t{proba:.4f}", file=out, flush=pending.empty())
+    reader.join()
+
+
+def serve(artifact: dict, use_stdin: bool = False, host: str = "127.0.0.1", port: int = 8765,
+          max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+    pipe, threshold = artifact["pipeline"], artifact["threshold"]
+    batcher = MicroBatcher(lambda X: predict_banger_proba(pipe, X), max_batch, max_wait_ms)
+    stats = LatencyStats()
+    try:
+        if use_stdin:
+            serve_stdin(batcher, threshold, stats)
+            print(json.dumps(stats.summary()), file=sys.stderr)
+            return
+        server = ThreadingHTTPServer((host, port), make_handler(batcher, threshold, stats))
+        print(f"Scoring on http://{host}:{port}/score (threshold {threshold})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            print(json.dumps(stats.summary()))
+    finally:
+        batcher.close()
+
+
+def _run_clients(score_one, tracks: np.ndarray, clients: int, requests: int) -> dict:
+    """`clients` threads each scoring `requests` single tracks back to back."""
+    stats = LatencyStats()
+
+    def client(c):
+        for r in range(requests):
+            row = tracks[(c * requests + r) % len(tracks)]
+            started = time.perf_counter()
+            score_one(row)
+            stats.record(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client, range(clients)))
+    return stats.summary()
+
+
+def benchmark(artifact: dict, clients: int = 16, requests: int = 50, seed: int = 0):
+    """
+    Concurrent single-track requests through: a one-row DataFrame and pipe.predict_proba
+    (what live_demo did), the NumPy fast path, and the micro-batcher.
+    """
+    pipe = artifact["pipeline"]
+    rng = np.random.default_rng(seed)
+    scaler = pipe.steps[0][1]
+    tracks = rng.normal(scaler.mean_, scaler.scale_, size=(1000, len(FEATURES)))
+
+    batcher = MicroBatcher(lambda X: predict_banger_proba(pipe, X))
+    paths = {
+        "DataFrame + pipeline": lambda row: pipe.predict_proba(pd.DataFrame([row], columns=FEATURES))[0, 1],
+        "NumPy fast path": lambda row: predict_banger_proba(pipe, row[None, :])[0],
+        "micro-batched": lambda row: batcher.score(row)[0],
+    }
+    expected = pipe.predict_proba(pd.DataFrame(tracks[:64], columns=FEATURES))[:, 1]
+    assert np.allclose(predict_banger_proba(pipe, tracks[:64]), expected)
+    assert np.allclose(np.concatenate([batcher.score(t) for t in tracks[:64]]), expected)
+
+    print(f"{clients} clients x {requests} single-track requests")
+    print(f"{'path':<22} {'p50 ms':>8} {'p99 ms':>8} {'tracks/s':>10}")
+    for name, score_one in paths.items():
+        batcher.batches = 0
+        result = _run_clients(score_one, tracks, clients, requests)
+        extra = f"   ({result['tracks'] / max(batcher.batches, 1):.1f} tracks per batch)" \
+            if name == "micro-batched" else ""
+        print(f"{name:<22} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['tracks_per_sec']:>10.0f}{extra}")
+    batcher.close()
@@ -0,0 +1,249 @@
+"""
+Out-of-core training of the banger model for catalogs that do not fit in memory.
+
+dataset.csv is read `chunksize` rows at a time with float32 columns and never held whole:
+1. a first pass updates the StandardScaler (partial_fit), counts the classes and keeps a
+   stratified reservoir sample of held-out rows for evaluation,
+2. each epoch streams the file again and trains an incremental model (partial_fit, with
+   "balanced" class weights computed from the first pass's counts) on the other rows.
+Peak memory is set by the chunk size and the reservoir capacity, not by the file.
+
+    python Spotify_Predictor.py --data dataset.csv train --stream --chunksize 100000 --epochs 3
+    python Spotify_Predictor.py --data dataset.csv bench-train --scale 10
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import balanced_accuracy_score, roc_auc_score
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from Spotify_Predictor import FEATURES
+
+CHUNKSIZE = 100_000
+EPOCHS = 3
+HOLDOUT_PERCENT = 10  # of the rows, chosen by a hash of the row number
+RESERVOIR_PER_CLASS = 20_000
+BANGER_POPULARITY = 70
+CLASSES = np.array([False, True])
+
+
+def make_model(kind: str = "mlp", seed: int = 42):
+    """An estimator with partial_fit and predict_proba."""
+    if kind == "sgd":
+        return SGDClassifier(loss="log_loss", alpha=1e-5, random_state=seed)
+    if kind == "mlp":
+        return MLPClassifier(hidden_layer_sizes=(64, 32), learning_rate_init=1e-3, random_state=seed)
+    raise ValueError(f"unknown model kind {kind!r} (sgd or mlp)")
+
+
+def iter_chunks(path: str, chunksize: int = CHUNKSIZE):
+    """
+    (row numbers, X float32, y) per chunk of `path`, rows with missing values dropped; the row
+    numbers count from the start of the file, so the holdout split is the same in every pass.
+    """
+    start = 0
+    reader = pd.read_csv(path, usecols=["popularity"] + FEATURES, chunksize=chunksize,
+                         dtype={c: np.float32 for c in ["popularity"] + FEATURES})
+    for chunk in reader:
+        rows = np.arange(start, start + len(chunk))
+        start += len(chunk)
+        present = chunk.notna().all(axis=1).to_numpy()
+        X = chunk[FEATURES].to_numpy(dtype=np.float32)[present]
+        y = (chunk["popularity"].to_numpy() >= BANGER_POPULARITY)[present]
+        yield rows[present], X, y
+
+
+def is_holdout(rows: np.ndarray, percent: int = HOLDOUT_PERCENT) -> np.ndarray:
+    return (rows.astype(np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)) % 100 < percent
+
+
+class StratifiedReservoir:
+    """A uniform sample of up to `capacity` rows per class from a stream (algorithm R, vectorized)."""
+
+    def __init__(self, capacity: int = RESERVOIR_PER_CLASS, seed: int = 0):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.samples = {}
+        self.seen = {}
+
+    def add(self, X: np.ndarray, y: np.ndarray):
+        for label in np.unique(y):
+            rows = X[y == label]
+            seen = self.seen.get(label, 0)
+            sample = self.samples.setdefault(label, np.empty((self.capacity, X.shape[1]), dtype=X.dtype))
+            # Row k of the stream (0-based) goes to slot k while filling, then to a random slot
+            # below k + 1, kept only if that slot is inside the reservoir
+            position = seen + np.arange(len(rows))
+            slot = np.where(position < self.capacity, position,
+                            self.rng.integers(0, position + 1))
+            keep = slot < self.capacity
+            sample[slot[keep]] = rows[keep]  # later rows win duplicate slots, as in sequential order
+            self.seen[label] = seen + len(rows)
+
+    def arrays(self):
+        """(X, y) of the sample, and the number of stream rows seen per class."""
+        labels = sorted(self.samples)
+        sizes = [min(self.seen[label], self.capacity) for label in labels]
+        X = np.concatenate([self.samples[label][:n] for label, n in zip(labels, sizes)])
+        y = np.concatenate([np.full(n, label) for label, n in zip(labels, sizes)])
+        return X, y, {bool(label): self.seen[label] for label in labels}
+
+
+def evaluate(pipe, X: np.ndarray, y: np.ndarray, seen: dict, threshold: float = 0.5) -> dict:
+    """
+    Metrics on the reservoir. Classes are sampled at different rates, so accuracy is the
+    per-class recall weighted by each class's share of the held-out stream.
+    """
+    proba = pipe.predict_proba(X)[:, list(pipe.classes_).index(True)]
+    predicted = proba > threshold
+    total = sum(seen.values())
+    recall = {label: float((predicted[y == label] == label).mean()) for label in seen}
+    return {
+        "accuracy": sum(recall[label] * seen[label] / total for label in seen),
+        "balanced_accuracy": float(balanced_accuracy_score(y, predicted)),
+        "roc_auc": float(roc_auc_score(y, proba)) if len(seen) == 2 else float("nan"),
+        "recall_banger": recall.get(True, float("nan")),
+        "holdout_rows": total,
+    }
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def stream_train(path: str, chunksize: int = CHUNKSIZE, epochs: int = EPOCHS, kind: str = "mlp",
+                 reservoir: int = RESERVOIR_PER_CLASS, seed: int = 42, verbose: bool = True):
+    """(pipeline, report): a StandardScaler + incremental model trained in `epochs` streaming passes."""
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    counts = np.zeros(2, dtype=np.int64)
+    sample = StratifiedReservoir(reservoir, seed)
+    rows_read = 0
+    for rows, X, y in iter_chunks(path, chunksize):
+        held = is_holdout(rows)
+        sample.add(X[held], y[held])
+        if (~held).any():
+            scaler.partial_fit(X[~held])
+        counts += np.bincount(y[~held].astype(np.int64), minlength=2)
+        rows_read += len(rows)
+    # "balanced" class weights, as the forest uses
+    class_weight = counts.sum() / (2 * np.maximum(counts, 1))
+    if verbose:
+        print(f"Pass 1: {rows_read} rows, {counts[1]} bangers in training, scaler fitted "
+              f"({time.perf_counter() - started:.1f}s)")
+
+    model = make_model(kind, seed)
+    rng = np.random.default_rng(seed)
+    for epoch in range(epochs):
+        for rows, X, y in iter_chunks(path, chunksize):
+            train = ~is_holdout(rows)
+            X, y = scaler.transform(X[train]), y[train]
+            order = rng.permutation(len(y))  # the file may be sorted; shuffle within the chunk
+            model.partial_fit(X[order], y[order], classes=CLASSES, sample_weight=class_weight[y[order].astype(int)])
+        if verbose:
+            print(f"Epoch {epoch + 1}/{epochs} done ({time.perf_counter() - started:.1f}s)")
+
+    pipe = make_pipeline(scaler, model)
+    seconds = time.perf_counter() - started
+    X_eval, y_eval, seen = sample.arrays()
+    report = {
+        "mode": f"streaming {kind}", "rows": rows_read, "seconds": seconds,
+        "rows_per_sec": rows_read / seconds,
+        "peak_rss_mb": peak_rss_mb(), **evaluate(pipe, X_eval, y_eval, seen),
+    }
+    return pipe, report
+
+
+def in_memory_train(path: str) -> dict:
+    """The current path (load_data + the 200-tree forest), evaluated on the same holdout rows."""
+    from Spotify_Predictor import build_pipeline
+
+    started = time.perf_counter()
+    df = pd.read_csv(path, usecols=["popularity"] + FEATURES)
+    rows = np.arange(len(df))
+    df = df.dropna()
+    rows = rows[df.index.to_numpy()]
+    X, y = df[FEATURES], df["popularity"] >= BANGER_POPULARITY
+    held = is_holdout(rows)
+    pipe = build_pipeline().fit(X[~held], y[~held])
+    seconds = time.perf_counter() - started
+    sample = StratifiedReservoir(RESERVOIR_PER_CLASS)
+    sample.add(X[held].to_numpy(dtype=np.float32), y[held].to_numpy())
+    X_eval, y_eval, seen = sample.arrays()
+    return {"mode": "in-memory forest", "rows": len(df), "seconds": seconds, "rows_per_sec": len(df) / seconds,
+            "peak_rss_mb": peak_rss_mb(),
+            **evaluate(pipe, pd.DataFrame(X_eval, columns=FEATURES), y_eval, seen)}
+
+
+def scaled_copy(path: str, scale: int, output: str) -> str:
+    """`path` repeated `scale` times (header once), for benchmarking bigger catalogs."""
+    with open(path, "rb") as f:
+        header, body = f.readline(), f.read()
+    if not body.endswith(b"\n"):
+        body += b"\n"
+    with open(output, "wb") as f:
+        f.write(header)
+        for _ in range(scale):
+            f.write(body)
+    return output
+
+
+def _measure(mode: str, path: str, **options) -> dict:
+    """Run one training mode in a fresh interpreter so its peak RSS is its own."""
+    command = [sys.executable, os.path.abspath(__file__), mode, os.path.abspath(path)]
+    for key, value in options.items():
+        command += [f"--{key.replace('_', '-')}", str(value)]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark(path: str, scale: int = 1, chunksize: int = CHUNKSIZE, epochs: int = EPOCHS,
+              kinds=("sgd", "mlp"), legacy: bool = True):
+    """rows/sec, peak RSS and holdout metrics of the in-memory forest vs streaming training."""
+    scaled = None
+    if scale > 1:
+        scaled = scaled_copy(path, scale, os.path.splitext(os.path.abspath(path))[0] + f".x{scale}.csv")
+        path = scaled
+    try:
+        results = [_measure("legacy", path)] if legacy else []
+        for kind in kinds:
+            results.append(_measure("stream", path, chunksize=chunksize, epochs=epochs, kind=kind))
+    finally:
+        if scaled:
+            os.remove(scaled)
+    table = pd.DataFrame(results).set_index("mode")
+    columns = ["rows", "seconds", "rows_per_sec", "peak_rss_mb", "accuracy", "balanced_accuracy", "roc_auc"]
+    print(table[columns].round(3).to_string())
+    return table
+
+
+def main():
+    """Child process of `benchmark`: train one way and print the report as JSON."""
+    parser = argparse.ArgumentParser(description="One measured training run (used by bench-train).")
+    parser.add_argument("mode", choices=["legacy", "stream"])
+    parser.add_argument("data")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--kind", default="mlp")
+    args = parser.parse_args()
+    if args.mode == "legacy":
+        report = in_memory_train(args.data)
+    else:
+        _, report = stream_train(args.data, args.chunksize, args.epochs, args.kind, verbose=False)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
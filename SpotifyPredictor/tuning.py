@@ -0,0 +1,211 @@
+"""
+Hyperparameter search for the banger forest by successive halving.
+
+A random sample of (max_depth, n_estimators, max_features) configurations is trained on a
+small share of the training rows; the best third moves on to three times as many rows, and
+so on until one configuration is left or the data runs out. Candidates of a rung are fitted
+in a process pool. The StandardScaler is fitted and applied once up front and the scaled
+arrays are handed to each worker once (pool initializer), so candidates only pay for their
+forest. Once the wall-clock budget is spent no new fits are started and the best candidate
+so far wins. Finally the decision threshold (0.5 in live_demo) is tuned on validation rows.
+
+The budget bounds when search fits may start, not the whole run: fits already running at the
+deadline are waited for (and left out of the ranking), and the refit of the winner on every
+fit row and the baseline come on top. The report times each of these separately.
+
+    python Spotify_Predictor.py --data dataset.csv tune --candidates 27 --budget 600 \
+        --model tuned.joblib --report tune_report.json
+"""
+import os
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, balanced_accuracy_score, f1_score, roc_auc_score
+from sklearn.model_selection import ParameterSampler, train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+SEARCH_SPACE = {
+    "max_depth": [None, 8, 12, 16, 24],
+    "n_estimators": [50, 100, 200, 400],
+    "max_features": ["sqrt", "log2", 0.5, None],
+    "min_samples_leaf": [1, 2, 5],
+}
+CANDIDATES = 27
+ETA = 3
+MIN_ROWS = 2000
+BUDGET_SECONDS = 600
+THRESHOLDS = np.round(np.arange(0.05, 0.96, 0.01), 2)
+THRESHOLD_METRICS = {
+    "f1": lambda y, p: f1_score(y, p, zero_division=0),
+    "balanced_accuracy": balanced_accuracy_score,
+    "accuracy": accuracy_score,
+}
+
+# Set in each worker by _init_worker: the scaled fit / validation arrays
+_DATA = {}
+
+
+def _init_worker(X_fit, y_fit, X_val, y_val):
+    _DATA.update(X_fit=X_fit, y_fit=y_fit, X_val=X_val, y_val=y_val)
+
+
+def make_forest(params: dict, seed: int = 42) -> RandomForestClassifier:
+    return RandomForestClassifier(class_weight="balanced", random_state=seed, n_jobs=1, **params)
+
+
+def _fit_candidate(index: int, params: dict, rows: int) -> dict:
+    """Fit on the first `rows` (shuffled) training rows and score on the validation rows."""
+    started = time.perf_counter()
+    forest = make_forest(params).fit(_DATA["X_fit"][:rows], _DATA["y_fit"][:rows])
+    fit_seconds = time.perf_counter() - started
+    proba = forest.predict_proba(_DATA["X_val"])[:, list(forest.classes_).index(True)]
+    return {"candidate": index, "rows": rows, "roc_auc": float(roc_auc_score(_DATA["y_val"], proba)),
+            "fit_seconds": fit_seconds, **{k: params[k] for k in SEARCH_SPACE if k in params}}
+
+
+def halving_schedule(n_candidates: int, n_rows: int, eta: int = ETA, min_rows: int = MIN_ROWS) -> list:
+    """Rows per rung: the last rung uses every row, each earlier one a factor `eta` fewer."""
+    rungs = max(1, math.ceil(math.log(n_candidates, eta)) + 1) if n_candidates > 1 else 1
+    rows = [int(n_rows / eta ** (rungs - 1 - r)) for r in range(rungs)]
+    return [r for r in rows if r >= min_rows] or [n_rows]
+
+
+def successive_halving(candidates: list, arrays: tuple, budget: float, workers: int = None, eta: int = ETA,
+                       min_rows: int = MIN_ROWS, verbose: bool = True):
+    """
+    (best candidate index, results of every fit). No fit starts after `budget` seconds; the
+    pool still waits for the running ones before returning.
+    """
+    deadline = time.perf_counter() + budget
+    schedule = halving_schedule(len(candidates), len(arrays[1]), eta, min_rows)
+    alive = list(range(len(candidates)))
+    results = []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=arrays) as pool:
+        for rung, rows in enumerate(schedule):
+            if time.perf_counter() >= deadline:
+                break
+            futures = {pool.submit(_fit_candidate, i, candidates[i], rows) for i in alive}
+            rung_results, cut_short = [], False
+            while futures:
+                done, futures = wait(futures, timeout=max(deadline - time.perf_counter(), 0),
+                                     return_when=FIRST_COMPLETED)
+                rung_results += [f.result() for f in done]
+                if futures and time.perf_counter() >= deadline:
+                    # Out of time: queued fits are cancelled, running ones are left out of the ranking
+                    for f in futures:
+                        f.cancel()
+                    cut_short = True
+                    break
+            for result in rung_results:
+                result["rung"] = rung
+            results += rung_results
+            if verbose:
+                best = max(rung_results, key=lambda r: r["roc_auc"], default=None)
+                print(f"Rung {rung}: {len(rung_results)}/{len(alive)} candidates on {rows} rows"
+                      + (f", best ROC AUC {best['roc_auc']:.4f}" if best else "")
+                      + f" ({budget - (deadline - time.perf_counter()):.0f}s elapsed)")
+            if cut_short or not rung_results:
+                break
+            ranked = sorted(rung_results, key=lambda r: r["roc_auc"], reverse=True)
+            alive = [r["candidate"] for r in ranked[:max(1, len(ranked) // eta)]]
+        pool.shutdown(wait=True, cancel_futures=True)
+    if not results:
+        raise RuntimeError(f"no candidate finished within the {budget:.0f}s budget")
+    # The winner is the best candidate of the furthest rung that produced results
+    top_rung = max(r["rung"] for r in results)
+    best = max((r for r in results if r["rung"] == top_rung), key=lambda r: r["roc_auc"])
+    return best["candidate"], results
+
+
+def tune_threshold(y: np.ndarray, proba: np.ndarray, metric: str = "f1") -> tuple:
+    """(threshold, score) maximizing `metric` of `proba > threshold` over THRESHOLDS."""
+    score = THRESHOLD_METRICS[metric]
+    scores = [score(y, proba > t) for t in THRESHOLDS]
+    best = int(np.argmax(scores))
+    return float(THRESHOLDS[best]), float(scores[best])
+
+
+def test_metrics(pipe, X_test, y_test, threshold: float) -> dict:
+    proba = pipe.predict_proba(X_test)[:, list(pipe.classes_).index(True)]
+    predicted = proba > threshold
+    return {"accuracy": accuracy_score(y_test, predicted), "balanced_accuracy": balanced_accuracy_score(y_test, predicted),
+            "f1": f1_score(y_test, predicted, zero_division=0), "roc_auc": roc_auc_score(y_test, proba),
+            "threshold": threshold}
+
+
+def tune(data_path: str, n_candidates: int = CANDIDATES, budget: float = BUDGET_SECONDS, workers: int = None,
+         threshold_metric: str = "f1", baseline: bool = True, seed: int = 42):
+    """(pipeline, threshold, report) of the best configuration found."""
+    from Spotify_Predictor import load_data, build_pipeline, THRESHOLD
+
+    started = time.perf_counter()
+    X, y = load_data(data_path)
+    # The same test split as main(); the rest is split again into fit / validation rows
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, stratify=y, random_state=42)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.25, stratify=y_train,
+                                                  random_state=seed)
+    # Preprocessing is fitted once and shared by every candidate; the forest works in float32 anyway
+    scaler = StandardScaler().fit(X_fit)
+    order = np.random.default_rng(seed).permutation(len(X_fit))  # rung subsets are prefixes of this order
+    arrays = (scaler.transform(X_fit)[order].astype(np.float32), y_fit.to_numpy()[order],
+              scaler.transform(X_val).astype(np.float32), y_val.to_numpy())
+
+    candidates = list(ParameterSampler(SEARCH_SPACE, n_candidates, random_state=seed))
+    search_budget = budget - (time.perf_counter() - started)
+    best, results = successive_halving(candidates, arrays, search_budget, workers)
+    search_seconds = time.perf_counter() - started
+
+    # Refit the winner on all fit rows, with the cached scaler, and tune its threshold on validation
+    refit_started = time.perf_counter()
+    forest = make_forest(candidates[best], seed).fit(arrays[0], arrays[1])
+    refit_seconds = time.perf_counter() - refit_started
+    pipe = make_pipeline(scaler, forest)
+    val_proba = forest.predict_proba(arrays[2])[:, list(forest.classes_).index(True)]
+    threshold, threshold_score = tune_threshold(arrays[3], val_proba, threshold_metric)
+
+    report = {
+        "data": os.path.abspath(data_path),
+        "candidates": n_candidates, "fits": len(results), "budget_seconds": budget,
+        "search_seconds": search_seconds, "overrun_seconds": max(0.0, search_seconds - budget),
+        "refit_seconds": refit_seconds, "total_seconds": time.perf_counter() - started,
+        "best_params": candidates[best], "threshold": threshold,
+        "threshold_metric": threshold_metric, "validation_" + threshold_metric: threshold_score,
+        "test": test_metrics(pipe, X_test, y_test, threshold),
+        "rungs": results,
+    }
+    if baseline:
+        fit_started = time.perf_counter()
+        default = build_pipeline().fit(X_train, y_train)
+        report["baseline"] = {**test_metrics(default, X_test, y_test, THRESHOLD),
+                              "fit_seconds": time.perf_counter() - fit_started}
+        report["total_seconds"] = time.perf_counter() - started
+    return pipe, threshold, report
+
+
+def print_report(report: dict, top: int = 5):
+    """The top candidates of each rung (all of them are in the JSON report), then the test metrics."""
+    rungs = pd.DataFrame(report["rungs"]).sort_values(["rung", "roc_auc"], ascending=[True, False])
+    print(rungs.groupby("rung").head(top)
+          [["rung", "rows", "candidate", "roc_auc", "fit_seconds"] + [k for k in SEARCH_SPACE if k in rungs]]
+          .round(4).to_string(index=False))
+    print(f"{report['fits']} fits of {report['candidates']} candidates in {report['search_seconds']:.1f}s "
+          f"(budget {report['budget_seconds']:.0f}s, {report['overrun_seconds']:.1f}s over waiting for running fits), "
+          f"refit {report['refit_seconds']:.1f}s, {report['total_seconds']:.1f}s in total")
+    print(f"Best: {report['best_params']}, threshold {report['threshold']} "
+          f"(validation {report['threshold_metric']} {report['validation_' + report['threshold_metric']]:.4f})")
+    rows = {"tuned": report["test"]}
+    if "baseline" in report:
+        rows["baseline (200 trees, 0.5)"] = report["baseline"]
+    print(pd.DataFrame(rows).T[["accuracy", "balanced_accuracy", "f1", "roc_auc", "threshold"]].round(4).to_string())
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)